@@ -1,6 +1,13 @@
 const apiUrl = "http://localhost:8000/multi_turn_orchestrate";
 let lastOptions = null;
 let lastMeta = null;
+// 串流模式（SSE）：網址加上 ?stream=1 或 localStorage.setItem("useStreaming", "1") 即可開啟
+const useStreaming = new URLSearchParams(window.location.search).get("stream") === "1" || localStorage.getItem("useStreaming") === "1";
+// 串流多輪推理進行中時，按 Esc 可中途取消（中斷連線，server 端隨即停止）
+let multiTurnAbort = null;
+document.addEventListener("keydown", e => {
+  if (e.key === "Escape" && multiTurnAbort) multiTurnAbort.abort();
+});
 
 // 這裡不放 scenarios，僅提供 setPrompt 供外部呼叫
 function setPrompt(text) {
@@ -38,6 +45,58 @@ async function sendQuery(query) {
   return await res.json();
 }
 
+// 讀取 SSE 串流，每收到一個事件（data: {...}）就呼叫 onEvent
+async function fetchSSE(url, body, onEvent, signal = undefined) {
+  const res = await fetch(url, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body),
+    signal
+  });
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder("utf-8");
+  let buffer = "";
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let idx;
+    while ((idx = buffer.indexOf("\n\n")) >= 0) {
+      const rawEvent = buffer.slice(0, idx);
+      buffer = buffer.slice(idx + 2);
+      rawEvent.split("\n").forEach(line => {
+        if (line.startsWith("data: ")) onEvent(JSON.parse(line.slice(6)));
+      });
+    }
+  }
+}
+
+// 多輪推理：顯示一步的 agent 卡片
+function renderToolStep(step) {
+  addMsg(
+    `<div class='card agent-card'>
+      <div class='agent-title'>【${step.agent_name || step.tool_id || step.agent_id || step.type || "Agent"}】</div>
+      <div class='agent-param'><b>參數：</b>${JSON.stringify(step.parameters)}</div>
+      <div class='agent-content'><b>回應：</b>${summarizeResult(step.result)}</div>
+      ${step.reason ? `<div class='llm-reason'><b>規劃理由：</b>${step.reason}</div>` : ""}
+    </div>`,
+    "bot"
+  );
+}
+
+// 多輪推理結束：summarize 所有 tool 步驟，push 到 history
+function finishMultiTurn(toolSteps, reason, showSummary = true) {
+  const summary = toolSteps.map((step, idx) => {
+    let title = step.agent_name || step.tool_id || step.agent_id || step.type || `步驟${idx+1}`;
+    return `【${title}】${summarizeResult(step.result)}`;
+  }).join("\n");
+  if (showSummary) {
+    addMsg(`<div class='summary-info'><b>總結：</b>${reason}</div>`, "bot", "summary-msg");
+  }
+  // 將 summary 作為 tool 歷程 push 到 history
+  history.push({ role: "tool", content: `${reason}\n${summary}` });
+}
+
 // 新增：多輪推理結果摘要函式
 function summarizeResult(result) {
   if (!result) return "<i>（無內容）</i>";
@@ -102,10 +161,37 @@ async function handleUserInput() {
     <span class='intent-label'>意圖：<b>${intentRes.intent}</b></span>
     <details style="margin-top:2px;"><summary>意圖判斷細節</summary>
       <div style="font-size:13px;line-height:1.6;padding:4px 0 0 8px;">${(typeof intentRes.reason !== 'undefined' && intentRes.reason !== null && intentRes.reason !== '') ? intentRes.reason : '(無)'}</div>
+      <div style="font-size:12px;color:#888;padding:2px 0 0 8px;">判斷來源：${intentRes.tier || 'llm'}${(intentRes.confidence !== undefined && intentRes.confidence !== null) ? `（信心 ${intentRes.confidence}）` : ''}</div>
     </details>
   `, "bot", "intent-debug");
 
-  if (intentRes.intent === "chat") {
+  if (intentRes.intent === "chat" && useStreaming) {
+    // 純聊天（串流）：收到第一個 token 就開始顯示
+    showLoading();
+    let bubble = null;
+    let reply = "";
+    await fetchSSE("http://localhost:8000/chat/stream", { history }, evt => {
+      if (evt.type === "token") {
+        if (!bubble) {
+          hideLoading();
+          bubble = addMsg("", "bot").querySelector(".bubble");
+        }
+        reply += evt.content;
+        bubble.textContent = reply;
+      } else if (evt.type === "done") {
+        reply = evt.reply;
+      } else if (evt.type === "error") {
+        hideLoading();
+        addMsg(`<b>錯誤：</b>${evt.message || '未知錯誤'}`, "bot", "error-msg");
+      }
+    });
+    hideLoading();
+    history.push({ role: "assistant", content: reply });
+    input.disabled = false;
+    document.getElementById("send-btn").disabled = false;
+    input.focus();
+    return;
+  } else if (intentRes.intent === "chat") {
     // 純聊天
     showLoading();
     let chatRes = await fetch("http://localhost:8000/chat", {
@@ -121,6 +207,43 @@ async function handleUserInput() {
     document.getElementById("send-btn").disabled = false;
     input.focus();
     return;
+  } else if (intentRes.intent === "history_answer" && useStreaming) {
+    // history answer（串流）：answer 邊產生邊顯示，reason 於結束時補上
+    showLoading();
+    let msgDiv = null;
+    let answer = "";
+    const renderAnswer = (reason) => {
+      if (!msgDiv) {
+        hideLoading();
+        msgDiv = addMsg("", "bot", "history-answer");
+      }
+      const bubble = msgDiv.querySelector(".bubble");
+      bubble.innerHTML = "<b>根據歷史紀錄，答案是：</b><br><span class='answer-text'></span>";
+      bubble.querySelector(".answer-text").textContent = answer;
+      if (reason !== undefined) {
+        const details = document.createElement("details");
+        details.innerHTML = "<summary>判斷理由</summary>";
+        details.appendChild(document.createTextNode(reason));
+        bubble.appendChild(details);
+      }
+    };
+    await fetchSSE("http://localhost:8000/history_answer/stream", { history }, evt => {
+      if (evt.type === "answer") {
+        answer += evt.content;
+        renderAnswer();
+      } else if (evt.type === "done") {
+        answer = evt.answer || answer;
+        renderAnswer(evt.reason || "");
+      } else if (evt.type === "error") {
+        hideLoading();
+        addMsg(`<b>錯誤：</b>${evt.message || '未知錯誤'}`, "bot", "error-msg");
+      }
+    });
+    hideLoading();
+    input.disabled = false;
+    document.getElementById("send-btn").disabled = false;
+    input.focus();
+    return;
   } else if (intentRes.intent === "history_answer") {
     // 呼叫 /history_answer，讓 LLM 幫忙摘要
     showLoading();
@@ -174,39 +297,64 @@ async function handleUserInput() {
         reason: "初次查詢"
       });
     }
+    if (useStreaming) {
+      // 整個多輪迴圈在 server 端跑，每一步完成就以 SSE 送回
+      multiTurnAbort = new AbortController();
+      showLoading();
+      try {
+        await fetchSSE("http://localhost:8000/agent/multi_turn/stream", { query: text, step: toolSteps[0] || null }, evt => {
+          hideLoading();
+          if (evt.type === "step") {
+            renderToolStep(evt.step);
+            toolSteps.push(evt.step);
+            showLoading();
+          } else if (evt.type === "finish") {
+            finishMultiTurn(toolSteps, evt.reason);
+          } else if (evt.type === "error") {
+            addMsg(`<b>錯誤：</b>${evt.message || '未知錯誤'}`, "bot", "error-msg");
+          }
+        }, multiTurnAbort.signal);
+      } catch (err) {
+        hideLoading();
+        if (err.name === "AbortError") {
+          addMsg(`<div class='summary-info'><b>已取消多輪查詢</b></div>`, "bot", "summary-msg");
+          finishMultiTurn(toolSteps, "使用者取消查詢", false);
+        } else {
+          addMsg(`<b>錯誤：</b>${err.message || '未知錯誤'}`, "bot", "error-msg");
+        }
+      }
+      multiTurnAbort = null;
+      input.disabled = false;
+      document.getElementById("send-btn").disabled = false;
+      input.focus();
+      return;
+    }
     let currentQuery = text;
     let finished = false;
+    // 歷程存在 server 端 session，每輪只送新的 query（第一輪附上初次查詢的 step）
+    let sessionId = null;
+    let pendingStep = toolSteps[0] || null;
     while (!finished) {
       showLoading();
       const res = await fetch("http://localhost:8000/agent/multi_turn_step", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ history: toolSteps, query: currentQuery })
+        body: JSON.stringify({ session_id: sessionId, query: currentQuery, step: pendingStep })
       });
       const result = await res.json();
       hideLoading();
+      sessionId = result.session_id || sessionId;
+      pendingStep = null;
       if (result.action === "call_tool" && result.step) {
-        addMsg(
-          `<div class='card agent-card'>
-            <div class='agent-title'>【${result.step.agent_name || result.step.tool_id || result.step.agent_id || result.step.type || "Agent"}】</div>
-            <div class='agent-param'><b>參數：</b>${JSON.stringify(result.step.parameters)}</div>
-            <div class='agent-content'><b>回應：</b>${summarizeResult(result.step.result)}</div>
-            ${result.step.reason ? `<div class='llm-reason'><b>規劃理由：</b>${result.step.reason}</div>` : ""}
-          </div>`,
-          "bot"
-        );
+        renderToolStep(result.step);
         toolSteps.push(result.step);
         currentQuery = `剛剛查到：${JSON.stringify(result.step.result).slice(0, 200)}...，請問還需要查什麼嗎？`;
       } else if (result.action === "finish") {
-        // 結束時 summarize 所有 tool 步驟，push 到 history
-        const summary = toolSteps.map((step, idx) => {
-          let title = step.agent_name || step.tool_id || step.agent_id || step.type || `步驟${idx+1}`;
-          return `【${title}】${summarizeResult(step.result)}`;
-        }).join("\n");
-        addMsg(`<div class='summary-info'><b>總結：</b>${result.reason}</div>`, "bot", "summary-msg");
-        // 將 summary 作為 tool 歷程 push 到 history
-        history.push({ role: "tool", content: `${result.reason}\n${summary}` });
+        finishMultiTurn(toolSteps, result.reason);
         finished = true;
+        if (sessionId) {
+          fetch(`http://localhost:8000/agent/session/${sessionId}`, { method: "DELETE" });
+        }
       } else if (result.action === "chat") {
         addMsg(result.reply, "bot");
         history.push({ role: "assistant", content: result.reply });
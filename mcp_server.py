@@ -1,6 +1,7 @@
 from mcp.server.fastmcp import FastMCP
 from src.tools.junyi_tree_tool import get_junyi_tree
-from src.tools.junyi_topic_tool import get_junyi_topic
+from src.tools.junyi_tree_expander import expand_junyi_tree_async
+from src.tools.junyi_topic_tool import get_junyi_topic, get_junyi_topics_batch_async
 from src.tools.junyi_topic_by_title_tool import get_junyi_topic_by_title
 
 # 建立 MCP server
@@ -18,11 +19,27 @@ def mcp_tool_get_junyi_tree(topic_id: str):
     """Get the tree of均一"""
     return get_junyi_tree(topic_id, depth=1)
 
+@mcp.tool()
+async def mcp_tool_expand_junyi_tree(topic_id: str = "root", max_depth: int = 2, max_nodes: int = 200):
+    """
+        Expand the tree of均一 to multiple levels
+        並行展開子節點，超過節點數上限時截斷（meta.truncated）
+    """
+    return await expand_junyi_tree_async(topic_id, max_depth=max_depth, max_nodes=max_nodes)
+
 @mcp.tool()
 def mcp_tool_get_junyi_topic(topic_id: str):
     """Get the topic of均一"""
     return get_junyi_topic(topic_id)
 
+@mcp.tool()
+async def mcp_tool_get_junyi_topics_batch(topic_ids: list[str]):
+    """
+        Get several topics of均一 at once
+        去除重複、並行查詢，單一 topic 失敗時放在 errors 內
+    """
+    return await get_junyi_topics_batch_async(topic_ids)
+
 @mcp.tool()
 def mcp_tool_get_junyi_topic_by_title(title: str):
     """
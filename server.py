@@ -1,20 +1,47 @@
 # server.py
-from src.orchestrator import dispatch_agent_single_turn, dispatch_agent_multi_turn_step
+from src.orchestrator import dispatch_agent_single_turn_async, dispatch_agent_multi_turn_step_async, dispatch_session_step_async, iter_multi_turn_async, MULTI_TURN_MAX_TURNS, call_agent_async, dispatch_fused_async
 import inspect
 import openai
 from fastapi import FastAPI, Request, Body, APIRouter
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
+import json
 from src.agent_registry import get_agent_list
 from pydantic import BaseModel, create_model, Field
 from typing import Any, Dict, List
-from src.orchestrator_utils.intent_analyzer import intent_analyzer
-from src.orchestrator_utils.llm_client import call_llm
+from src.orchestrator_utils.intent_analyzer import intent_analyzer_async
+from src.orchestrator_utils.llm_client import call_llm_async, call_llm_stream_async
+from src.orchestrator_utils.stream_json import JsonStringFieldStreamer
+from src.utils.llm_cache import get_llm_cache
+from src.utils.single_flight import get_single_flight_stats
+from src.utils.llm_pool import get_prompt_cache_stats, close_async_openai_client
+from src.utils.http_pool import close_async_http_client
+from src.utils.session_store import get_session_store
+from src.utils.agent_result_cache import get_agent_result_cache
+from src.utils.junyi_cache import get_junyi_cache
+from src.tools.junyi_snapshot import get_snapshot_index
+from src.tools.junyi_tree_expander import iter_junyi_tree_async
+from src.tools.junyi_popularity import get_topic_popularity
+from src.warmup import run_warmup, WARMUP_ENABLED, WARMUP_STATUS
+import asyncio
+from contextlib import asynccontextmanager, aclosing
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 預熱在背景執行，不延遲 server 開始接受請求
+    warmup_task = asyncio.create_task(run_warmup()) if WARMUP_ENABLED else None
+    yield
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    get_topic_popularity().flush()
+    # 關閉 Junyi 與 LLM 共用的 async 連線池
+    await close_async_http_client()
+    await close_async_openai_client()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS 設定
 app.add_middleware(
@@ -32,6 +59,10 @@ app.mount("/frontend", StaticFiles(directory=frontend_path, html=True), name="fr
 class OrchestrateRequest(BaseModel):
     prompt: str
 
+class FusedDispatchRequest(BaseModel):
+    prompt: str
+    query: str = None
+
 class QueryRequest(BaseModel):
     query: str
     options: list = None
@@ -40,31 +71,50 @@ class QueryRequest(BaseModel):
     last_meta: dict = None
     topic_id: str = None
 
+class MultiTurnStreamRequest(BaseModel):
+    query: str
+    session_id: str = None
+    step: Dict[str, Any] = None
+    max_turns: int = Field(5, ge=1, le=MULTI_TURN_MAX_TURNS)
+
 class ChatRequest(BaseModel):
     history: List[Dict[str, str]]
 
 class HistoryAnswerRequest(BaseModel):
     history: List[Dict[str, str]]
 
-@app.post("/analyze_intent")
-async def analyze_intent_api(data: OrchestrateRequest):
-    intent_result = intent_analyzer(data.prompt)
-    print("[analyze_intent] intent_result:", intent_result)
+class TreeExpandRequest(BaseModel):
+    topic_id: str = "root"
+    max_depth: int = 2
+    max_nodes: int = 200
+
+def suggest_api(intent: str):
     # 根據 intent 給建議 API 路徑
-    intent = intent_result.get("intent")
     if intent == "chat":
-        api = "/chat"
+        return "/chat"
     elif intent == "tool_call":
-        api = "/agent/single_turn_dispatch"
+        return "/agent/single_turn_dispatch"
     elif intent == "multi_turn":
-        api = "/agent/multi_turn_step"
-    else:
-        api = None
-    return {"intent": intent, "suggested_api": api, "reason": intent_result.get("reason", "")}
+        return "/agent/multi_turn_step"
+    return None
+
+@app.post("/analyze_intent")
+async def analyze_intent_api(data: OrchestrateRequest):
+    intent_result = await intent_analyzer_async(data.prompt)
+    print("[analyze_intent] intent_result:", intent_result)
+    intent = intent_result.get("intent")
+    api = suggest_api(intent)
+    return {
+        "intent": intent,
+        "suggested_api": api,
+        "reason": intent_result.get("reason", ""),
+        "tier": intent_result.get("tier"),
+        "confidence": intent_result.get("confidence")
+    }
 
 @app.post("/chat")
 async def chat_api(data: ChatRequest):
-    reply = call_llm(
+    reply = await call_llm_async(
         model="gpt-4.1-mini",
         messages=data.history,
         temperature=0.7
@@ -74,44 +124,160 @@ async def chat_api(data: ChatRequest):
 @app.post("/agent/single_turn_dispatch")
 async def agent_single_turn_dispatch_api(data: OrchestrateRequest):
     # 僅負責 agent 調度，不做 intent 判斷
-    result = dispatch_agent_single_turn(data.prompt)
+    result = await dispatch_agent_single_turn_async(data.prompt)
     return JSONResponse(content=result)
 
+@app.post("/agent/fused_dispatch")
+async def agent_fused_dispatch_api(data: FusedDispatchRequest):
+    # 意圖判斷 + 選工具 + 參數抽取一次完成；非工具意圖回傳建議的 API
+    result = await dispatch_fused_async(data.prompt, data.query)
+    if result.get("type") == "intent":
+        result["suggested_api"] = suggest_api(result.get("intent"))
+    return result
+
 @app.post("/agent/multi_turn_step")
 async def agent_multi_turn_step_api(request: Request):
     data = await request.json()
     history = data.get("history", [])
     query = data.get("query", "")
+    # 有 session_id 時歷程存在 server 端，前端只送新的 query 與 step（不必每輪重送整段 history）
+    if "session_id" in data:
+        result = await dispatch_session_step_async(data.get("session_id"), query, new_step=data.get("step"))
+        return JSONResponse(content=result)
     # 僅負責多步推理，不做 intent 判斷
     if not history:
         return JSONResponse(content={"message": "請先查詢一次，再進行多輪推理。"})
-    result = dispatch_agent_multi_turn_step(history, query)
+    result = await dispatch_agent_multi_turn_step_async(history, query)
     return JSONResponse(content=result)
 
+@app.get("/agent/session/{session_id}")
+def agent_session_get_api(session_id: str):
+    session = get_session_store().get(session_id)
+    if session is None:
+        return JSONResponse(status_code=404, content={"error": f"找不到 session {session_id}"})
+    return {"session_id": session.id, "history": session.steps}
+
+@app.delete("/agent/session/{session_id}")
+def agent_session_delete_api(session_id: str):
+    get_session_store().delete(session_id)
+    return {"session_id": session_id, "deleted": True}
+
+HISTORY_ANSWER_SYSTEM_PROMPT = (
+    "你是一個對話摘要助理。請根據下列多輪對話與工具查詢歷程，找出能回答用戶最新問題的最佳依據，並用自然語言說明答案與理由。\n"
+    "- history 可能包含 user、assistant、tool 三種角色。\n"
+    "- 請先找出 history 中最能回答 user 最新問題的內容，然後用自然語言回覆，並說明你為什麼這樣判斷。\n"
+    "- 如果 history 沒有明確答案，請誠實說明。\n"
+    "請用 JSON 格式回覆：{\"answer\": \"...\", \"reason\": \"...\"}"
+)
+
+def build_history_answer_messages(history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": HISTORY_ANSWER_SYSTEM_PROMPT},
+        {"role": "user", "content": str(history)}
+    ]
+
 @app.post("/history_answer")
 async def history_answer_api(data: HistoryAnswerRequest):
-    system_prompt = (
-        "你是一個對話摘要助理。請根據下列多輪對話與工具查詢歷程，找出能回答用戶最新問題的最佳依據，並用自然語言說明答案與理由。\n"
-        "- history 可能包含 user、assistant、tool 三種角色。\n"
-        "- 請先找出 history 中最能回答 user 最新問題的內容，然後用自然語言回覆，並說明你為什麼這樣判斷。\n"
-        "- 如果 history 沒有明確答案，請誠實說明。\n"
-        "請用 JSON 格式回覆：{\"answer\": \"...\", \"reason\": \"...\"}"
-    )
-    reply = call_llm(
+    reply = await call_llm_async(
         model="gpt-4.1-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": str(data.history)}
-        ],
+        messages=build_history_answer_messages(data.history),
         temperature=0.3
     )
-    import json
     try:
         result = json.loads(reply)
         return result
     except Exception:
         return {"answer": reply, "reason": "LLM 回傳格式解析失敗，已直接顯示原文"}
 
+def sse_event(data: Dict[str, Any]) -> str:
+    # server-sent events 格式：每個事件一行 data + 空行
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def sse_response(event_stream) -> StreamingResponse:
+    return StreamingResponse(
+        event_stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/chat/stream")
+async def chat_stream_api(data: ChatRequest):
+    # /chat 的串流版本：token 一收到就以 SSE 轉送給前端
+    async def event_stream():
+        reply = ""
+        try:
+            async for delta in call_llm_stream_async(model="gpt-4.1-mini", messages=data.history, temperature=0.7):
+                reply += delta
+                yield sse_event({"type": "token", "content": delta})
+            yield sse_event({"type": "done", "reply": reply})
+        except Exception as e:
+            yield sse_event({"type": "error", "message": str(e)})
+    return sse_response(event_stream())
+
+@app.post("/history_answer/stream")
+async def history_answer_stream_api(data: HistoryAnswerRequest):
+    # /history_answer 的串流版本：增量解析 JSON，answer 欄位不必等 reason 產生完就開始送出
+    async def event_stream():
+        streamer = JsonStringFieldStreamer("answer")
+        try:
+            async for delta in call_llm_stream_async(
+                model="gpt-4.1-mini",
+                messages=build_history_answer_messages(data.history),
+                temperature=0.3
+            ):
+                answer_delta = streamer.feed(delta)
+                if answer_delta:
+                    yield sse_event({"type": "answer", "content": answer_delta})
+            result = streamer.result()
+            if not isinstance(result, dict):
+                result = {"answer": streamer.buffer, "reason": "LLM 回傳格式解析失敗，已直接顯示原文"}
+            yield sse_event({"type": "done", **result})
+        except Exception as e:
+            yield sse_event({"type": "error", "message": str(e)})
+    return sse_response(event_stream())
+
+@app.post("/junyi/tree/expand/stream")
+async def junyi_tree_expand_stream_api(data: TreeExpandRequest):
+    # 多層展開課程樹：每個節點抓到就送出，不必等整棵樹組好
+    async def event_stream():
+        stats = {}
+        try:
+            async for item in iter_junyi_tree_async(data.topic_id, max_depth=data.max_depth, max_nodes=data.max_nodes, stats=stats):
+                yield sse_event({"type": "node", **item})
+            yield sse_event({"type": "done", "meta": stats})
+        except Exception as e:
+            yield sse_event({"type": "error", "message": str(e)})
+    return sse_response(event_stream())
+
+@app.post("/agent/multi_turn/stream")
+async def agent_multi_turn_stream_api(data: MultiTurnStreamRequest, request: Request):
+    # 多輪推理整個迴圈在 server 端跑，每一步完成就送出；前端中途斷線（取消）就停止，不再呼叫 LLM / 工具
+    async def event_stream():
+        # 每一步開始前檢查是否已斷線；aclosing 確保中途結束時迴圈的 finally（刪除 session）立即執行
+        loop = iter_multi_turn_async(data.query, session_id=data.session_id, initial_step=data.step, max_turns=data.max_turns, should_stop=request.is_disconnected)
+        try:
+            async with aclosing(loop):
+                async for event in loop:
+                    yield sse_event(event)
+        except Exception as e:
+            yield sse_event({"type": "error", "message": str(e)})
+    return sse_response(event_stream())
+
+@app.get("/stats")
+def stats_api():
+    # 快取等內部統計，方便觀察命中率
+    return {
+        "llm_cache": get_llm_cache().stats(),
+        "prompt_cache": get_prompt_cache_stats(),
+        "single_flight": get_single_flight_stats(),
+        "junyi_cache": get_junyi_cache().stats(),
+        "junyi_snapshot": get_snapshot_index().stats() if get_snapshot_index() else None,
+        "junyi_popularity": get_topic_popularity().stats(),
+        "sessions": get_session_store().stats(),
+        "agent_cache": get_agent_result_cache().stats(),
+        "warmup": WARMUP_STATUS
+    }
+
 @app.get("/")
 def index():
     return FileResponse(os.path.join(frontend_path, "index.html"))
@@ -156,6 +322,8 @@ for agent in get_agent_list():
             typ = float
         elif ptype == "bool":
             typ = bool
+        elif ptype == "list":
+            typ = List[str]
         else:
             typ = str
         fields[pname] = (typ, Field(default, **field_args))
@@ -164,7 +332,7 @@ for agent in get_agent_list():
     # endpoint function
     async def agent_respond(data: model, agent=agent):
         try:
-            result = agent["function"](**data.dict())
+            result = await call_agent_async(agent, data.dict())
             return {"result": result}
         except Exception as e:
             return {"error": str(e)}
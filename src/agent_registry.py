@@ -1,8 +1,12 @@
 import os
+import json
+import hashlib
 import importlib
 import pkgutil
 from typing import List, Dict
 from log_debug_info import log_debug_info
+from src.utils.async_utils import make_async
+from src.utils.agent_result_cache import wrap_cached_agent, AGENT_CACHE_ENABLED
 
 # 靜態註冊的 agent（原 tool_registry.py 內容）
 # PYTHON_TOOLS = [
@@ -130,8 +134,28 @@ class AgentRegistry:
         for a in merged.values():
             if "function" not in a:
                 a["function"] = None
+            if "async_function" not in a:
+                a["async_function"] = make_async(a["function"]) if a["function"] else None
+            # agent class 宣告 cache_ttl 時，自動把 respond 包上共用的結果快取
+            if AGENT_CACHE_ENABLED and a.get("cache_ttl") and a["function"]:
+                a["function"], a["async_function"] = wrap_cached_agent(
+                    a["id"], a["function"], a["async_function"], a["cache_ttl"],
+                    key_params=a.get("cache_key_params"), cacheable_errors=a.get("cacheable_errors"),
+                    on_hit=a.get("on_cache_hit")
+                )
         # 依照 id 排序
         self._agents = {k: merged[k] for k in sorted(merged.keys())}
+        self.version = self._compute_version()
+
+    def _compute_version(self) -> str:
+        """
+        agent 對 LLM 可見的欄位（id、名稱、描述、參數等）的 hash，任何一個 agent 改變都會得到新版本。
+        """
+        visible = [
+            {k: a.get(k) for k in ["id", "name", "description", "parameters", "category", "tags", "example_queries"]}
+            for a in self._agents.values()
+        ]
+        return hashlib.sha256(json.dumps(visible, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()[:16]
 
     def _load_python_agents(self):
         agent_list = []
@@ -142,6 +166,7 @@ class AgentRegistry:
                 for attr in dir(module):
                     obj = getattr(module, attr)
                     if isinstance(obj, type) and hasattr(obj, "respond") and hasattr(obj, "id"):
+                        instance = obj()
                         agent_list.append({
                             "id": getattr(obj, "id"),
                             "name": getattr(obj, "name", obj.__name__),
@@ -153,7 +178,14 @@ class AgentRegistry:
                             "author": getattr(obj, "author", ""),
                             "version": getattr(obj, "version", ""),
                             "tags": getattr(obj, "tags", []),
-                            "function": obj().respond,
+                            # 結果快取宣告（cache_ttl 秒；cache_key_params 只用這些參數當 key；cacheable_errors 可快取的錯誤訊息）
+                            "cache_ttl": getattr(obj, "cache_ttl", 0),
+                            "cache_key_params": getattr(obj, "cache_key_params", None),
+                            "cacheable_errors": getattr(obj, "cacheable_errors", None),
+                            "on_cache_hit": getattr(instance, "on_cache_hit", None),
+                            "function": instance.respond,
+                            # 有 respond_async 就用原生 async，否則以 thread pool adapter 包裝同步 respond
+                            "async_function": getattr(instance, "respond_async", None) or make_async(instance.respond),
                         })
         except Exception as e:
             print("[AgentRegistry] import agents failed:", e)
@@ -168,8 +200,11 @@ class AgentRegistry:
 
 _AGENT_REGISTRY = None
 
-def get_agent_list() -> List[Dict]:
+def get_agent_registry() -> AgentRegistry:
     global _AGENT_REGISTRY
     if _AGENT_REGISTRY is None:
         _AGENT_REGISTRY = AgentRegistry()
-    return list(_AGENT_REGISTRY._agents.values()) 
\ No newline at end of file
+    return _AGENT_REGISTRY
+
+def get_agent_list() -> List[Dict]:
+    return list(get_agent_registry()._agents.values()) 
\ No newline at end of file
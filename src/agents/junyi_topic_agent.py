@@ -1,4 +1,4 @@
-from src.tools.junyi_topic_tool import get_junyi_topic
+from src.tools.junyi_topic_tool import get_junyi_topic, get_junyi_topic_async
 
 class JunyiTopicAgent:
     id = "get_junyi_topic"
@@ -16,4 +16,7 @@ class JunyiTopicAgent:
     response_example = {"type": "topic", "content": {"id": "root", "title": "數學"}, "meta": {"topic_id": "root"}, "agent_id": "get_junyi_topic", "agent_name": "均一主題查詢", "error": None}
 
     def respond(self, topic_id: str = "root"):
-        return get_junyi_topic(topic_id=topic_id) 
\ No newline at end of file
+        return get_junyi_topic(topic_id=topic_id)
+
+    async def respond_async(self, topic_id: str = "root"):
+        return await get_junyi_topic_async(topic_id=topic_id) 
\ No newline at end of file
@@ -0,0 +1,22 @@
+from src.tools.junyi_topic_tool import get_junyi_topics_batch, get_junyi_topics_batch_async
+
+class JunyiTopicBatchAgent:
+    id = "get_junyi_topics_batch"
+    name = "均一主題批次查詢"
+    description = "一次查詢多個均一教學主題（多個 topic_id）的內容，適合同時查看同層或多個相關主題，不進行數字運算。"
+    category = "均一"
+    tags = ["教育", "均一"]
+    parameters = [
+        {"name": "topic_ids", "type": "list", "description": "均一主題 ID 清單，例如 [\"root\", \"math\"]"}
+    ]
+    example_queries = [
+        "同時查詢 topic_id 為 math 和 science 的主題內容"
+    ]
+    request_example = {"topic_ids": ["root", "math"]}
+    response_example = {"topics": {"root": {"id": "root", "title": "數學"}}, "errors": {"math": "404 Not Found"}, "meta": {"requested": 2, "unique": 2, "cached": 0, "fetched": 2, "failed": 1}}
+
+    def respond(self, topic_ids: list = None):
+        return get_junyi_topics_batch(topic_ids or [])
+
+    async def respond_async(self, topic_ids: list = None):
+        return await get_junyi_topics_batch_async(topic_ids or [])
@@ -1,4 +1,5 @@
-from src.tools.junyi_topic_by_title_tool import get_junyi_topic_by_title
+from src.tools.junyi_topic_by_title_tool import get_junyi_topic_by_title, get_junyi_topic_by_title_async
+from src.tools.junyi_popularity import get_topic_popularity
 
 class JunyiTopicByTitleAgent:
     id = "get_junyi_topic_by_title"
@@ -12,8 +13,18 @@ class JunyiTopicByTitleAgent:
     example_queries = [
         "查詢標題為『分數』的主題內容"
     ]
+    # 標題比對（索引 / LLM）＋主題查詢較耗時，同一標題的結果可快取
+    cache_ttl = 600
     request_example = {"title": "分數"}
     response_example = {"type": "topic_by_title", "content": {"id": "math_002", "title": "分數"}, "meta": {"title": "分數", "topic_id": "math_002"}, "agent_id": "get_junyi_topic_by_title", "agent_name": "均一主題標題查詢", "error": None}
 
+    def on_cache_hit(self, result, title: str = None):
+        # 快取命中時不會查 get_junyi_topic，仍要把查到的主題計入熱門度
+        if isinstance(result, dict) and not result.get("error"):
+            get_topic_popularity().record((result.get("meta") or {}).get("topic_id"))
+
     def respond(self, title: str):
-        return get_junyi_topic_by_title(title=title) 
\ No newline at end of file
+        return get_junyi_topic_by_title(title=title)
+
+    async def respond_async(self, title: str):
+        return await get_junyi_topic_by_title_async(title=title) 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from src.tools.junyi_tree_tool import get_junyi_tree
+from src.tools.junyi_tree_tool import get_junyi_tree, get_junyi_tree_async
 
 class JunyiTreeAgent:
     id = "get_junyi_tree"
@@ -17,4 +17,7 @@ class JunyiTreeAgent:
     response_example = {"type": "tree", "content": {"id": "root", "children": []}, "meta": {"topic_id": "root", "depth": 1}, "agent_id": "get_junyi_tree", "agent_name": "均一樹查詢", "error": None}
 
     def respond(self, topic_id: str = "root"):
-        return get_junyi_tree(topic_id=topic_id) 
\ No newline at end of file
+        return get_junyi_tree(topic_id=topic_id)
+
+    async def respond_async(self, topic_id: str = "root"):
+        return await get_junyi_tree_async(topic_id=topic_id) 
\ No newline at end of file
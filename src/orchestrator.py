@@ -5,16 +5,32 @@
 import openai
 import json
 import os
+import asyncio
 from src.agent_registry import get_agent_list
-from typing import Any, Dict, List
-from src.orchestrator_utils.prompt_builder import build_single_turn_prompt, build_multi_turn_step_prompt
-from src.orchestrator_utils.llm_client import call_llm
-from src.orchestrator_utils.agent_metadata import get_agents_metadata
-from src.orchestrator_utils.validator import parse_llm_json_reply
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import TimeoutError as FuturesTimeoutError, wait
+from src.orchestrator_utils.prompt_builder import build_single_turn_prompt, build_multi_turn_step_prompt, build_fused_route_prompt
+from src.orchestrator_utils.llm_client import call_llm, call_llm_async
+from src.orchestrator_utils.agent_metadata import get_tool_catalogue
+from src.orchestrator_utils.validator import parse_llm_json_reply, validate_fused_reply
+from src.orchestrator_utils.intent_analyzer import intent_analyzer_async
+from src.orchestrator_utils.intent_classifier import classify_locally, split_conversation
+from src.orchestrator_utils.dispatch_decision import decide_dispatch, decision_trace
+from src.orchestrator_utils.tool_index import shortlist_agents
 from log_debug_info import log_debug_info
-from src.parameter_extraction import filter_available_tools
+from src.parameter_extraction import filter_available_tools, filter_available_tools_async
+from src.utils.async_utils import make_async, submit_to_threadpool
+from src.utils.session_store import get_session_store
+from src.utils.tool_memo import ToolMemo
 
 def log_call(func):
+    if asyncio.iscoroutinefunction(func):
+        async def async_wrapper(*args, **kwargs):
+            print(f"[LOG] Called {func.__name__} args: {args} kwargs: {kwargs}")
+            result = await func(*args, **kwargs)
+            print(f"[LOG] {func.__name__} result: {result}")
+            return result
+        return async_wrapper
     def wrapper(*args, **kwargs):
         print(f"[LOG] Called {func.__name__} args: {args} kwargs: {kwargs}")
         result = func(*args, **kwargs)
@@ -26,9 +42,8 @@ def log_call(func):
 def dispatch_agent_single_turn(prompt: str) -> Dict[str, Any]:
     print("=== [DEBUG] 開始調度 dispatch_agent_single_turn ===")
     log_debug_info(tool_brief=None, system_prompt=None, user_prompt=prompt, llm_reply=None, prefix="print_debug")
-    tool_brief = get_agents_metadata()
-    # 取得 agent list（含 function/parameters）
-    agent_list = get_agent_list()
+    # 取得 agent list（含 function/parameters），只保留與 prompt 最相關的前 k 個
+    agent_list = shortlist_agents(prompt, get_agent_list())
     # 1. 先做變數分析＋工具過濾
     filter_result = filter_available_tools(prompt, agent_list)
     available_agents = [a for a in filter_result if a["available"]]
@@ -39,9 +54,26 @@ def dispatch_agent_single_turn(prompt: str) -> Dict[str, Any]:
     # 2. 若無可用 agent，直接回傳 trace
     if not available_agents:
         return {"type": "no_available_agent", "trace": trace}
-    # 3. 只讓 available agent 進入推理（這裡只取第一個，或可依需求調整）
-    # 這裡保留原本 LLM 推理流程，但可根據 available_agents 過濾 tool_brief
-    system_prompt, user_prompt = build_single_turn_prompt(tool_brief, prompt)
+    # 3. 抽取結果已能決定工具時直接調度，省下第二次 LLM 呼叫
+    decision = decide_dispatch(prompt, filter_result, agent_list)
+    trace["decision"] = decision_trace(decision)
+    if decision["tool"] is not None:
+        try:
+            output = decision["tool"]["function"](**decision["parameters"])
+        except Exception as e:
+            return {"type": "error", "message": str(e), "trace": trace}
+        return {
+            "type": "result",
+            "tool": decision["tool"]["id"],
+            "input": decision["parameters"],
+            "results": [output],
+            "trace": trace
+        }
+    # 4. 只讓 available agent 進入 LLM 推理
+    candidates = [a for a in agent_list if a["id"] in decision["candidates"]]
+    # system prompt 放完整工具清單（同一 registry 版本逐位元組相同，可命中 prompt prefix cache），候選限制放在 user message
+    tool_brief = get_tool_catalogue()
+    system_prompt, user_prompt = build_single_turn_prompt(tool_brief, prompt, [a["id"] for a in candidates])
     print("=== [DEBUG] system_prompt ===", system_prompt)
     log_debug_info(tool_brief=tool_brief, system_prompt=system_prompt, user_prompt=None, llm_reply=None, prefix="print_debug")
     print("=== [DEBUG] user_prompt ===", user_prompt)
@@ -69,8 +101,8 @@ def dispatch_agent_single_turn(prompt: str) -> Dict[str, Any]:
         parsed = parse_llm_json_reply(llm_reply, required_keys=["tool_id"])
         tool_id = parsed["tool_id"]
         params = parsed.get("parameters", {})
-        tools = get_agent_list()
-        tool = next((t for t in tools if t["id"] == tool_id), None)
+        # 只接受給 LLM 看過的候選工具，LLM 回了候選以外的工具就視為找不到
+        tool = next((t for t in candidates if t["id"] == tool_id), None)
         if tool:
             output = tool["function"](**params)
             result = {
@@ -88,15 +120,113 @@ def dispatch_agent_single_turn(prompt: str) -> Dict[str, Any]:
     except Exception as e:
         return {"type": "error", "message": str(e), "llm_reply": llm_reply, "trace": trace}
 
+MULTI_TURN_TOOL_TIMEOUT = float(os.getenv("MULTI_TURN_TOOL_TIMEOUT", "20"))
+MULTI_TURN_MAX_PARALLEL_CALLS = int(os.getenv("MULTI_TURN_MAX_PARALLEL_CALLS", "4"))
+# server 端多輪迴圈最多跑幾輪（前端給的 max_turns 不得超過）
+MULTI_TURN_MAX_TURNS = int(os.getenv("MULTI_TURN_MAX_TURNS", "10"))
+
+def planned_tool_calls(plan: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    取出 planner 這一步要呼叫的工具：可回傳 tool_calls（多個互相獨立的查詢）或單一 tool_id。
+    相同的 (tool_id, parameters) 只保留一次，最多 MULTI_TURN_MAX_PARALLEL_CALLS 個；
+    回傳 (要呼叫的, 超過上限被略過的)，略過的由呼叫端記在 trace。
+    """
+    if isinstance(plan.get("tool_calls"), list) and plan["tool_calls"]:
+        calls = []
+        for call in plan["tool_calls"]:
+            if not isinstance(call, dict) or not call.get("tool_id"):
+                continue
+            item = {"tool_id": call["tool_id"], "parameters": call.get("parameters") or {}}
+            if item not in calls:
+                calls.append(item)
+        if calls:
+            return calls[:MULTI_TURN_MAX_PARALLEL_CALLS], calls[MULTI_TURN_MAX_PARALLEL_CALLS:]
+    return [{"tool_id": plan["tool_id"], "parameters": plan.get("parameters", {})}], []
+
+def _record_dropped_calls(trace: Dict[str, Any], dropped: List[Dict[str, Any]]):
+    if dropped:
+        print(f"[multi_turn] tool_calls 超過上限 {MULTI_TURN_MAX_PARALLEL_CALLS}，略過 {len(dropped)} 個")
+        trace["dropped_calls"] = dropped
+
+def _find_tool(tools: List[Dict[str, Any]], tool_id: str) -> Optional[Dict[str, Any]]:
+    return next((t for t in tools if t["id"] == tool_id), None)
+
+def run_tool_calls_parallel(calls: List[Dict[str, Any]], tools: List[Dict[str, Any]]) -> List[Any]:
+    """
+    同步版並行呼叫（使用共用 thread pool）；單一工具失敗或逾時只影響自己的結果（{"error": ...}）。
+    """
+    futures = []
+    for call in calls:
+        tool = _find_tool(tools, call["tool_id"])
+        futures.append(submit_to_threadpool(tool["function"], **call["parameters"]) if tool else None)
+    wait([f for f in futures if f is not None], timeout=MULTI_TURN_TOOL_TIMEOUT)
+    outputs = []
+    for call, future in zip(calls, futures):
+        if future is None:
+            outputs.append({"error": f"找不到工具 {call['tool_id']}"})
+        elif not future.done():
+            future.cancel()  # 還在排隊的就不再執行；已在執行的讓它跑完，結果丟棄
+            outputs.append({"error": f"工具 {call['tool_id']} 逾時（{MULTI_TURN_TOOL_TIMEOUT} 秒）"})
+        elif future.exception() is not None:
+            outputs.append({"error": str(future.exception())})
+        else:
+            outputs.append(future.result())
+    return outputs
+
+async def _call_tool_safely_async(call: Dict[str, Any], tools: List[Dict[str, Any]]) -> Any:
+    tool = _find_tool(tools, call["tool_id"])
+    if tool is None:
+        return {"error": f"找不到工具 {call['tool_id']}"}
+    try:
+        return await asyncio.wait_for(call_agent_async(tool, call["parameters"]), timeout=MULTI_TURN_TOOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        return {"error": f"工具 {call['tool_id']} 逾時（{MULTI_TURN_TOOL_TIMEOUT} 秒）"}
+    except Exception as e:
+        return {"error": str(e)}
+
+def _merge_tool_calls(calls: List[Dict[str, Any]], tools: List[Dict[str, Any]], outputs: List[Any], reason: str) -> Dict[str, Any]:
+    """
+    並行呼叫的結果合併成歷程中的一個 step：parameters 與 result 依呼叫順序一一對應。
+    """
+    import copy
+    names = [(_find_tool(tools, c["tool_id"]) or {}).get("name", c["tool_id"]) for c in calls]
+    return {
+        "tool_id": "parallel",
+        "agent_name": "、".join(names),
+        "parameters": [{"tool_id": c["tool_id"], "parameters": copy.deepcopy(c["parameters"])} for c in calls],
+        "result": outputs,
+        "reason": reason
+    }
+
+def _memo_lookup(calls: List[Dict[str, Any]], memo: ToolMemo, trace: Dict[str, Any]):
+    """
+    呼叫工具前先查 session memo：回傳 (各呼叫的結果（未命中為 None）, 未命中的 index)，命中的記在 trace.memo_hits。
+    """
+    outputs, misses = [], []
+    for idx, call in enumerate(calls):
+        hit, result = memo.lookup(call["tool_id"], call["parameters"])
+        outputs.append(result if hit else None)
+        if hit:
+            trace.setdefault("memo_hits", []).append({"tool_id": call["tool_id"], "parameters": call["parameters"]})
+        else:
+            misses.append(idx)
+    return outputs, misses
+
+def _multi_turn_step_result(history: List[Dict[str, Any]], step: Dict[str, Any], trace: Dict[str, Any], memo: Optional[ToolMemo] = None) -> Dict[str, Any]:
+    if is_redundant(history, step, memo=memo):
+        return {"action": "finish", "reason": "查詢內容重複，已自動結束。", "step": step, "trace": trace}
+    return {"action": "call_tool", "step": step, "trace": trace}
+
 @log_call
-def dispatch_agent_multi_turn_step(history: List[Dict[str, Any]], query: str, max_turns: int = 5) -> Dict[str, Any]:
+def dispatch_agent_multi_turn_step(history: List[Dict[str, Any]], query: str, max_turns: int = 5, memo: Optional[ToolMemo] = None) -> Dict[str, Any]:
     """
     分步查詢：每次只推理一輪，回傳本輪結果或 finish。
+    memo：session 的工具結果 memo，沒給時由 history 建立；查過的 (tool_id, 參數) 不再呼叫工具。
     """
     import copy
-    tool_brief = get_agents_metadata()
-    # 取得 agent list
-    agent_list = get_agent_list()
+    # 取得 agent list，只保留與 query 最相關的前 k 個
+    agent_list = shortlist_agents(query, get_agent_list())
+    tool_brief = get_tool_catalogue(agent_list)
     # 先做變數分析＋工具過濾
     filter_result = filter_available_tools(query, agent_list)
     available_agents = [a for a in filter_result if a["available"]]
@@ -133,12 +263,259 @@ def dispatch_agent_multi_turn_step(history: List[Dict[str, Any]], query: str, ma
                 "step": None,
                 "trace": trace
             }
-        tool_id = plan["tool_id"]
-        params = plan.get("parameters", {})
+        calls, dropped = planned_tool_calls(plan)
+        _record_dropped_calls(trace, dropped)
         tools = get_agent_list()
+        memo = memo if memo is not None else ToolMemo(history)
+        outputs, misses = _memo_lookup(calls, memo, trace)
+        if len(calls) > 1:
+            # 多個互相獨立的查詢：並行呼叫，合併成一個 step
+            fresh = run_tool_calls_parallel([calls[i] for i in misses], tools) if misses else []
+            for idx, output in zip(misses, fresh):
+                outputs[idx] = output
+            step = _merge_tool_calls(calls, tools, outputs, plan.get("reason", ""))
+            trace["parallel_calls"] = len(calls)
+            return _multi_turn_step_result(history, step, trace, memo)
+        tool_id = calls[0]["tool_id"]
+        params = calls[0]["parameters"]
         tool = next((t for t in tools if t["id"] == tool_id), None)
         if tool:
-            output = tool["function"](**params)
+            if misses:
+                # 與 async 版相同：在共用 thread pool 執行並套用 MULTI_TURN_TOOL_TIMEOUT，慢的工具不會卡住整個 step
+                future = submit_to_threadpool(tool["function"], **params)
+                try:
+                    output = future.result(timeout=MULTI_TURN_TOOL_TIMEOUT)
+                except FuturesTimeoutError:
+                    future.cancel()
+                    return {"action": "error", "message": f"工具 {tool_id} 逾時（{MULTI_TURN_TOOL_TIMEOUT} 秒）", "trace": trace}
+            else:
+                output = outputs[0]
+            step = {
+                "tool_id": tool_id,
+                "agent_name": tool.get("name", ""),
+                "parameters": copy.deepcopy(params),
+                "result": output,
+                "reason": plan.get("reason", "")
+            }
+            if is_redundant(history, step, memo=memo):
+                return {
+                    "action": "finish",
+                    "reason": "查詢內容重複，已自動結束。",
+                    "step": step,
+                    "trace": trace
+                }
+            return {
+                "action": "call_tool",
+                "step": step,
+                "trace": trace
+            }
+        else:
+            return {
+                "action": "error",
+                "message": f"找不到工具 {tool_id}",
+                "trace": trace
+            }
+    except Exception as e:
+        return {"action": "error", "message": str(e), "llm_reply": llm_reply, "trace": trace}
+
+async def call_agent_async(tool: Dict[str, Any], params: Dict[str, Any]) -> Any:
+    """
+    以 async 方式呼叫 agent：優先用 async_function（原生 async 或 thread pool adapter），否則即時包裝同步 function。
+    """
+    func = tool.get("async_function") or make_async(tool["function"])
+    return await func(**params)
+
+async def plan_single_turn_async(prompt: str) -> Dict[str, Any]:
+    """
+    單輪調度的路由部分：參數抽取 + 決策（能直接決定就不問 LLM）+ LLM 選工具，不呼叫 agent。
+    成功回傳 {"type": "plan", "tool": agent dict, "input", "trace"}，否則回傳與 dispatch 相同格式的錯誤。
+    warmup 也透過這裡預熱路由用的 LLM 快取。
+    """
+    agent_list = shortlist_agents(prompt, get_agent_list())
+    filter_result = await filter_available_tools_async(prompt, agent_list)
+    available_agents = [a for a in filter_result if a["available"]]
+    trace = {
+        "user_query": prompt,
+        "filter_result": filter_result
+    }
+    if not available_agents:
+        return {"type": "no_available_agent", "trace": trace}
+    decision = decide_dispatch(prompt, filter_result, agent_list)
+    trace["decision"] = decision_trace(decision)
+    if decision["tool"] is not None:
+        return {"type": "plan", "tool": decision["tool"], "input": decision["parameters"], "trace": trace}
+    candidates = [a for a in agent_list if a["id"] in decision["candidates"]]
+    # system prompt 放完整工具清單（同一 registry 版本逐位元組相同，可命中 prompt prefix cache），候選限制放在 user message
+    tool_brief = get_tool_catalogue()
+    system_prompt, user_prompt = build_single_turn_prompt(tool_brief, prompt, [a["id"] for a in candidates])
+    try:
+        llm_reply = await call_llm_async(
+            model="gpt-4.1-mini",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=0
+        )
+        log_debug_info(
+            tool_brief=tool_brief,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            llm_reply=llm_reply
+        )
+    except Exception as e:
+        return {"type": "error", "message": str(e), "trace": trace}
+    try:
+        parsed = parse_llm_json_reply(llm_reply, required_keys=["tool_id"])
+        tool_id = parsed["tool_id"]
+        params = parsed.get("parameters", {})
+        tool = next((t for t in candidates if t["id"] == tool_id), None)
+        if not tool:
+            return {"type": "error", "message": f"找不到工具 {tool_id}", "trace": trace}
+        return {"type": "plan", "tool": tool, "input": params, "trace": trace}
+    except Exception as e:
+        return {"type": "error", "message": str(e), "llm_reply": llm_reply, "trace": trace}
+
+@log_call
+async def dispatch_agent_single_turn_async(prompt: str) -> Dict[str, Any]:
+    """
+    dispatch_agent_single_turn 的 async 版本：LLM、參數抽取與 agent respond 皆不阻塞 event loop。
+    """
+    plan = await plan_single_turn_async(prompt)
+    if plan["type"] != "plan":
+        return plan
+    try:
+        output = await call_agent_async(plan["tool"], plan["input"])
+        return {
+            "type": "result",
+            "tool": plan["tool"]["id"],
+            "input": plan["input"],
+            "results": [output],
+            "trace": plan["trace"]
+        }
+    except Exception as e:
+        return {"type": "error", "message": str(e), "trace": plan["trace"]}
+
+async def _dispatch_staged_async(prompt: str, query: str, fallback_reason: str) -> Dict[str, Any]:
+    """
+    合併路由驗證失敗時，改走原本分段的流程：intent_analyzer → 參數抽取 → 選工具。
+    """
+    intent_result = await intent_analyzer_async(prompt)
+    intent = intent_result.get("intent")
+    if intent != "tool_call":
+        return {"type": "intent", "intent": intent, "reason": intent_result.get("reason", ""), "route": "staged", "fallback_reason": fallback_reason}
+    result = await dispatch_agent_single_turn_async(query)
+    return {**result, "intent": "tool_call", "route": "staged", "fallback_reason": fallback_reason}
+
+@log_call
+async def dispatch_fused_async(prompt: str, query: str = None) -> Dict[str, Any]:
+    """
+    合併路由：一次 LLM 呼叫同時回傳 intent、tool_id 與參數，驗證通過就直接呼叫 agent。
+    prompt 為多輪對話（User: / Assistant: 逐行），query 為要查詢的最新輸入（預設取 prompt 最後一則 User）。
+    本地規則 / 模型有把握的非工具意圖不呼叫 LLM；LLM 回覆驗證失敗時退回分段流程。
+    """
+    query = query or split_conversation(prompt)[0]
+    local = classify_locally(prompt)
+    if local and local["intent"] != "tool_call":
+        return {"type": "intent", "intent": local["intent"], "reason": local["reason"], "route": local["tier"]}
+    agent_list = shortlist_agents(query, get_agent_list())
+    tool_brief = get_tool_catalogue(agent_list)
+    system_prompt, user_prompt = build_fused_route_prompt(tool_brief, prompt, query)
+    try:
+        llm_reply = await call_llm_async(
+            model="gpt-4.1-mini",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=0
+        )
+        fused = validate_fused_reply(llm_reply, agent_list)
+    except Exception as e:
+        print(f"[dispatch_fused_async] 合併路由失敗，改走分段流程: {e}")
+        return await _dispatch_staged_async(prompt, query, str(e))
+    trace = {"user_query": query, "route": "fused", "reason": fused.get("reason", "")}
+    if fused["intent"] != "tool_call":
+        return {"type": "intent", "intent": fused["intent"], "reason": fused.get("reason", ""), "route": "fused"}
+    try:
+        output = await call_agent_async(fused["tool"], fused["parameters"])
+    except Exception as e:
+        return {"type": "error", "message": str(e), "intent": "tool_call", "route": "fused", "trace": trace}
+    return {
+        "type": "result",
+        "intent": "tool_call",
+        "route": "fused",
+        "tool": fused["tool"]["id"],
+        "input": fused["parameters"],
+        "results": [output],
+        "trace": trace
+    }
+
+@log_call
+async def dispatch_agent_multi_turn_step_async(history: List[Dict[str, Any]], query: str, max_turns: int = 5, history_json: Optional[str] = None, memo: Optional[ToolMemo] = None) -> Dict[str, Any]:
+    """
+    dispatch_agent_multi_turn_step 的 async 版本。
+    history_json：已序列化的歷程（server 端 session），有給就不再重新 json.dumps。
+    """
+    import copy
+    agent_list = shortlist_agents(query, get_agent_list())
+    tool_brief = get_tool_catalogue(agent_list)
+    filter_result = await filter_available_tools_async(query, agent_list)
+    available_agents = [a for a in filter_result if a["available"]]
+    trace = {
+        "user_query": query,
+        "filter_result": filter_result
+    }
+    if not available_agents:
+        return {"action": "no_available_agent", "trace": trace}
+    system_prompt, user_prompt = build_multi_turn_step_prompt(tool_brief, history, query, history_json=history_json)
+    try:
+        llm_reply = await call_llm_async(
+            model="gpt-4.1-mini",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=0
+        )
+        log_debug_info(
+            tool_brief=tool_brief,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            llm_reply=llm_reply
+        )
+    except Exception as e:
+        return {"action": "error", "message": str(e), "trace": trace}
+    try:
+        plan = parse_llm_json_reply(llm_reply, required_keys=["action"])
+        if plan.get("action") == "finish":
+            return {
+                "action": "finish",
+                "reason": plan.get("reason", "查詢結束"),
+                "step": None,
+                "trace": trace
+            }
+        calls, dropped = planned_tool_calls(plan)
+        _record_dropped_calls(trace, dropped)
+        tools = get_agent_list()
+        memo = memo if memo is not None else ToolMemo(history)
+        outputs, misses = _memo_lookup(calls, memo, trace)
+        if len(calls) > 1:
+            # 多個互相獨立的查詢：並行呼叫（各自有逾時），合併成一個 step
+            fresh = await asyncio.gather(*[_call_tool_safely_async(calls[i], tools) for i in misses])
+            for idx, output in zip(misses, fresh):
+                outputs[idx] = output
+            step = _merge_tool_calls(calls, tools, outputs, plan.get("reason", ""))
+            trace["parallel_calls"] = len(calls)
+            return _multi_turn_step_result(history, step, trace, memo)
+        tool_id = calls[0]["tool_id"]
+        params = calls[0]["parameters"]
+        tool = next((t for t in tools if t["id"] == tool_id), None)
+        if tool:
+            try:
+                output = await asyncio.wait_for(call_agent_async(tool, params), timeout=MULTI_TURN_TOOL_TIMEOUT) if misses else outputs[0]
+            except asyncio.TimeoutError:
+                return {"action": "error", "message": f"工具 {tool_id} 逾時（{MULTI_TURN_TOOL_TIMEOUT} 秒）", "trace": trace}
             step = {
                 "tool_id": tool_id,
                 "agent_name": tool.get("name", ""),
@@ -146,7 +523,7 @@ def dispatch_agent_multi_turn_step(history: List[Dict[str, Any]], query: str, ma
                 "result": output,
                 "reason": plan.get("reason", "")
             }
-            if is_redundant(history, step):
+            if is_redundant(history, step, memo=memo):
                 return {
                     "action": "finish",
                     "reason": "查詢內容重複，已自動結束。",
@@ -167,10 +544,65 @@ def dispatch_agent_multi_turn_step(history: List[Dict[str, Any]], query: str, ma
     except Exception as e:
         return {"action": "error", "message": str(e), "llm_reply": llm_reply, "trace": trace}
 
-def is_redundant(history, new_step):
-    # 只比對最近一輪的參數
-    if not history:
-        return False
-    last_query = history[-1]["parameters"]
-    new_query = new_step["parameters"]
-    return last_query == new_query 
\ No newline at end of file
+async def dispatch_session_step_async(session_id: str, query: str, new_step: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    以 server 端 session 進行多輪推理的一步：前端只送新的 query（以及前端自己查到的 step），
+    歷程由 session 保存並逐步序列化；新查到的 step 會自動加入 session。
+    """
+    store = get_session_store()
+    session = store.get_or_create(session_id)
+    if new_step:
+        store.append(session.id, new_step)
+    if not session.steps:
+        return {"message": "請先查詢一次，再進行多輪推理。", "session_id": session.id}
+    result = await dispatch_agent_multi_turn_step_async(session.steps, query, history_json=session.history_json, memo=session.memo)
+    if result.get("action") == "call_tool" and result.get("step"):
+        store.append(session.id, result["step"])
+    result["session_id"] = session.id
+    result["history_length"] = len(session.steps)
+    return result
+
+def follow_up_query(step: Dict[str, Any]) -> str:
+    # 每查到一步後，下一輪交給 planner 的提問（原本由前端組）
+    return f"剛剛查到：{json.dumps(step.get('result'), ensure_ascii=False)[:200]}...，請問還需要查什麼嗎？"
+
+async def iter_multi_turn_async(query: str, session_id: Optional[str] = None, initial_step: Optional[Dict[str, Any]] = None, max_turns: int = 5, should_stop=None):
+    """
+    在 server 端跑完整個 plan → call_tool → plan 迴圈，每一步完成就 yield 一個事件：
+    {"type": "step"}、{"type": "finish"}（LLM 回 finish、查詢重複或達 max_turns）、{"type": "error"}。
+    max_turns 以 MULTI_TURN_MAX_TURNS 為上限；每一步開始前先 await should_stop()（例如前端已斷線），為 True 就不再呼叫 LLM / 工具。
+    呼叫端停止迭代時，進行中的 LLM / 工具呼叫會一併被取消。
+    沒有帶 session_id 時由迴圈自行建立 session，迴圈結束（含中途停止）就刪除。
+    """
+    max_turns = max(1, min(max_turns, MULTI_TURN_MAX_TURNS))
+    owns_session = not session_id
+    current_query = query
+    try:
+        for turn in range(1, max_turns + 1):
+            if should_stop is not None and await should_stop():
+                print("[multi_turn] stopped before turn", turn)
+                return
+            result = await dispatch_session_step_async(session_id, current_query, new_step=initial_step if turn == 1 else None)
+            session_id = result.get("session_id", session_id)
+            action = result.get("action")
+            if action == "call_tool":
+                yield {"type": "step", "turn": turn, "session_id": session_id, "step": result["step"], "trace": result.get("trace")}
+                current_query = follow_up_query(result["step"])
+            elif action == "finish":
+                yield {"type": "finish", "turn": turn, "session_id": session_id, "reason": result.get("reason", "查詢結束"), "step": result.get("step")}
+                return
+            else:
+                yield {"type": "error", "turn": turn, "session_id": session_id, "message": result.get("message") or f"無法繼續查詢（{action}）"}
+                return
+        yield {"type": "finish", "turn": max_turns, "session_id": session_id, "reason": f"已達最多 {max_turns} 輪，結束查詢。", "step": None}
+    finally:
+        if owns_session and session_id:
+            get_session_store().delete(session_id)
+
+def is_redundant(history, new_step, memo: Optional[ToolMemo] = None):
+    # 比對整個 session：step 內每個 (tool_id, 參數) 都查過就算重複；舊歷程沒有 tool_id 的 step 只比對參數
+    if memo is None:
+        if not history:
+            return False
+        memo = ToolMemo(history)
+    return memo.is_repeat(new_step) 
\ No newline at end of file
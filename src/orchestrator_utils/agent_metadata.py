@@ -1,8 +1,19 @@
-from src.agent_registry import get_agent_list
+import threading
+from collections import OrderedDict
+from src.agent_registry import get_agent_list, get_agent_registry
+from src.orchestrator_utils.prompt_builder import serialize_tool_brief
 from typing import List, Dict
 
-def get_agents_metadata() -> List[Dict]:
-    tools = get_agent_list()
+# 已序列化的工具清單：(registry 版本, agent id 組合) -> JSON 字串
+CATALOGUE_CACHE_SIZE = 64
+_CATALOGUE_CACHE = OrderedDict()
+_CATALOGUE_LOCK = threading.Lock()
+
+def get_agents_metadata(agent_list: List[Dict] = None) -> List[Dict]:
+    """
+    給 LLM 看的工具清單；傳入 agent_list 時只列出這些 agent（例如只列可用的）。
+    """
+    tools = get_agent_list() if agent_list is None else agent_list
     return [
         {
             "id": t["id"],
@@ -11,4 +22,28 @@ def get_agents_metadata() -> List[Dict]:
             "parameters": t.get("parameters", [])
         }
         for t in tools
-    ] 
\ No newline at end of file
+    ] 
+
+def get_tool_catalogue(agent_list: List[Dict] = None) -> str:
+    """
+    給 prompt 使用的工具清單 JSON 字串。來自 registry 的同一組 agent 每個 registry 版本只序列化一次，
+    確保每次請求的 prompt 前綴逐位元組相同（可命中供應商端的 prompt prefix cache）。
+    """
+    registry = get_agent_registry()
+    agents = list(registry._agents.values()) if agent_list is None else agent_list
+    if not all(registry.get_agent(a.get("id")) is a for a in agents):
+        # 不是 registry 內的 agent（例如測試替身），不快取
+        return serialize_tool_brief(get_agents_metadata(agents))
+    key = (registry.version, tuple(a["id"] for a in agents))
+    with _CATALOGUE_LOCK:
+        catalogue = _CATALOGUE_CACHE.get(key)
+        if catalogue is not None:
+            _CATALOGUE_CACHE.move_to_end(key)
+            return catalogue
+    catalogue = serialize_tool_brief(get_agents_metadata(agents))
+    with _CATALOGUE_LOCK:
+        _CATALOGUE_CACHE[key] = catalogue
+        while len(_CATALOGUE_CACHE) > CATALOGUE_CACHE_SIZE:
+            _CATALOGUE_CACHE.popitem(last=False)
+    return catalogue
+
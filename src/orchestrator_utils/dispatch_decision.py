@@ -0,0 +1,78 @@
+"""
+單輪調度的決策階段：參數抽取（filter_available_tools）已經有結果時，判斷能否不再問 LLM 直接調度。
+1. 只有一個有參數的 agent 可用，且抽出的參數通過驗證 → direct
+2. 多個可用時，以 example_queries 與使用者輸入的字元 bigram 相似度排序，第一名明顯領先 → ranked
+3. 其他情況 → llm（只把可用的 agent 給 LLM 選）
+無參數的 agent 永遠 available，無法從抽取結果判斷是否相關，一律交給 LLM。
+"""
+import os
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional
+from src.orchestrator_utils.validator import validate_tool_parameters
+
+DISPATCH_RANK_MIN_SCORE = float(os.getenv("DISPATCH_RANK_MIN_SCORE", "0.5"))
+DISPATCH_RANK_MARGIN = float(os.getenv("DISPATCH_RANK_MARGIN", "0.2"))
+
+def _bigrams(text: str) -> set:
+    text = re.sub(r"[\s\W_]+", "", unicodedata.normalize("NFKC", str(text)).lower())
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+def example_similarity(query: str, agent: Dict) -> float:
+    """
+    使用者輸入與 agent 的 example_queries 最高的 Dice 相似度（0~1）。
+    """
+    query_grams = _bigrams(query)
+    best = 0.0
+    for example in agent.get("example_queries", []):
+        grams = _bigrams(example)
+        if query_grams and grams:
+            best = max(best, 2 * len(query_grams & grams) / (len(query_grams) + len(grams)))
+    return round(best, 4)
+
+def _validated(agent: Dict, entry: Dict) -> Optional[Dict[str, Any]]:
+    try:
+        return validate_tool_parameters(entry.get("extracted_params"), agent.get("parameters", []))
+    except Exception as e:
+        print(f"[dispatch_decision] {agent.get('id')} 抽取參數未通過驗證: {e}")
+        return None
+
+def decide_dispatch(query: str, filter_result: List[Dict], agent_list: List[Dict]) -> Dict[str, Any]:
+    """
+    回傳 {"stage": "direct" | "ranked" | "llm", "tool", "parameters", "candidates", "reason"}；
+    stage 為 llm 時 tool/parameters 為 None，candidates 為要交給 LLM 的可用 agent id。
+    """
+    agents = {a["id"]: a for a in agent_list}
+    available = [e for e in filter_result if e.get("available") and e.get("agent_id") in agents]
+    candidates = [e["agent_id"] for e in available]
+    decision = {"stage": "llm", "tool": None, "parameters": None, "candidates": candidates, "reason": ""}
+    if any(not agents[e["agent_id"]].get("parameters") for e in available):
+        decision["reason"] = "有無參數的 agent 可用，無法從抽取結果判斷"
+        return decision
+    if len(available) == 1:
+        entry = available[0]
+        params = _validated(agents[entry["agent_id"]], entry)
+        if params is not None:
+            return {**decision, "stage": "direct", "tool": agents[entry["agent_id"]], "parameters": params, "reason": "只有一個 agent 可用"}
+        decision["reason"] = "唯一可用 agent 的參數未通過驗證"
+        return decision
+    scores = sorted(((example_similarity(query, agents[e["agent_id"]]), e) for e in available), key=lambda x: -x[0])
+    decision["scores"] = {e["agent_id"]: score for score, e in scores}
+    if len(scores) >= 2 and scores[0][0] >= DISPATCH_RANK_MIN_SCORE and scores[0][0] - scores[1][0] >= DISPATCH_RANK_MARGIN:
+        entry = scores[0][1]
+        params = _validated(agents[entry["agent_id"]], entry)
+        if params is not None:
+            return {**decision, "stage": "ranked", "tool": agents[entry["agent_id"]], "parameters": params, "reason": "本地排序第一名明顯領先"}
+    decision["reason"] = "多個 agent 可用且無法在本地判斷"
+    return decision
+
+def decision_trace(decision: Dict) -> Dict:
+    """
+    寫入 trace 的決策摘要（不含 agent 物件本身）。
+    """
+    trace = {k: v for k, v in decision.items() if k != "tool"}
+    trace["tool_id"] = decision["tool"]["id"] if decision.get("tool") else None
+    trace["skipped_llm_call"] = decision["stage"] != "llm"
+    return trace
@@ -1,5 +1,6 @@
 import json
-from src.orchestrator_utils.llm_client import call_llm
+from src.orchestrator_utils.llm_client import call_llm, call_llm_async
+from src.orchestrator_utils.intent_classifier import classify_locally, split_conversation, log_intent_decision
 
 def build_intent_prompt(user_input: str) -> str:
     return f"""
@@ -15,22 +16,68 @@ def build_intent_prompt(user_input: str) -> str:
 {{"intent": "tool_call", "reason": "需要查詢"}}
 """
 
+def build_intent_messages(prompt: str) -> list:
+    return [
+        {"role": "system", "content": "你是一個意圖分類助手。"},
+        {"role": "user", "content": prompt}
+    ]
+
+def parse_intent_reply(reply: str) -> dict:
+    try:
+        result = json.loads(reply)
+        print("[intent_analyzer] 解析結果:", result)
+        return result
+    except Exception as e:
+        print(f"[intent_analyzer] 解析失敗: {e}")
+        return {"intent": "other", "reason": f"解析失敗: {e}", "raw": reply}
+
+def _local_intent(user_input: str):
+    result = classify_locally(user_input)
+    if result:
+        print(f"[intent_analyzer] 本地判斷（{result['tier']}，信心 {result['confidence']}）:", result["intent"])
+    return result
+
+def _llm_intent_result(user_input: str, reply: str) -> dict:
+    result = parse_intent_reply(reply)
+    if isinstance(result, dict):
+        result.setdefault("tier", "llm")
+        result.setdefault("confidence", None)
+        if "raw" not in result:
+            # LLM 的判斷留作本地模型的訓練資料
+            text, has_history = split_conversation(user_input)
+            log_intent_decision(text, has_history, result.get("intent"))
+    return result
+
 def intent_analyzer(user_input: str) -> dict:
+    """
+    分層判斷意圖：先用本地規則 / n-gram 模型，信心不足才呼叫 LLM。
+    回傳的 tier 為 rule、model 或 llm，confidence 為本地判斷的信心（LLM 為 None）。
+    """
+    local = _local_intent(user_input)
+    if local:
+        return local
     prompt = build_intent_prompt(user_input)
     print("[intent_analyzer] prompt:\n", prompt)
     reply = call_llm(
         model="gpt-4.1-mini",
-        messages=[
-            {"role": "system", "content": "你是一個意圖分類助手。"},
-            {"role": "user", "content": prompt}
-        ],
+        messages=build_intent_messages(prompt),
         temperature=0
     )
     print("[intent_analyzer] LLM 回傳:", reply)
-    try:
-        result = json.loads(reply)
-        print("[intent_analyzer] 解析結果:", result)
-        return result
-    except Exception as e:
-        print(f"[intent_analyzer] 解析失敗: {e}")
-        return {"intent": "other", "reason": f"解析失敗: {e}", "raw": reply} 
\ No newline at end of file
+    return _llm_intent_result(user_input, reply)
+
+async def intent_analyzer_async(user_input: str) -> dict:
+    """
+    intent_analyzer 的 async 版本。
+    """
+    local = _local_intent(user_input)
+    if local:
+        return local
+    prompt = build_intent_prompt(user_input)
+    reply = await call_llm_async(
+        model="gpt-4.1-mini",
+        messages=build_intent_messages(prompt),
+        temperature=0
+    )
+    print("[intent_analyzer] LLM 回傳:", reply)
+    return _llm_intent_result(user_input, reply)
@@ -0,0 +1,199 @@
+"""
+本地意圖分類（intent_analyzer 的快速路徑）：
+1. 規則：問候 / 道謝 → chat，明確給 topic_id → tool_call
+2. 字元 n-gram Naive Bayes 模型：由 LLM 判斷過的紀錄離線訓練
+信心不足時回傳 None，交給 LLM 判斷。
+
+訓練：python -m src.orchestrator_utils.intent_classifier --log logs/intent_decisions.jsonl --output data/intent_model.json
+"""
+import argparse
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+# 本地判斷的信心門檻，低於門檻交給 LLM
+INTENT_LOCAL_MIN_CONFIDENCE = float(os.getenv("INTENT_LOCAL_MIN_CONFIDENCE", "0.9"))
+# 離線訓練好的模型檔；未設定或不存在時只用規則
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", "")
+# 設定後把 LLM 的判斷寫成 JSONL，作為下次訓練的資料
+INTENT_LOG_PATH = os.getenv("INTENT_LOG_PATH", "")
+# 訓練資料太少時模型不可信，不使用
+INTENT_MODEL_MIN_EXAMPLES = int(os.getenv("INTENT_MODEL_MIN_EXAMPLES", "30"))
+
+_RULE_TAIL = r"[\s!！。.,，~～?？:)）]*(你|您|啦|喔|囉)?[\s!！。.~～]*$"
+_GREETING_RE = re.compile(
+    r"^(hi|hello|hey|yo|thanks|thank you|thx|bye|good (morning|night)|"
+    r"嗨|哈囉|哈嘍|你好|您好|早安|午安|晚安|謝謝|謝啦|感謝|多謝|掰掰|再見)" + _RULE_TAIL,
+    re.IGNORECASE
+)
+# 「好的」「ok」「收到」這類回應在對話中常是答應上一輪助理的提議（例如「要幫你查分數嗎？」），只在沒有先前對話時才當成閒聊
+_ACK_RE = re.compile(r"^(ok|okay|好的|好喔|好|收到)" + _RULE_TAIL, re.IGNORECASE)
+_TOPIC_ID_RE = re.compile(r"topic[_ ]?id\s*(=|:|：|為|是)\s*[\w\-]+", re.IGNORECASE)
+
+def split_conversation(user_input: str) -> Tuple[str, bool]:
+    """
+    從前端組好的多輪對話（User: / Assistant: / Tool: 逐行）取出最新一則用戶輸入，並回傳是否有先前的對話。
+    """
+    lines = [line for line in str(user_input or "").splitlines() if line.strip()]
+    user_lines = [i for i, line in enumerate(lines) if line.startswith("User:")]
+    if not user_lines:
+        return str(user_input or "").strip(), False
+    last = user_lines[-1]
+    return lines[last][len("User:"):].strip(), last > 0
+
+def classify_by_rules(text: str, has_history: bool = False) -> Optional[Dict]:
+    if _GREETING_RE.match(text):
+        return {"intent": "chat", "reason": "問候或道謝", "confidence": 0.98}
+    if _ACK_RE.match(text) and not has_history:
+        return {"intent": "chat", "reason": "沒有先前對話的單純回應", "confidence": 0.95}
+    if _TOPIC_ID_RE.search(text):
+        return {"intent": "tool_call", "reason": "明確指定 topic_id", "confidence": 0.97}
+    return None
+
+def _features(text: str, has_history: bool, n: int = 2):
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    grams = [ch for ch in text if not ch.isspace()]
+    padded = f"^{text}$"
+    grams += [padded[i:i + n] for i in range(len(padded) - n + 1)]
+    grams.append("<history>" if has_history else "<no_history>")
+    return grams
+
+class NgramIntentModel:
+    """
+    字元 unigram + bigram 的 multinomial Naive Bayes（Laplace smoothing）。
+    """
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+        self.class_counts = Counter()
+        self.gram_counts: Dict[str, Counter] = {}
+        self.vocab = set()
+
+    @property
+    def examples(self) -> int:
+        return sum(self.class_counts.values())
+
+    def fit(self, samples: Iterable[Tuple[str, bool, str]]) -> "NgramIntentModel":
+        for text, has_history, intent in samples:
+            self.class_counts[intent] += 1
+            counts = self.gram_counts.setdefault(intent, Counter())
+            for gram in _features(text, has_history):
+                counts[gram] += 1
+                self.vocab.add(gram)
+        return self
+
+    def predict(self, text: str, has_history: bool) -> Tuple[Optional[str], float]:
+        if not self.class_counts:
+            return None, 0.0
+        grams = _features(text, has_history)
+        total = self.examples
+        vocab_size = len(self.vocab) + 1
+        scores = {}
+        for intent, count in self.class_counts.items():
+            counts = self.gram_counts[intent]
+            denom = sum(counts.values()) + self.alpha * vocab_size
+            score = math.log(count / total)
+            for gram in grams:
+                score += math.log((counts.get(gram, 0) + self.alpha) / denom)
+            scores[intent] = score
+        best = max(scores, key=scores.get)
+        # softmax 轉成機率作為信心
+        norm = sum(math.exp(s - scores[best]) for s in scores.values())
+        return best, 1.0 / norm
+
+    def to_dict(self) -> Dict:
+        return {"alpha": self.alpha, "class_counts": dict(self.class_counts), "gram_counts": {k: dict(v) for k, v in self.gram_counts.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "NgramIntentModel":
+        model = cls(alpha=data.get("alpha", 1.0))
+        model.class_counts = Counter(data.get("class_counts", {}))
+        model.gram_counts = {k: Counter(v) for k, v in data.get("gram_counts", {}).items()}
+        model.vocab = {gram for counts in model.gram_counts.values() for gram in counts}
+        return model
+
+    def save(self, path: str):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "NgramIntentModel":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+def read_decision_log(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get("intent") and record.get("text"):
+                yield record["text"], bool(record.get("has_history")), record["intent"]
+
+_LOG_LOCK = threading.Lock()
+
+def log_intent_decision(text: str, has_history: bool, intent: str, path: str = None):
+    """
+    記錄 LLM 判斷的結果（設定 INTENT_LOG_PATH 才會寫入）。
+    """
+    path = INTENT_LOG_PATH if path is None else path
+    if not path or not intent:
+        return
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with _LOG_LOCK, open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"text": text, "has_history": has_history, "intent": intent}, ensure_ascii=False) + "\n")
+
+_MODEL: Optional[NgramIntentModel] = None
+_MODEL_LOADED = False
+
+def get_intent_model() -> Optional[NgramIntentModel]:
+    global _MODEL, _MODEL_LOADED
+    if not _MODEL_LOADED:
+        _MODEL_LOADED = True
+        if INTENT_MODEL_PATH and os.path.exists(INTENT_MODEL_PATH):
+            _MODEL = NgramIntentModel.load(INTENT_MODEL_PATH)
+    return _MODEL
+
+def use_intent_model(model: Optional[NgramIntentModel]):
+    """
+    替換使用中的模型（None 表示停用），主要給測試與重新訓練後熱更新使用。
+    """
+    global _MODEL, _MODEL_LOADED
+    _MODEL, _MODEL_LOADED = model, True
+
+def classify_locally(user_input: str, min_confidence: float = None) -> Optional[Dict]:
+    """
+    依序嘗試規則與 n-gram 模型，信心達門檻時回傳 {"intent", "reason", "tier", "confidence"}，否則回傳 None。
+    """
+    min_confidence = INTENT_LOCAL_MIN_CONFIDENCE if min_confidence is None else min_confidence
+    text, has_history = split_conversation(user_input)
+    result = classify_by_rules(text, has_history)
+    if result and result["confidence"] >= min_confidence:
+        return {**result, "tier": "rule"}
+    model = get_intent_model()
+    if model is not None and model.examples >= INTENT_MODEL_MIN_EXAMPLES:
+        intent, confidence = model.predict(text, has_history)
+        if intent and confidence >= min_confidence:
+            return {"intent": intent, "reason": "本地 n-gram 模型判斷", "tier": "model", "confidence": round(confidence, 4)}
+    return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="從 intent 判斷紀錄訓練本地 n-gram 意圖模型")
+    parser.add_argument("--log", required=True, help="INTENT_LOG_PATH 產生的 JSONL")
+    parser.add_argument("--output", required=True, help="輸出模型檔（JSON），設定為 INTENT_MODEL_PATH 使用")
+    parser.add_argument("--alpha", type=float, default=1.0)
+    args = parser.parse_args()
+    model = NgramIntentModel(alpha=args.alpha).fit(read_decision_log(args.log))
+    model.save(args.output)
+    print(f"訓練完成：{model.examples} 筆，類別 {dict(model.class_counts)}")
@@ -1,16 +1,40 @@
-import openai
-from typing import List, Dict
+from typing import AsyncIterator, Iterator, List, Dict
+from src.utils.llm_pool import chat_completion, chat_completion_async, chat_completion_stream, chat_completion_stream_async
 
 def call_llm(model: str, messages: List[Dict], temperature: float = 0) -> str:
     """
     呼叫 OpenAI LLM，回傳 content 字串。
     """
     try:
-        response = openai.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=temperature
-        )
-        return response.choices[0].message.content
+        return chat_completion(model=model, messages=messages, temperature=temperature)
     except Exception as e:
-        raise Exception(f"OpenAI API 錯誤: {e}") 
\ No newline at end of file
+        raise Exception(f"OpenAI API 錯誤: {e}")
+
+async def call_llm_async(model: str, messages: List[Dict], temperature: float = 0) -> str:
+    """
+    call_llm 的 async 版本，不阻塞 event loop。
+    """
+    try:
+        return await chat_completion_async(model=model, messages=messages, temperature=temperature)
+    except Exception as e:
+        raise Exception(f"OpenAI API 錯誤: {e}")
+
+def call_llm_stream(model: str, messages: List[Dict], temperature: float = 0) -> Iterator[str]:
+    """
+    串流呼叫 OpenAI LLM，逐段 yield 收到的 token 文字。
+    """
+    try:
+        for delta in chat_completion_stream(model=model, messages=messages, temperature=temperature):
+            yield delta
+    except Exception as e:
+        raise Exception(f"OpenAI API 錯誤: {e}")
+
+async def call_llm_stream_async(model: str, messages: List[Dict], temperature: float = 0) -> AsyncIterator[str]:
+    """
+    call_llm_stream 的 async 版本，給 SSE endpoint 使用。
+    """
+    try:
+        async for delta in chat_completion_stream_async(model=model, messages=messages, temperature=temperature):
+            yield delta
+    except Exception as e:
+        raise Exception(f"OpenAI API 錯誤: {e}")
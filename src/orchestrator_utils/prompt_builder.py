@@ -1,26 +1,64 @@
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Union
 import json
 
-def build_single_turn_prompt(tool_brief: List[Dict], user_prompt: str) -> Tuple[str, str]:
+# 版面原則：system prompt 只放固定說明 + 工具清單（靜態前綴，可命中 prompt prefix cache），
+# 每次請求不同的內容（使用者輸入、歷程）一律放在後面的 user message。
+
+def serialize_tool_brief(tool_brief: List[Dict]) -> str:
+    return json.dumps(tool_brief, ensure_ascii=False, indent=2)
+
+def _catalogue_text(tool_brief: Union[str, List[Dict]]) -> str:
+    # 已序列化的工具清單（get_tool_catalogue）直接使用，不再重新 json.dumps
+    if isinstance(tool_brief, str):
+        return tool_brief
+    return serialize_tool_brief(tool_brief)
+
+def build_single_turn_prompt(tool_brief: Union[str, List[Dict]], user_prompt: str, candidate_ids: List[str] = None) -> Tuple[str, str]:
+    # tool_brief 放完整工具清單（每個 registry 版本固定）；這次可選的工具（candidate_ids）每次不同，放在 user message
     system_prompt = (
         "你是一個工具調度助理，根據使用者輸入與下列工具清單，"
         "請判斷最適合的工具 id 及其參數，並以 JSON 格式回覆："
         '{"tool_id": "...", "parameters": {...}}。\n'
+        "若使用者訊息列出了可選工具，只能從中選擇。\n"
         "工具清單如下：\n"
-        f"{json.dumps(tool_brief, ensure_ascii=False, indent=2)}"
+        f"{_catalogue_text(tool_brief)}"
     )
     user_prompt_full = f"使用者輸入：{user_prompt}"
+    if candidate_ids is not None:
+        user_prompt_full += "\n可選工具：" + json.dumps(list(candidate_ids), ensure_ascii=False)
     return system_prompt, user_prompt_full
 
-def build_multi_turn_step_prompt(tool_brief: List[Dict], history: List[Dict], query: str) -> Tuple[str, str]:
+def build_multi_turn_step_prompt(tool_brief: Union[str, List[Dict]], history: List[Dict], query: str, history_json: str = None) -> Tuple[str, str]:
+    # history_json：server 端 session 已逐步序列化好的歷程，直接使用
     system_prompt = (
         "你是一個多輪推理的工具調度助理，根據用戶需求和目前查到的內容，"
         "請自動規劃下一步要用哪個工具（或說已經查完）。\n"
         "如果你發現查詢結果和前幾輪內容高度重複，或已經沒有更多新資訊，請直接回覆 {\"action\": \"finish\", \"reason\": \"已查無更多新資訊，結束查詢\"}，不要無限細分查詢。\n"
-        "目前查詢歷程：" + json.dumps(history, ensure_ascii=False) + "\n"
+        "請用 JSON 格式回覆：{\"tool_id\": \"...\", \"parameters\": {...}, \"action\": \"call_tool\" 或 \"finish\", \"reason\": \"為什麼這樣規劃\"}\n"
+        "如果下一步需要好幾個彼此獨立的查詢（例如同時查兩個子主題），可以一次列出，系統會並行查詢：\n"
+        "{\"tool_calls\": [{\"tool_id\": \"...\", \"parameters\": {...}}, ...], \"action\": \"call_tool\", \"reason\": \"...\"}\n"
+        "工具清單如下：\n" + _catalogue_text(tool_brief)
+    )
+    user_prompt_full = (
+        "目前查詢歷程：" + (history_json if history_json is not None else json.dumps(history, ensure_ascii=False)) + "\n"
         "用戶需求：" + query + "\n"
-        "工具清單如下：\n" + json.dumps(tool_brief, ensure_ascii=False, indent=2) + "\n"
-        "請用 JSON 格式回覆：{\"tool_id\": \"...\", \"parameters\": {...}, \"action\": \"call_tool\" 或 \"finish\", \"reason\": \"為什麼這樣規劃\"}"
+        "請根據目前查到的內容，決定下一步要查什麼，或說已經查完。"
+    )
+    return system_prompt, user_prompt_full 
+
+def build_fused_route_prompt(tool_brief: Union[str, List[Dict]], conversation: str, query: str) -> Tuple[str, str]:
+    """
+    意圖判斷 + 選工具 + 參數抽取合併成一次呼叫的 prompt。
+    """
+    system_prompt = (
+        "你是一個對話路由助理，請一次完成三件事：\n"
+        "1. 判斷用戶最新輸入的意圖（chat、tool_call、history_answer、other）：對話紀錄已有答案回 history_answer，閒聊問候回 chat，需要查詢工具才回 tool_call。\n"
+        "2. 若為 tool_call，從工具清單選出最適合的工具 id。\n"
+        "3. 依該工具的參數定義，從用戶輸入抽取參數（必填參數一定要有值）。\n"
+        "請只回傳 JSON：{\"intent\": \"...\", \"tool_id\": \"...\" 或 null, \"parameters\": {...}, \"reason\": \"簡短理由\"}\n"
+        "工具清單如下：\n"
+        f"{_catalogue_text(tool_brief)}"
     )
-    user_prompt_full = "請根據目前查到的內容，決定下一步要查什麼，或說已經查完。"
-    return system_prompt, user_prompt_full 
\ No newline at end of file
+    user_prompt_full = f"對話紀錄：\n{conversation}\n用戶最新輸入：{query}"
+    return system_prompt, user_prompt_full
+
@@ -0,0 +1,82 @@
+import json
+import re
+from typing import Optional
+
+class JsonStringFieldStreamer:
+    """
+    增量解析串流中的 JSON，邊收邊吐出指定字串欄位的內容。
+    例如 LLM 回覆 {"answer": "...", "reason": "..."} 時，answer 可以在 reason 出現前就開始顯示。
+    """
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self, field: str):
+        self.field = field
+        self.buffer = ""
+        self.state = "search"  # search → value → done
+        self.pos = 0
+        self._key_pattern = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+
+    def feed(self, chunk: str) -> str:
+        """
+        餵入新收到的文字，回傳這次新解出的欄位內容（可能是空字串）。
+        """
+        self.buffer += chunk
+        if self.state == "search":
+            match = self._key_pattern.search(self.buffer)
+            if not match:
+                return ""
+            self.state = "value"
+            self.pos = match.end()
+        if self.state != "value":
+            return ""
+        out = []
+        buf = self.buffer
+        while self.pos < len(buf):
+            ch = buf[self.pos]
+            if ch == '"':
+                self.state = "done"
+                self.pos += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                self.pos += 1
+                continue
+            # 跳脫字元不完整時等下一段再處理
+            if self.pos + 1 >= len(buf):
+                break
+            esc = buf[self.pos + 1]
+            if esc == "u":
+                decoded, consumed = self._decode_unicode(buf, self.pos)
+                if decoded is None:
+                    break
+                out.append(decoded)
+                self.pos += consumed
+            else:
+                out.append(self._ESCAPES.get(esc, esc))
+                self.pos += 2
+        return "".join(out)
+
+    def _decode_unicode(self, buf: str, pos: int):
+        if pos + 6 > len(buf):
+            return None, 0
+        code = int(buf[pos + 2:pos + 6], 16)
+        # surrogate pair 需要兩組 \uXXXX
+        if 0xD800 <= code <= 0xDBFF:
+            if pos + 12 > len(buf):
+                return None, 0
+            if buf[pos + 6:pos + 8] == "\\u":
+                return json.loads('"' + buf[pos:pos + 12] + '"'), 12
+        return chr(code), 6
+
+    @property
+    def done(self) -> bool:
+        return self.state == "done"
+
+    def result(self) -> Optional[dict]:
+        """
+        串流結束後解析完整 JSON，失敗回傳 None。
+        """
+        try:
+            return json.loads(self.buffer)
+        except Exception:
+            return None
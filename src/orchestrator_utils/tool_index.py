@@ -0,0 +1,131 @@
+"""
+工具清單的詞彙索引（BM25）：由每個 agent 的 name、description、tags、category、example_queries 建立，
+依使用者輸入挑出前 k 個最相關的 agent，參數抽取與選工具的 prompt 都只放這些 agent，
+避免 agent 數量增加時 prompt 長度與延遲跟著線性成長。
+
+評估召回率：python -m src.orchestrator_utils.tool_index --queries labelled.jsonl --k 3
+（每行 {"query": "...", "agent_id": "..."}；省略 --queries 時以各 agent 的 example_queries 評估）
+"""
+import argparse
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# 每次查詢保留的 agent 數；0 表示不篩選
+TOOL_SHORTLIST_K = int(os.getenv("TOOL_SHORTLIST_K", "5"))
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+def tokenize(text: str) -> List[str]:
+    """
+    英數字以單字為 token，中文以單字 + 相鄰兩字（bigram）為 token。
+    """
+    text = unicodedata.normalize("NFKC", str(text or "")).lower()
+    tokens = re.findall(r"[a-z0-9_]+", text)
+    for run in re.findall(r"[㐀-鿿]+", text):
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+def agent_document(agent: Dict) -> str:
+    parts = [agent.get("id", ""), agent.get("name", ""), agent.get("description", ""), agent.get("category", "")]
+    parts += list(agent.get("tags", []) or [])
+    parts += list(agent.get("example_queries", []) or [])
+    return " ".join(str(p) for p in parts if p)
+
+class ToolIndex:
+    def __init__(self, agent_list: List[Dict]):
+        self.agent_list = list(agent_list)
+        self.doc_tokens = [Counter(tokenize(agent_document(a))) for a in self.agent_list]
+        self.doc_lengths = [sum(c.values()) for c in self.doc_tokens]
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        df = Counter()
+        for counts in self.doc_tokens:
+            df.update(counts.keys())
+        n = len(self.agent_list)
+        self.idf = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+
+    def scores(self, query: str) -> List[float]:
+        query_tokens = set(tokenize(query))
+        result = []
+        for counts, length in zip(self.doc_tokens, self.doc_lengths):
+            score = 0.0
+            for token in query_tokens:
+                tf = counts.get(token, 0)
+                if not tf:
+                    continue
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / (self.avg_length or 1))
+                score += self.idf[token] * tf * (BM25_K1 + 1) / norm
+            result.append(score)
+        return result
+
+    def search(self, query: str, k: int = None) -> List[Tuple[Dict, float]]:
+        """
+        依分數排序回傳 (agent, score)；同分維持 registry 順序。
+        """
+        ranked = sorted(zip(self.agent_list, self.scores(query)), key=lambda item: -item[1])
+        return ranked[:k] if k else ranked
+
+    def shortlist(self, query: str, k: int = None) -> List[Dict]:
+        """
+        前 k 個相關的 agent（維持 registry 順序）。agent 數不超過 k、或所有分數都是 0 時回傳全部。
+        """
+        k = TOOL_SHORTLIST_K if k is None else k
+        if k <= 0 or len(self.agent_list) <= k:
+            return list(self.agent_list)
+        ranked = self.search(query)
+        if ranked[0][1] <= 0:
+            return list(self.agent_list)
+        keep = {id(agent) for agent, _ in ranked[:k]}
+        return [a for a in self.agent_list if id(a) in keep]
+
+def evaluate_recall(index: ToolIndex, labelled: List[Dict], k: int = None) -> Dict:
+    """
+    labelled 為 [{"query", "agent_id"}]，回傳 recall@k 與沒被選進 shortlist 的查詢。
+    """
+    k = TOOL_SHORTLIST_K if k is None else k
+    misses = []
+    for item in labelled:
+        ids = [a["id"] for a in index.shortlist(item["query"], k)]
+        if item["agent_id"] not in ids:
+            misses.append({"query": item["query"], "agent_id": item["agent_id"], "shortlist": ids})
+    total = len(labelled)
+    return {"k": k, "total": total, "recall": (total - len(misses)) / total if total else 1.0, "misses": misses}
+
+_INDEX: Optional[ToolIndex] = None
+_INDEX_KEY = None
+_INDEX_LOCK = threading.Lock()
+
+def get_tool_index(agent_list: List[Dict]) -> ToolIndex:
+    """
+    同一組 agent（registry 內的 dict 物件不變）只建一次索引；索引本身持有這些 dict，id 不會被重用。
+    """
+    global _INDEX, _INDEX_KEY
+    key = tuple(id(a) for a in agent_list)
+    with _INDEX_LOCK:
+        if _INDEX is None or _INDEX_KEY != key:
+            _INDEX = ToolIndex(agent_list)
+            _INDEX_KEY = key
+        return _INDEX
+
+def shortlist_agents(query: str, agent_list: List[Dict], k: int = None) -> List[Dict]:
+    return get_tool_index(agent_list).shortlist(query, k)
+
+if __name__ == "__main__":
+    from src.agent_registry import get_agent_list
+    parser = argparse.ArgumentParser(description="評估工具 shortlist 的召回率")
+    parser.add_argument("--queries", help="JSONL，每行 {\"query\": ..., \"agent_id\": ...}")
+    parser.add_argument("--k", type=int, default=TOOL_SHORTLIST_K)
+    args = parser.parse_args()
+    agents = get_agent_list()
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            labelled = [json.loads(line) for line in f if line.strip()]
+    else:
+        labelled = [{"query": q, "agent_id": a["id"]} for a in agents for q in a.get("example_queries", [])]
+    print(json.dumps(evaluate_recall(ToolIndex(agents), labelled, args.k), ensure_ascii=False, indent=2))
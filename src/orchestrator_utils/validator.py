@@ -1,4 +1,5 @@
 import json
+import re
 from typing import Any, Dict, List, Optional
 
 def parse_llm_json_reply(reply: str, required_keys: Optional[List[str]] = None) -> Dict[str, Any]:
@@ -13,4 +14,82 @@ def parse_llm_json_reply(reply: str, required_keys: Optional[List[str]] = None)
         for k in required_keys:
             if k not in parsed:
                 raise Exception(f"缺少必填欄位: {k}")
-    return parsed 
\ No newline at end of file
+    return parsed 
+
+INTENTS = ["chat", "tool_call", "history_answer", "other"]
+
+def _coerce_value(value: Any, ptype: str):
+    if ptype == "int":
+        if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+            raise ValueError
+        return int(value)
+    if ptype == "float":
+        if isinstance(value, bool):
+            raise ValueError
+        return float(value)
+    if ptype == "bool":
+        if isinstance(value, bool):
+            return value
+        if str(value).lower() in ["true", "1", "yes"]:
+            return True
+        if str(value).lower() in ["false", "0", "no"]:
+            return False
+        raise ValueError
+    if ptype == "list":
+        if not isinstance(value, list):
+            raise ValueError
+        return value
+    if isinstance(value, (dict, list)):
+        raise ValueError
+    return str(value)
+
+def validate_tool_parameters(params: Any, parameters: List[Dict]) -> Dict[str, Any]:
+    """
+    依 agent 的 parameters 定義檢查並轉換參數型別（必填、type、enum、min/max、pattern），失敗則 raise Exception。
+    未定義的多餘參數會被移除。
+    """
+    if params is None:
+        params = {}
+    if not isinstance(params, dict):
+        raise Exception("parameters 必須是 JSON 物件")
+    result = {}
+    for p in parameters:
+        name = p["name"]
+        required = p.get("required", "default" not in p)
+        value = params.get(name)
+        if value in [None, "", []]:
+            if required:
+                raise Exception(f"缺少必填參數: {name}")
+            continue
+        try:
+            value = _coerce_value(value, p.get("type", "str"))
+        except (TypeError, ValueError):
+            raise Exception(f"參數 {name} 型別應為 {p.get('type', 'str')}: {value!r}")
+        if p.get("enum") and value not in p["enum"]:
+            raise Exception(f"參數 {name} 必須是 {p['enum']} 之一: {value!r}")
+        if p.get("min") is not None and value < p["min"]:
+            raise Exception(f"參數 {name} 不可小於 {p['min']}: {value!r}")
+        if p.get("max") is not None and value > p["max"]:
+            raise Exception(f"參數 {name} 不可大於 {p['max']}: {value!r}")
+        if p.get("pattern") and not re.match(p["pattern"], str(value)):
+            raise Exception(f"參數 {name} 格式不符: {value!r}")
+        result[name] = value
+    return result
+
+def validate_fused_reply(reply: str, agent_list: List[Dict]) -> Dict[str, Any]:
+    """
+    檢查合併路由（intent + tool + parameters）的 LLM 回覆，失敗則 raise Exception。
+    tool_call 時回傳的 dict 會多一個 tool（agent dict），parameters 為驗證、轉型後的值。
+    """
+    parsed = parse_llm_json_reply(reply, required_keys=["intent"])
+    if parsed["intent"] not in INTENTS:
+        raise Exception(f"未知的 intent: {parsed['intent']}")
+    if parsed["intent"] != "tool_call":
+        return parsed
+    tool = next((t for t in agent_list if t["id"] == parsed.get("tool_id")), None)
+    if tool is None:
+        raise Exception(f"找不到工具 {parsed.get('tool_id')}")
+    parsed["parameters"] = validate_tool_parameters(parsed.get("parameters"), tool.get("parameters", []))
+    parsed["tool"] = tool
+    return parsed
+
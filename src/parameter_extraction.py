@@ -1,6 +1,18 @@
 import re
-from src.tools.openai_tool import openai_query_llm
+import os
+import asyncio
+from src.tools.openai_tool import openai_query_llm, openai_query_llm_async
+from src.utils.llm_pool import run_sync_with_llm
 import json
+from typing import Dict, List, Optional
+
+# 參數抽取模式：sequential（每個 agent 各問一次）、batch（所有 agent 合併成一次 LLM 呼叫）、concurrent（每個 agent 各問一次但同時送出）
+PARAM_EXTRACTION_MODE = os.getenv("PARAM_EXTRACTION_MODE", "sequential")
+# concurrent 模式下同時進行的抽取數上限，與單一 agent 抽取的逾時秒數
+PARAM_EXTRACTION_MAX_CONCURRENCY = int(os.getenv("PARAM_EXTRACTION_MAX_CONCURRENCY", "5"))
+PARAM_EXTRACTION_TIMEOUT = float(os.getenv("PARAM_EXTRACTION_TIMEOUT", "15"))
+# batch 模式下，單一 prompt 內工具參數描述的字元上限，超過自動切成多個 chunk
+BATCH_MAX_SCHEMA_CHARS = int(os.getenv("PARAM_EXTRACTION_BATCH_MAX_CHARS", "3000"))
 
 def get_required_params(parameters: list) -> list:
     """
@@ -17,37 +29,226 @@ def get_required_params(parameters: list) -> list:
             required.append(p["name"])
     return required
 
-def extract_parameters_from_query(query, tool_parameters):
+def describe_parameters(tool_parameters: list) -> str:
     """
-    使用 OpenAI LLM 進行參數抽取，回傳 dict 或 None。
-    只檢查必填參數。
+    將 tool_parameters 轉成簡潔描述，例如：topic_id（str，必填）, depth（int）
     """
     required_names = get_required_params(tool_parameters)
-    # 將 tool_parameters 轉成簡潔描述
-    param_desc = ", ".join([f'{p["name"]}（{p["type"]}，必填）' if p["name"] in required_names else f'{p["name"]}（{p["type"]}）' for p in tool_parameters])
+    return ", ".join([f'{p["name"]}（{p["type"]}，必填）' if p["name"] in required_names else f'{p["name"]}（{p["type"]}）' for p in tool_parameters])
+
+def check_required_params(result, tool_parameters: list) -> Optional[Dict]:
+    """
+    檢查 LLM 抽取結果是否包含所有必填參數，通過回傳 dict，否則回傳 None。
+    """
+    if not result or not isinstance(result, dict):
+        return None
+    for name in get_required_params(tool_parameters):
+        if name not in result or result[name] in [None, "", []]:
+            return None
+    return result
+
+def build_extraction_prompt(query, tool_parameters):
+    """
+    組合單一 agent 參數抽取的 instructions 與 user input。
+    """
+    param_desc = describe_parameters(tool_parameters)
     instructions = (
         "你是一個參數抽取助手。請根據下方工具需求，從 user query 中抽取對應參數，忽略無關數字與列點。\n"
         "請只回傳 JSON 格式（如 {\"a\": 3, \"b\": 5}），若無法抽取請回傳 null。\n"
         "工具需求參數: " + param_desc
     )
     user_input = f"User query: {query}\n請回傳:"
-    llm_output = openai_query_llm(instructions=instructions, input=user_input)
+    return instructions, user_input
+
+def parse_extraction_reply(llm_output, tool_parameters):
+    """
+    解析 LLM 抽取結果，格式錯誤或缺必填參數回傳 None。
+    """
     try:
         result = json.loads(llm_output)
-        if not result:
-            return None
-        # 僅檢查必填欄位
-        for name in required_names:
-            if name not in result or result[name] in [None, ""]:
-                return None
-        return result
+        return check_required_params(result, tool_parameters)
     except Exception:
         return None
 
-def filter_available_tools(query, agent_list):
+def extract_parameters_from_query(query, tool_parameters):
+    """
+    使用 OpenAI LLM 進行參數抽取，回傳 dict 或 None。
+    只檢查必填參數。
+    """
+    instructions, user_input = build_extraction_prompt(query, tool_parameters)
+    llm_output = openai_query_llm(instructions=instructions, input=user_input, temperature=0)
+    return parse_extraction_reply(llm_output, tool_parameters)
+
+async def extract_parameters_from_query_async(query, tool_parameters):
+    """
+    extract_parameters_from_query 的 async 版本，使用共用 AsyncOpenAI client，不阻塞 event loop。
+    """
+    instructions, user_input = build_extraction_prompt(query, tool_parameters)
+    try:
+        llm_output = await openai_query_llm_async(instructions=instructions, input=user_input, temperature=0)
+    except Exception as e:
+        print(f"[extract_parameters_from_query_async] 抽取失敗: {e}")
+        return None
+    return parse_extraction_reply(llm_output, tool_parameters)
+
+def chunk_agents_by_schema_size(agent_list: List[Dict], max_chars: int = BATCH_MAX_SCHEMA_CHARS) -> List[List[Dict]]:
+    """
+    依參數描述長度把 agent 切成多個 chunk，避免單一 prompt 過長。
+    單一 agent 描述超過上限時，自己成為一個 chunk。
+    """
+    chunks = []
+    current = []
+    current_size = 0
+    for agent in agent_list:
+        size = len(agent.get("id", "")) + len(describe_parameters(agent.get("parameters", [])))
+        if current and current_size + size > max_chars:
+            chunks.append(current)
+            current = []
+            current_size = 0
+        current.append(agent)
+        current_size += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+def build_batch_extraction_prompt(query, chunk: List[Dict]):
+    """
+    組合 batch 模式的 instructions 與 user input（一個 chunk 一次呼叫）。
+    """
+    schema_lines = "\n".join([
+        f'- {a["id"]}（{a.get("name", a["id"])}）: {describe_parameters(a.get("parameters", []))}'
+        for a in chunk
+    ])
+    instructions = (
+        "你是一個參數抽取助手。下方列出多個工具與各自需要的參數，請針對每個工具獨立判斷，從 user query 中抽取對應參數，忽略無關數字與列點。\n"
+        "請只回傳一個 JSON 物件，key 為工具 id，value 為該工具的參數 JSON（如 {\"a\": 3, \"b\": 5}），若該工具無法抽取請填 null。\n"
+        "例如：{\"tool_x\": {\"a\": 3}, \"tool_y\": null}\n"
+        "工具需求參數:\n" + schema_lines
+    )
+    user_input = f"User query: {query}\n請回傳:"
+    return instructions, user_input
+
+def parse_batch_extraction_reply(llm_output, chunk: List[Dict]) -> Dict[str, Optional[Dict]]:
+    try:
+        parsed = json.loads(llm_output)
+        if not isinstance(parsed, dict):
+            parsed = {}
+    except Exception as e:
+        print(f"[extract_parameters_batch] chunk 解析失敗: {e}")
+        parsed = {}
+    return {a["id"]: check_required_params(parsed.get(a["id"]), a.get("parameters", [])) for a in chunk}
+
+def extract_parameters_batch(query, agent_list: List[Dict], max_schema_chars: int = BATCH_MAX_SCHEMA_CHARS) -> Dict[str, Optional[Dict]]:
+    """
+    一次 LLM 呼叫抽取多個 agent 的參數，回傳 {agent_id: 抽取結果或 None}。
+    工具清單過長時自動切成多個 chunk，每個 chunk 一次呼叫。
+    """
+    extracted = {}
+    for chunk in chunk_agents_by_schema_size(agent_list, max_schema_chars):
+        instructions, user_input = build_batch_extraction_prompt(query, chunk)
+        try:
+            llm_output = openai_query_llm(instructions=instructions, input=user_input, temperature=0)
+        except Exception as e:
+            print(f"[extract_parameters_batch] chunk 抽取失敗: {e}")
+            llm_output = None
+        extracted.update(parse_batch_extraction_reply(llm_output, chunk))
+    return extracted
+
+async def extract_parameters_batch_async(query, agent_list: List[Dict], max_schema_chars: int = BATCH_MAX_SCHEMA_CHARS) -> Dict[str, Optional[Dict]]:
+    """
+    extract_parameters_batch 的 async 版本，多個 chunk 同時送出。
+    """
+    async def extract_chunk(chunk):
+        instructions, user_input = build_batch_extraction_prompt(query, chunk)
+        try:
+            llm_output = await openai_query_llm_async(instructions=instructions, input=user_input, temperature=0)
+        except Exception as e:
+            print(f"[extract_parameters_batch_async] chunk 抽取失敗: {e}")
+            llm_output = None
+        return parse_batch_extraction_reply(llm_output, chunk)
+
+    extracted = {}
+    chunks = chunk_agents_by_schema_size(agent_list, max_schema_chars)
+    for chunk_result in await asyncio.gather(*[extract_chunk(c) for c in chunks]):
+        extracted.update(chunk_result)
+    return extracted
+
+def build_filter_entry(agent, extracted) -> Dict:
+    """
+    組合單一 agent 的 filter_result 項目。
+    """
+    params = agent.get("parameters", [])
+    required_names = get_required_params(params)
+    available = extracted is not None and all(name in extracted for name in required_names)
+    return {
+        "agent_id": agent.get("id"),
+        "agent_name": agent.get("name"),
+        "extracted_params": extracted,
+        "available": available
+    }
+
+async def filter_available_tools_async(query, agent_list, max_concurrency: int = None, timeout: float = None, mode: str = None):
+    """
+    concurrent 模式：同時對所有有參數的 agent 做參數抽取，結果依 agent_list 順序組合。
+    max_concurrency 限制同時進行的抽取數；單一 agent 超過 timeout 秒視為不可用，不拖住整個 request。
+    mode 為 batch 時改用 extract_parameters_batch_async；async 路徑下 sequential 視同 concurrent。
+    """
+    mode = mode or PARAM_EXTRACTION_MODE
+    if mode == "batch":
+        param_agents = [a for a in agent_list if a.get("parameters", [])]
+        batch_extracted = await extract_parameters_batch_async(query, param_agents) if param_agents else {}
+        return [
+            build_filter_entry(a, batch_extracted.get(a.get("id"))) if a.get("parameters", [])
+            else {"agent_id": a.get("id"), "agent_name": a.get("name"), "extracted_params": {}, "available": True}
+            for a in agent_list
+        ]
+    max_concurrency = max_concurrency or PARAM_EXTRACTION_MAX_CONCURRENCY
+    timeout = timeout or PARAM_EXTRACTION_TIMEOUT
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def extract(agent):
+        async with semaphore:
+            try:
+                extracted = await asyncio.wait_for(
+                    extract_parameters_from_query_async(query, agent.get("parameters", [])),
+                    timeout=timeout
+                )
+                return build_filter_entry(agent, extracted)
+            except asyncio.TimeoutError:
+                print(f"[filter_available_tools_async] {agent.get('id')} 參數抽取逾時（{timeout}s）")
+                entry = build_filter_entry(agent, None)
+                entry["error"] = f"參數抽取逾時（{timeout}s）"
+                return entry
+
+    param_agents = [a for a in agent_list if a.get("parameters", [])]
+    entries = iter(await asyncio.gather(*[extract(a) for a in param_agents]))
+    result = []
+    for agent in agent_list:
+        if not agent.get("parameters", []):
+            # 無參數工具預設 available
+            result.append({
+                "agent_id": agent.get("id"),
+                "agent_name": agent.get("name"),
+                "extracted_params": {},
+                "available": True
+            })
+        else:
+            result.append(next(entries))
+    return result
+
+def filter_available_tools(query, agent_list, mode: str = None):
     """
     根據 user query 與 agent_list，回傳所有 agent 的 available 狀態與參數抽取結果。
+    mode: sequential（逐一抽取）、batch（合併成一次 LLM 呼叫）或 concurrent（同時抽取），預設讀 PARAM_EXTRACTION_MODE。
     """
+    mode = mode or PARAM_EXTRACTION_MODE
+    if mode == "concurrent":
+        # 每次 run_sync 都是新的 event loop，用完關閉該 loop 的 AsyncOpenAI 連線池
+        return run_sync_with_llm(filter_available_tools_async(query, agent_list, mode="concurrent"))
+    param_agents = [a for a in agent_list if a.get("parameters", [])]
+    batch_extracted = {}
+    if mode == "batch" and param_agents:
+        batch_extracted = extract_parameters_batch(query, param_agents)
     result = []
     for agent in agent_list:
         params = agent.get("parameters", [])
@@ -60,15 +261,11 @@ def filter_available_tools(query, agent_list):
                 "available": True
             })
             continue
-        extracted = extract_parameters_from_query(query, params)
-        required_names = get_required_params(params)
-        available = extracted is not None and all(name in extracted for name in required_names)
-        result.append({
-            "agent_id": agent.get("id"),
-            "agent_name": agent.get("name"),
-            "extracted_params": extracted,
-            "available": available
-        })
+        if mode == "batch":
+            extracted = batch_extracted.get(agent.get("id"))
+        else:
+            extracted = extract_parameters_from_query(query, params)
+        result.append(build_filter_entry(agent, extracted))
     return result
 
 def llm_extract_parameters(query, tool_parameters):
@@ -78,4 +275,4 @@ def llm_extract_parameters(query, tool_parameters):
     # 只做簡單情境判斷，方便 TDD
     if "加 3 跟 5" in query:
         return {"a": 3, "b": 5}
-    return None 
\ No newline at end of file
+    return None
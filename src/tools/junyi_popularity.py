@@ -0,0 +1,172 @@
+"""
+均一主題熱門度統計：記錄每個 topic 被查詢的次數（可選 sqlite 持久化，重啟後供 warmup 使用），
+同一個 topic 每被瀏覽 JUNYI_PREFETCH_THRESHOLD 次，就在背景預先抓取它的子主題。
+"""
+import os
+import sqlite3
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+JUNYI_PREFETCH_ENABLED = os.getenv("JUNYI_PREFETCH_ENABLED", "1") == "1"
+JUNYI_PREFETCH_THRESHOLD = int(os.getenv("JUNYI_PREFETCH_THRESHOLD", "5"))
+JUNYI_PREFETCH_MAX_CHILDREN = int(os.getenv("JUNYI_PREFETCH_MAX_CHILDREN", "20"))
+# 設定後把瀏覽次數寫入 sqlite，例如 JUNYI_POPULARITY_DB_PATH=.cache/junyi_popularity.sqlite3
+JUNYI_POPULARITY_DB_PATH = os.getenv("JUNYI_POPULARITY_DB_PATH", "")
+# 累積多少筆未寫入的紀錄就寫入一次 sqlite
+JUNYI_POPULARITY_FLUSH_EVERY = int(os.getenv("JUNYI_POPULARITY_FLUSH_EVERY", "20"))
+
+# warmup / 預取自己發出的查詢不列入熱門度
+_TRACKING = ContextVar("junyi_popularity_tracking", default=True)
+
+@contextmanager
+def untracked():
+    token = _TRACKING.set(False)
+    try:
+        yield
+    finally:
+        _TRACKING.reset(token)
+
+def prefetch_children(topic_id: str, max_children: int = JUNYI_PREFETCH_MAX_CHILDREN) -> List[str]:
+    """
+    預取子主題的內容與下一層課程樹，回傳預取的 topic_id。
+    """
+    from src.tools.junyi_snapshot import get_snapshot_index, node_id, node_children
+    from src.tools.junyi_tree_tool import get_junyi_tree
+    from src.tools.junyi_topic_tool import get_junyi_topic
+    with untracked():
+        snapshot = get_snapshot_index()
+        if snapshot is not None and snapshot.children(topic_id):
+            child_ids = [c["topic_id"] for c in snapshot.children(topic_id)]
+        else:
+            tree = get_junyi_tree(topic_id=topic_id, depth=1)
+            child_ids = [node_id(c) for c in node_children(tree)[1] if isinstance(c, dict) and node_id(c)] if isinstance(tree, dict) else []
+        child_ids = child_ids[:max_children]
+        for child_id in child_ids:
+            get_junyi_topic(topic_id=child_id)
+            get_junyi_tree(topic_id=child_id, depth=1)
+    return child_ids
+
+class TopicPopularity:
+    def __init__(self, db_path: str = JUNYI_POPULARITY_DB_PATH, threshold: int = JUNYI_PREFETCH_THRESHOLD,
+                 prefetch_enabled: bool = JUNYI_PREFETCH_ENABLED, prefetch_fn: Callable[[str], List[str]] = prefetch_children):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.prefetch_enabled = prefetch_enabled
+        self.prefetch_fn = prefetch_fn
+        self._counts = Counter()
+        self._dirty = Counter()
+        self._loaded = False
+        self._db = None
+        self._lock = threading.Lock()
+        self._prefetching = set()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="junyi-prefetch")
+        self._stats = {"recorded": 0, "prefetches": 0, "prefetch_errors": 0}
+
+    def _get_db(self):
+        if not self.db_path:
+            return None
+        if self._db is None:
+            folder = os.path.dirname(self.db_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS topic_popularity (topic_id TEXT PRIMARY KEY, count INTEGER)")
+            self._db.commit()
+        return self._db
+
+    def _ensure_loaded(self):
+        # 第一次使用時才讀入持久化的次數
+        if self._loaded:
+            return
+        self._loaded = True
+        db = self._get_db()
+        if db is not None:
+            for topic_id, count in db.execute("SELECT topic_id, count FROM topic_popularity"):
+                self._counts[topic_id] += count
+
+    def record(self, topic_id: str):
+        if not topic_id or not _TRACKING.get():
+            return
+        with self._lock:
+            self._ensure_loaded()
+            self._counts[topic_id] += 1
+            self._dirty[topic_id] += 1
+            self._stats["recorded"] += 1
+            count = self._counts[topic_id]
+            should_flush = sum(self._dirty.values()) >= JUNYI_POPULARITY_FLUSH_EVERY
+        if should_flush:
+            self.flush()
+        if self.prefetch_enabled and self.threshold > 0 and count % self.threshold == 0:
+            self._schedule_prefetch(topic_id)
+
+    def _schedule_prefetch(self, topic_id: str):
+        with self._lock:
+            if topic_id in self._prefetching:
+                return
+            self._prefetching.add(topic_id)
+            self._stats["prefetches"] += 1
+
+        def job():
+            try:
+                self.prefetch_fn(topic_id)
+            except Exception as e:
+                with self._lock:
+                    self._stats["prefetch_errors"] += 1
+                print(f"[TopicPopularity] 預取子主題失敗 {topic_id}: {e}")
+            finally:
+                with self._lock:
+                    self._prefetching.discard(topic_id)
+        return self._executor.submit(job)
+
+    def top(self, n: int = 20) -> List[str]:
+        with self._lock:
+            self._ensure_loaded()
+            return [topic_id for topic_id, _ in self._counts.most_common(n)]
+
+    def flush(self):
+        """
+        把尚未寫入的次數累加進 sqlite（沒有設定 db_path 時只清掉待寫入紀錄）。
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, Counter()
+            db = self._get_db()
+            if db is None or not dirty:
+                return
+            db.executemany(
+                "INSERT INTO topic_popularity (topic_id, count) VALUES (?, ?) "
+                "ON CONFLICT(topic_id) DO UPDATE SET count = count + excluded.count",
+                list(dirty.items())
+            )
+            db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+            self._dirty.clear()
+            self._loaded = False
+            for name in self._stats:
+                self._stats[name] = 0
+            db = self._get_db()
+            if db is not None:
+                db.execute("DELETE FROM topic_popularity")
+                db.commit()
+
+    def stats(self, top_n: int = 10) -> Dict:
+        top = self.top(top_n)
+        with self._lock:
+            return {**self._stats, "topics": len(self._counts), "top": [{"topic_id": t, "count": self._counts[t]} for t in top]}
+
+_POPULARITY: Optional[TopicPopularity] = None
+_POPULARITY_LOCK = threading.Lock()
+
+def get_topic_popularity() -> TopicPopularity:
+    global _POPULARITY
+    if _POPULARITY is None:
+        with _POPULARITY_LOCK:
+            if _POPULARITY is None:
+                _POPULARITY = TopicPopularity()
+    return _POPULARITY
@@ -0,0 +1,186 @@
+"""
+均一課程樹離線快照：從 root 爬到指定深度，存成 sqlite 索引（parent/child 鄰接表＋title），
+get_junyi_tree 可直接用快照回答任意 (topic_id, depth)，快照不足時才打 live API。
+
+建立快照：
+    python -m src.tools.junyi_snapshot --depth 3 --output data/junyi_snapshot.sqlite3
+啟用：設定環境變數 JUNYI_SNAPSHOT_PATH=data/junyi_snapshot.sqlite3
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+JUNYI_SNAPSHOT_PATH = os.getenv("JUNYI_SNAPSHOT_PATH", "")
+
+CHILDREN_KEYS = ("children", "child")
+
+def node_id(node: Dict) -> Optional[str]:
+    return node.get("topic_id") or node.get("id")
+
+def node_children(node: Dict):
+    """
+    回傳 (children 欄位名稱, children list)；Junyi API 可能用 children 或 child。
+    """
+    for key in CHILDREN_KEYS:
+        if isinstance(node.get(key), list):
+            return key, node[key]
+    return None, []
+
+def _node_payload(node: Dict) -> str:
+    return json.dumps({k: v for k, v in node.items() if k not in CHILDREN_KEYS}, ensure_ascii=False)
+
+class SnapshotMiss(Exception):
+    """快照內沒有足夠深度的資料，需改打 live API。"""
+
+def build_junyi_snapshot(output_path: str, fetch: Callable[[str, int], Dict], root_id: str = "root", max_depth: int = 3, max_workers: int = 8) -> Dict:
+    """
+    從 root_id 逐層爬課程樹（每個節點呼叫 fetch(topic_id, 1)），寫入 sqlite 快照。
+    回傳統計資訊。
+    """
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = output_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    db = sqlite3.connect(tmp_path)
+    db.execute("CREATE TABLE nodes (topic_id TEXT PRIMARY KEY, parent_id TEXT, position INTEGER, title TEXT, depth INTEGER, expanded INTEGER, children_key TEXT, payload TEXT)")
+    db.execute("CREATE INDEX idx_nodes_parent ON nodes (parent_id, position)")
+    db.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    rows: Dict[str, list] = {}
+    errors = 0
+    level = [(root_id, None, 0)]  # (topic_id, parent_id, position)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for depth in range(max_depth):
+            if not level:
+                break
+            results = list(executor.map(lambda item: fetch(item[0], 1), level))
+            next_level = []
+            for (topic_id, parent_id, position), data in zip(level, results):
+                if not isinstance(data, dict) or not data or "error" in data:
+                    errors += 1
+                    continue
+                children_key, children = node_children(data)
+                rows[topic_id] = [topic_id, parent_id, position, data.get("title", ""), depth, 1, children_key, _node_payload(data)]
+                for idx, child in enumerate(children):
+                    cid = node_id(child)
+                    if not cid or cid in rows:
+                        continue
+                    # 先以父節點回傳的內容登記，之後若有展開會被自己的完整內容覆蓋
+                    rows[cid] = [cid, topic_id, idx, child.get("title", ""), depth + 1, 0, None, _node_payload(child)]
+                    next_level.append((cid, topic_id, idx))
+            level = next_level
+    db.executemany("INSERT OR REPLACE INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", list(rows.values()))
+    stats = {"root": root_id, "max_depth": max_depth, "nodes": len(rows), "errors": errors, "built_at": time.time()}
+    db.executemany("INSERT INTO meta VALUES (?, ?)", [(k, json.dumps(v)) for k, v in stats.items()])
+    db.commit()
+    db.close()
+    os.replace(tmp_path, output_path)
+    return stats
+
+class JunyiSnapshotIndex:
+    """
+    唯讀快照索引；第一次查詢時才開啟 sqlite（mmap），啟動時不需解析整棵樹。
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite connection 不跨 thread 共用，每個 thread 各開一條唯讀連線
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute("PRAGMA mmap_size = 268435456")
+            self._local.conn = conn
+        return conn
+
+    def _row(self, topic_id: str):
+        return self._conn().execute(
+            "SELECT topic_id, expanded, children_key, payload FROM nodes WHERE topic_id = ?", (topic_id,)
+        ).fetchone()
+
+    def _children_rows(self, topic_id: str):
+        return self._conn().execute(
+            "SELECT topic_id, expanded, children_key, payload FROM nodes WHERE parent_id = ? ORDER BY position", (topic_id,)
+        ).fetchall()
+
+    def _build(self, row, remaining: int) -> Dict:
+        node = json.loads(row[3])
+        if remaining > 0:
+            if not row[1]:
+                raise SnapshotMiss(row[0])
+            node[row[2] or "children"] = [self._build(child, remaining - 1) for child in self._children_rows(row[0])]
+        return node
+
+    def get_subtree(self, topic_id: str, depth: int = 1) -> Optional[Dict]:
+        """
+        回傳與 live API 相同結構的子樹；快照沒有此節點或深度不足時回傳 None。
+        """
+        row = self._row(topic_id)
+        try:
+            result = self._build(row, depth) if row else None
+        except SnapshotMiss:
+            result = None
+        with self._lock:
+            self._stats["hits" if result is not None else "misses"] += 1
+        return result
+
+    def children(self, topic_id: str) -> List[Dict]:
+        """
+        回傳子節點的 topic_id 與 title（依原順序）。
+        """
+        rows = self._conn().execute("SELECT topic_id, title FROM nodes WHERE parent_id = ? ORDER BY position", (topic_id,)).fetchall()
+        return [{"topic_id": r[0], "title": r[1]} for r in rows]
+
+    def iter_titles(self):
+        """
+        逐筆回傳 (topic_id, title, parent_id)，供標題索引等使用。
+        """
+        for row in self._conn().execute("SELECT topic_id, title, parent_id FROM nodes"):
+            yield row
+
+    def meta(self) -> Dict:
+        return {k: json.loads(v) for k, v in self._conn().execute("SELECT key, value FROM meta")}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, "path": self.path}
+
+_SNAPSHOT_INDEX: Optional[JunyiSnapshotIndex] = None
+_SNAPSHOT_LOADED = False
+
+def get_snapshot_index() -> Optional[JunyiSnapshotIndex]:
+    """
+    取得快照索引（lazy）；未設定 JUNYI_SNAPSHOT_PATH 或檔案不存在時回傳 None。
+    """
+    global _SNAPSHOT_INDEX, _SNAPSHOT_LOADED
+    if not _SNAPSHOT_LOADED:
+        _SNAPSHOT_LOADED = True
+        if JUNYI_SNAPSHOT_PATH and os.path.exists(JUNYI_SNAPSHOT_PATH):
+            _SNAPSHOT_INDEX = JunyiSnapshotIndex(JUNYI_SNAPSHOT_PATH)
+    return _SNAPSHOT_INDEX
+
+def use_snapshot(path: Optional[str]):
+    """
+    切換使用的快照檔（None 表示停用），主要給測試與重建快照後熱更新使用。
+    """
+    global _SNAPSHOT_INDEX, _SNAPSHOT_LOADED
+    _SNAPSHOT_LOADED = True
+    _SNAPSHOT_INDEX = JunyiSnapshotIndex(path) if path else None
+
+if __name__ == "__main__":
+    import argparse
+    from src.tools.junyi_tree_tool import fetch_junyi_tree_live
+    parser = argparse.ArgumentParser(description="建立均一課程樹離線快照")
+    parser.add_argument("--root", default="root")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--output", default=JUNYI_SNAPSHOT_PATH or "data/junyi_snapshot.sqlite3")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+    print(build_junyi_snapshot(args.output, fetch_junyi_tree_live, root_id=args.root, max_depth=args.depth, max_workers=args.workers))
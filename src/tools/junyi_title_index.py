@@ -0,0 +1,173 @@
+"""
+均一主題標題索引：在本地把標題對應到 topic_id，取代每次都請 LLM 從整棵樹挑 id。
+比對層級（分數由高到低）：完全相同 → 正規化後相同 → 拼音/注音相同 → CJK 字元 n-gram 相似度。
+只有候選分數太低或前幾名太接近時，才交給 LLM 判斷。
+"""
+import os
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+from src.tools.junyi_snapshot import node_id, node_children, get_snapshot_index
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:  # 列在 requirements.txt；沒安裝時略過拼音/注音比對
+    lazy_pinyin = None
+    Style = None
+    print("[title_index] 未安裝 pypinyin，停用拼音/注音比對")
+
+TITLE_MATCH_MIN_SCORE = float(os.getenv("TITLE_MATCH_MIN_SCORE", "0.6"))
+TITLE_MATCH_MARGIN = float(os.getenv("TITLE_MATCH_MARGIN", "0.1"))
+
+SCORE_EXACT = 1.0
+SCORE_NORMALIZED = 0.95
+SCORE_PHONETIC = 0.9
+SCORE_NGRAM_MAX = 0.85
+
+# 注音符號（含聲調）與常見標點
+_BOPOMOFO_RE = re.compile(r"[㄀-ㄯㆠ-ㆿ˙ˊˇˋ]")
+_STRIP_RE = re.compile(r"[\s\W_]+", re.UNICODE)
+_TONE_RE = re.compile(r"[\s˙ˊˇˋ]+")
+
+def normalize_title(text: str) -> str:
+    """
+    全形轉半形、英文小寫、去除空白標點與夾雜的注音符號。
+    """
+    text = unicodedata.normalize("NFKC", str(text or "")).lower()
+    text = _BOPOMOFO_RE.sub("", text)
+    return _STRIP_RE.sub("", text)
+
+def char_ngrams(text: str, n: int = 2) -> set:
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+def phonetic_keys(text: str) -> set:
+    """
+    標題的無聲調拼音與注音寫法（需要 pypinyin）。
+    """
+    if lazy_pinyin is None or not text:
+        return set()
+    keys = {normalize_title("".join(lazy_pinyin(text)))}
+    # 注音只去掉聲調；不能走 normalize_title，否則注音符號本身會被濾掉
+    keys.add(_TONE_RE.sub("", "".join(lazy_pinyin(text, style=Style.BOPOMOFO))))
+    return {k for k in keys if k}
+
+def query_phonetic_keys(query: str) -> set:
+    """
+    使用者輸入的拼音/注音寫法：純英文字母視為拼音，含注音符號則轉成去聲調的注音字串。
+    """
+    raw = unicodedata.normalize("NFKC", str(query or "")).lower()
+    keys = set()
+    if re.fullmatch(r"[a-z\s']+", raw):
+        keys.add(_STRIP_RE.sub("", raw))
+    if re.search(r"[㄀-ㄯㆠ-ㆿ]", raw):
+        keys.add(_TONE_RE.sub("", raw))
+    if lazy_pinyin is not None:
+        keys |= phonetic_keys(raw)
+    return {k for k in keys if k}
+
+class TitleIndex:
+    def __init__(self, entries: Iterable[Tuple[str, str]]):
+        self.entries: List[Tuple[str, str]] = []
+        self._exact: Dict[str, List[int]] = {}
+        self._normalized: Dict[str, List[int]] = {}
+        self._phonetic: Dict[str, List[int]] = {}
+        self._grams: Dict[str, set] = {}
+        self._entry_grams: List[set] = []
+        seen = set()
+        for topic_id, title in entries:
+            if not topic_id or not title or topic_id in seen:
+                continue
+            seen.add(topic_id)
+            idx = len(self.entries)
+            self.entries.append((topic_id, title))
+            norm = normalize_title(title)
+            self._exact.setdefault(title.strip(), []).append(idx)
+            self._normalized.setdefault(norm, []).append(idx)
+            for key in phonetic_keys(title):
+                self._phonetic.setdefault(key, []).append(idx)
+            grams = char_ngrams(norm)
+            self._entry_grams.append(grams)
+            for g in grams:
+                self._grams.setdefault(g, set()).add(idx)
+
+    @classmethod
+    def from_tree(cls, tree) -> "TitleIndex":
+        entries = []
+        def walk(node):
+            if not isinstance(node, dict):
+                return
+            if node_id(node) and node.get("title"):
+                entries.append((node_id(node), node["title"]))
+            for child in node_children(node)[1]:
+                walk(child)
+        walk(tree)
+        return cls(entries)
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> "TitleIndex":
+        return cls((topic_id, title) for topic_id, title, _ in snapshot.iter_titles())
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, query: str, limit: int = 5) -> List[Dict]:
+        """
+        回傳依分數排序的候選：[{"topic_id", "title", "score", "match"}]。
+        """
+        scores: Dict[int, Tuple[float, str]] = {}
+        def offer(idx, score, match):
+            if idx not in scores or scores[idx][0] < score:
+                scores[idx] = (score, match)
+        for idx in self._exact.get(str(query).strip(), []):
+            offer(idx, SCORE_EXACT, "exact")
+        norm = normalize_title(query)
+        for idx in self._normalized.get(norm, []):
+            offer(idx, SCORE_NORMALIZED, "normalized")
+        for key in query_phonetic_keys(query):
+            for idx in self._phonetic.get(key, []):
+                offer(idx, SCORE_PHONETIC, "phonetic")
+        query_grams = char_ngrams(norm)
+        candidates = set()
+        for g in query_grams:
+            candidates |= self._grams.get(g, set())
+        for idx in candidates:
+            entry_grams = self._entry_grams[idx]
+            overlap = len(query_grams & entry_grams)
+            dice = 2 * overlap / (len(query_grams) + len(entry_grams))
+            offer(idx, round(SCORE_NGRAM_MAX * dice, 4), "ngram")
+        ranked = sorted(scores.items(), key=lambda item: (-item[1][0], len(self.entries[item[0]][1])))
+        return [
+            {"topic_id": self.entries[idx][0], "title": self.entries[idx][1], "score": score, "match": match}
+            for idx, (score, match) in ranked[:limit]
+        ]
+
+    def resolve(self, query: str, limit: int = 5) -> Tuple[Optional[str], List[Dict], bool]:
+        """
+        回傳 (topic_id, 候選清單, 是否需要交給 LLM)。
+        最高分低於門檻，或前兩名分數差距小於 margin 時視為不明確。
+        """
+        candidates = self.search(query, limit=limit)
+        if not candidates or candidates[0]["score"] < TITLE_MATCH_MIN_SCORE:
+            return None, candidates, True
+        if len(candidates) > 1 and candidates[0]["score"] - candidates[1]["score"] < TITLE_MATCH_MARGIN:
+            return None, candidates, True
+        return candidates[0]["topic_id"], candidates, False
+
+_TREE_INDEX = (None, None)  # (tree, index)：同一個 tree 物件重複查詢時不重建
+_SNAPSHOT_INDEX = (None, None)  # (snapshot, index)
+
+def get_title_index(tree=None) -> TitleIndex:
+    """
+    優先使用離線快照建立的完整索引；沒有快照時從傳入的課程樹建立（同一個 tree 物件會重用）。
+    """
+    global _TREE_INDEX, _SNAPSHOT_INDEX
+    snapshot = get_snapshot_index()
+    if snapshot is not None:
+        if _SNAPSHOT_INDEX[0] is not snapshot:
+            _SNAPSHOT_INDEX = (snapshot, TitleIndex.from_snapshot(snapshot))
+        return _SNAPSHOT_INDEX[1]
+    if _TREE_INDEX[0] is not tree:
+        _TREE_INDEX = (tree, TitleIndex.from_tree(tree))
+    return _TREE_INDEX[1]
@@ -1,54 +1,104 @@
 import re
-from src.tools.junyi_tree_tool import get_junyi_tree
-from src.tools.junyi_topic_tool import get_junyi_topic
-from src.tools.openai_tool import openai_query_llm
+from src.tools.junyi_tree_tool import get_junyi_tree, get_junyi_tree_async
+from src.tools.junyi_topic_tool import get_junyi_topic, get_junyi_topic_async
+from src.tools.openai_tool import openai_query_llm, openai_query_llm_async
+from src.tools.junyi_title_index import get_title_index
+from src.tools.junyi_popularity import untracked
+from src.tools.junyi_tree_projection import project_tree
+
+def _build_title_lookup_prompt(tree, title: str):
+    # 課程樹先投影成「topic_id | title | 子節點數」的精簡格式，不直接塞整包 API 回傳
+    projected, _ = project_tree(tree)
+    instructions = f"你是一個均一課程結構樹的查詢工具，請根據使用者的問題，僅回傳課程樹中存在的 topic_id（純 id，不要說明文字），不要回傳任何說明或其他文字。"
+    user_input = f"以下是均一課程結構樹（每行：topic_id | title | 子節點數）：\n{projected}\n請根據使用者給定的標題：{title}，判斷最相關的 topic_id。"
+    return instructions, user_input
+
+def _build_candidate_prompt(candidates, title: str):
+    """
+    本地索引不確定時，只把前幾名候選交給 LLM 挑選，不再附上整棵樹。
+    """
+    lines = "\n".join(f"- {c['topic_id']}: {c['title']}" for c in candidates)
+    instructions = "你是一個均一課程主題的查詢工具，請從候選清單中挑出最符合標題的 topic_id，僅回傳純 id，不要回傳任何說明或其他文字。"
+    user_input = f"候選主題：\n{lines}\n使用者給定的標題：{title}"
+    return instructions, user_input
+
+def _lookup_prompt(tree, title: str, candidates):
+    if candidates:
+        return _build_candidate_prompt(candidates, title)
+    return _build_title_lookup_prompt(tree, title)
+
+def _topic_by_title_result(title: str, topic_id, content=None, error_message: str = None, match=None):
+    meta = {"title": title, "topic_id": topic_id}
+    if match:
+        meta["match"] = match
+    return {
+        "type": "topic_by_title",
+        "content": content,
+        "meta": meta,
+        "agent_id": "get_junyi_topic_by_title",
+        "agent_name": "均一主題標題查詢",
+        "error": {"message": error_message} if error_message else None
+    }
+
+def _invalid_topic_id_result(title: str, topic_id):
+    # 僅允許 topic_id 為英數字、dash、underline
+    if not topic_id or not re.match(r"^[\w\-]+$", str(topic_id).strip()):
+        return _topic_by_title_result(title, topic_id, error_message=f"LLM 回傳的 topic_id 不合法或不是純 id，請換個關鍵字或再試一次。LLM 回傳：{topic_id}")
+    return None
+
+def _topic_content_result(title: str, topic_id, content, match=None):
+    if isinstance(content, dict) and "error" in content:
+        return _topic_by_title_result(title, topic_id, error_message=f"查無主題內容，請換個關鍵字。Junyi API: {content['error']}", match=match)
+    return _topic_by_title_result(title, topic_id, content=content, match=match)
+
+def _resolve_locally(tree, title: str):
+    """
+    先用本地標題索引比對；回傳 (topic_id, 候選清單, match 資訊)。topic_id 為 None 表示需要 LLM。
+    """
+    topic_id, candidates, ambiguous = get_title_index(tree).resolve(title)
+    if not ambiguous:
+        top = candidates[0]
+        print(f"[title_index] {title} -> {topic_id} ({top['match']}, {top['score']})")
+        return topic_id, candidates, {"resolved_by": "title_index", "method": top["match"], "score": top["score"]}
+    return None, candidates, {"resolved_by": "llm", "candidates": [c["topic_id"] for c in candidates]}
 
 def get_junyi_topic_by_title(title: str):
     """
     Get the topic of均一 by title
-    1. 先查詢 topic_id by get_junyi_tree
+    1. 先用本地標題索引（快照或 get_junyi_tree）比對 topic_id，不明確時才交給 LLM
     2. 再查詢 topic_id 的 topic by get_junyi_topic
     """
-    tree = get_junyi_tree(topic_id="root", depth=1)
-    topic_id = openai_query_llm(
-        instructions=f"你是一個均一課程結構樹的查詢工具，請根據使用者的問題，僅回傳課程樹中存在的 topic_id（純 id，不要說明文字），不要回傳任何說明或其他文字。",
-        input=f"以下是均一課程結構樹：\n{tree}\n請根據使用者給定的標題：{title}，判斷最相關的 topic_id。"
-    )
-    # 僅允許 topic_id 為英數字、dash、underline
-    if not topic_id or not re.match(r"^[\w\-]+$", str(topic_id).strip()):
-        return {
-            "type": "topic_by_title",
-            "content": None,
-            "meta": {"title": title, "topic_id": topic_id},
-            "agent_id": "get_junyi_topic_by_title",
-            "agent_name": "均一主題標題查詢",
-            "error": {"message": f"LLM 回傳的 topic_id 不合法或不是純 id，請換個關鍵字或再試一次。LLM 回傳：{topic_id}"}
-        }
+    # 查 root 只是為了比對標題，不算使用者瀏覽 root；查到的主題由 get_junyi_topic 記錄
+    with untracked():
+        tree = get_junyi_tree(topic_id="root", depth=1)
+    topic_id, candidates, match = _resolve_locally(tree, title)
+    if topic_id is None:
+        instructions, user_input = _lookup_prompt(tree, title, candidates)
+        topic_id = openai_query_llm(instructions=instructions, input=user_input, temperature=0)
+    invalid = _invalid_topic_id_result(title, topic_id)
+    if invalid:
+        return invalid
     try:
         content = get_junyi_topic(topic_id=topic_id)
-        if isinstance(content, dict) and "error" in content:
-            return {
-                "type": "topic_by_title",
-                "content": None,
-                "meta": {"title": title, "topic_id": topic_id},
-                "agent_id": "get_junyi_topic_by_title",
-                "agent_name": "均一主題標題查詢",
-                "error": {"message": f"查無主題內容，請換個關鍵字。Junyi API: {content['error']}"}
-            }
-        return {
-            "type": "topic_by_title",
-            "content": content,
-            "meta": {"title": title, "topic_id": topic_id},
-            "agent_id": "get_junyi_topic_by_title",
-            "agent_name": "均一主題標題查詢",
-            "error": None
-        }
+        return _topic_content_result(title, topic_id, content, match=match)
+    except Exception as e:
+        return _topic_by_title_result(title, topic_id, error_message=f"查詢 Junyi API 發生錯誤: {e}", match=match)
+
+async def get_junyi_topic_by_title_async(title: str):
+    """
+    get_junyi_topic_by_title 的 async 版本。
+    """
+    with untracked():
+        tree = await get_junyi_tree_async(topic_id="root", depth=1)
+    topic_id, candidates, match = _resolve_locally(tree, title)
+    if topic_id is None:
+        instructions, user_input = _lookup_prompt(tree, title, candidates)
+        topic_id = await openai_query_llm_async(instructions=instructions, input=user_input, temperature=0)
+    invalid = _invalid_topic_id_result(title, topic_id)
+    if invalid:
+        return invalid
+    try:
+        content = await get_junyi_topic_async(topic_id=topic_id)
+        return _topic_content_result(title, topic_id, content, match=match)
     except Exception as e:
-        return {
-            "type": "topic_by_title",
-            "content": None,
-            "meta": {"title": title, "topic_id": topic_id},
-            "agent_id": "get_junyi_topic_by_title",
-            "agent_name": "均一主題標題查詢",
-            "error": {"message": f"查詢 Junyi API 發生錯誤: {e}"}
-        } 
\ No newline at end of file
+        return _topic_by_title_result(title, topic_id, error_message=f"查詢 Junyi API 發生錯誤: {e}", match=match)
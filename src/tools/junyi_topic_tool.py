@@ -1,16 +1,113 @@
-import requests
+import asyncio
+import os
+from typing import Dict, List
+from src.utils.single_flight import SingleFlight
+from src.utils.junyi_cache import get_junyi_cache
+from src.utils.http_pool import run_sync_with_http
+from src.tools.junyi_popularity import get_topic_popularity
 
 JUNYI_TOPIC_PAGE_API = "https://www.junyiacademy.org/api/v2/open/content/topicpage/{topic_id}"
 
+# 相同 topic_id 同時查詢時只打一次 Junyi API
+JUNYI_TOPIC_FLIGHT = SingleFlight("junyi_topic")
+# 批次查詢：單次最多幾個 topic_id、同時最多幾個上游請求
+JUNYI_BATCH_MAX_IDS = int(os.getenv("JUNYI_BATCH_MAX_IDS", "50"))
+JUNYI_BATCH_MAX_CONCURRENCY = int(os.getenv("JUNYI_BATCH_MAX_CONCURRENCY", "8"))
+
+def _topic_cache_key(topic_id: str) -> str:
+    return f"topic:{topic_id}"
+
+def _fetch_junyi_topic(topic_id: str):
+    url = JUNYI_TOPIC_PAGE_API.format(topic_id=topic_id)
+    try:
+        return get_junyi_cache().fetch(_topic_cache_key(topic_id), url)
+    except Exception as e:
+        return {"error": str(e)}
+
+async def _fetch_junyi_topic_async(topic_id: str):
+    url = JUNYI_TOPIC_PAGE_API.format(topic_id=topic_id)
+    try:
+        return await get_junyi_cache().fetch_async(_topic_cache_key(topic_id), url)
+    except Exception as e:
+        return {"error": str(e)}
+
 def get_junyi_topic(topic_id: str = "root"):
     """
     查詢均一 topic 內容，回傳該 topic 的標題、描述與子主題摘要。
     """
-    url = JUNYI_TOPIC_PAGE_API.format(topic_id=topic_id)
-    try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        return data
-    except Exception as e:
-        return {"error": str(e)} 
\ No newline at end of file
+    get_topic_popularity().record(topic_id)
+    return JUNYI_TOPIC_FLIGHT.do(topic_id, _fetch_junyi_topic, topic_id)
+
+async def get_junyi_topic_async(topic_id: str = "root"):
+    """
+    get_junyi_topic 的 async 版本。
+    """
+    get_topic_popularity().record(topic_id)
+    return await JUNYI_TOPIC_FLIGHT.do_async(topic_id, _fetch_junyi_topic_async, topic_id)
+
+def _cached_topic(topic_id: str):
+    """
+    快取中仍新鮮的 topic 直接回傳，不必排進並行請求；沒有則回傳 None。
+    """
+    cache = get_junyi_cache()
+    if not cache.enabled:
+        return None
+    entry = cache.get_entry(_topic_cache_key(topic_id))
+    if entry is not None and cache.freshness(entry) == "fresh":
+        cache.count("fresh_hits")
+        return entry.value
+    return None
+
+async def get_junyi_topics_batch_async(topic_ids: List[str], max_concurrency: int = None) -> Dict:
+    """
+    一次查詢多個 topic：去除重複、快取命中直接回傳、其餘以並行上限同時查詢。
+    單一 topic 失敗不影響其他結果，錯誤放在 errors[topic_id]。
+    """
+    max_concurrency = max_concurrency or JUNYI_BATCH_MAX_CONCURRENCY
+    unique_ids = list(dict.fromkeys(str(t).strip() for t in topic_ids or [] if str(t).strip()))
+    unique_count = len(unique_ids)
+    errors = {t: f"超過單次批次上限 {JUNYI_BATCH_MAX_IDS} 個" for t in unique_ids[JUNYI_BATCH_MAX_IDS:]}
+    unique_ids = unique_ids[:JUNYI_BATCH_MAX_IDS]
+    topics = {}
+    to_fetch = []
+    for topic_id in unique_ids:
+        cached = _cached_topic(topic_id)
+        if cached is not None:
+            get_topic_popularity().record(topic_id)
+            topics[topic_id] = cached
+        else:
+            to_fetch.append(topic_id)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch_one(topic_id):
+        async with semaphore:
+            try:
+                return await get_junyi_topic_async(topic_id=topic_id)
+            except Exception as e:
+                return {"error": str(e)}
+
+    results = await asyncio.gather(*[fetch_one(t) for t in to_fetch])
+    for topic_id, result in zip(to_fetch, results):
+        if isinstance(result, dict) and "error" in result:
+            errors[topic_id] = result["error"]
+        else:
+            topics[topic_id] = result
+    # 依呼叫端給的順序輸出
+    ordered = {t: topics[t] for t in unique_ids if t in topics}
+    return {
+        "topics": ordered,
+        "errors": errors,
+        "meta": {
+            "requested": len(topic_ids or []),
+            "unique": unique_count,
+            "cached": len(unique_ids) - len(to_fetch),
+            "fetched": len(to_fetch),
+            "failed": len(errors),
+        },
+    }
+
+def get_junyi_topics_batch(topic_ids: List[str], max_concurrency: int = None) -> Dict:
+    """
+    get_junyi_topics_batch_async 的同步版本。
+    """
+    return run_sync_with_http(get_junyi_topics_batch_async(topic_ids, max_concurrency))
@@ -0,0 +1,117 @@
+"""
+均一課程樹多層展開：以廣度優先、限制並行數的方式逐一展開子節點（每個節點打 depth=1），
+經由 get_junyi_tree_async 共用快照 / 快取 / single-flight，並在節點數或位元組數達上限時停止。
+可以用 async generator 邊抓邊送出子樹，也可以一次組回完整的樹。
+"""
+import asyncio
+import json
+import os
+from collections import deque
+from typing import AsyncIterator, Dict, Optional
+from src.tools.junyi_tree_tool import get_junyi_tree_async
+from src.tools.junyi_snapshot import node_id, node_children
+from src.tools.junyi_popularity import untracked
+from src.utils.http_pool import run_sync_with_http
+
+TREE_EXPAND_MAX_DEPTH = int(os.getenv("TREE_EXPAND_MAX_DEPTH", "3"))
+TREE_EXPAND_MAX_NODES = int(os.getenv("TREE_EXPAND_MAX_NODES", "500"))
+TREE_EXPAND_MAX_BYTES = int(os.getenv("TREE_EXPAND_MAX_BYTES", str(2 * 1024 * 1024)))
+TREE_EXPAND_CONCURRENCY = int(os.getenv("TREE_EXPAND_CONCURRENCY", "8"))
+
+def _new_stats() -> Dict:
+    return {"fetched": 0, "bytes": 0, "errors": [], "truncated": False}
+
+async def _fetch_node(topic_id: str, depth: int):
+    # 只有起點是使用者要看的主題；展開時順帶抓的子節點不列入熱門度
+    if depth == 0:
+        return await get_junyi_tree_async(topic_id=topic_id, depth=1)
+    with untracked():
+        return await get_junyi_tree_async(topic_id=topic_id, depth=1)
+
+async def iter_junyi_tree_async(
+    topic_id: str = "root",
+    max_depth: int = None,
+    max_nodes: int = None,
+    max_bytes: int = None,
+    concurrency: int = None,
+    stats: Optional[Dict] = None,
+) -> AsyncIterator[Dict]:
+    """
+    逐一送出展開的節點：{"topic_id", "parent_id", "depth", "subtree"}，subtree 為該節點 depth=1 的內容。
+    depth 從 0（起點）開始，只展開 depth < max_depth 的節點的子節點。
+    stats（可選）會被填入 fetched、bytes、errors、truncated。
+    """
+    max_depth = TREE_EXPAND_MAX_DEPTH if max_depth is None else max_depth
+    max_nodes = TREE_EXPAND_MAX_NODES if max_nodes is None else max_nodes
+    max_bytes = TREE_EXPAND_MAX_BYTES if max_bytes is None else max_bytes
+    concurrency = TREE_EXPAND_CONCURRENCY if concurrency is None else concurrency
+    stats = _new_stats() if stats is None else stats
+    stats.update(_new_stats())
+
+    queue = deque([(topic_id, None, 0)])
+    pending = {}
+    try:
+        while queue or pending:
+            # 依 FIFO 順序補滿並行名額，確保是廣度優先
+            while queue and len(pending) < concurrency and stats["fetched"] + len(pending) < max_nodes:
+                tid, parent_id, depth = queue.popleft()
+                task = asyncio.ensure_future(_fetch_node(tid, depth))
+                pending[task] = (tid, parent_id, depth)
+            if queue and not pending:
+                stats["truncated"] = True
+                break
+            done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                tid, parent_id, depth = pending.pop(task)
+                subtree = task.result()
+                if not isinstance(subtree, dict) or "error" in subtree:
+                    stats["errors"].append({"topic_id": tid, "error": subtree.get("error") if isinstance(subtree, dict) else str(subtree)})
+                    continue
+                stats["fetched"] += 1
+                stats["bytes"] += len(json.dumps(subtree, ensure_ascii=False).encode("utf-8"))
+                if depth < max_depth:
+                    for child in node_children(subtree)[1]:
+                        if isinstance(child, dict) and node_id(child):
+                            queue.append((node_id(child), tid, depth + 1))
+                yield {"topic_id": tid, "parent_id": parent_id, "depth": depth, "subtree": subtree}
+                if stats["bytes"] >= max_bytes:
+                    stats["truncated"] = True
+                    return
+    finally:
+        # 提早結束（預算用完或呼叫端中斷）時取消還在抓的節點
+        for task in pending:
+            task.cancel()
+
+async def expand_junyi_tree_async(topic_id: str = "root", max_depth: int = None, max_nodes: int = None, max_bytes: int = None, concurrency: int = None) -> Dict:
+    """
+    把展開的節點組回一棵樹：子節點的淺層資料會被替換成展開後的內容。
+    回傳 {"tree", "meta"}；起點本身查詢失敗時回傳 {"error": ...}。
+    """
+    stats = _new_stats()
+    root = None
+    nodes = {}
+    async for item in iter_junyi_tree_async(topic_id, max_depth, max_nodes, max_bytes, concurrency, stats=stats):
+        subtree = dict(item["subtree"])
+        key, children = node_children(subtree)
+        if key:
+            subtree[key] = list(children)
+        nodes[item["topic_id"]] = subtree
+        parent = nodes.get(item["parent_id"])
+        if parent is None:
+            root = subtree
+            continue
+        key, siblings = node_children(parent)
+        for i, child in enumerate(siblings):
+            if isinstance(child, dict) and node_id(child) == item["topic_id"]:
+                siblings[i] = subtree
+                break
+    if root is None:
+        errors = stats["errors"]
+        return {"error": errors[0]["error"] if errors else f"無法展開 {topic_id}"}
+    return {"tree": root, "meta": stats}
+
+def expand_junyi_tree(topic_id: str = "root", max_depth: int = None, max_nodes: int = None, max_bytes: int = None, concurrency: int = None) -> Dict:
+    """
+    expand_junyi_tree_async 的同步版本。
+    """
+    return run_sync_with_http(expand_junyi_tree_async(topic_id, max_depth, max_nodes, max_bytes, concurrency))
@@ -0,0 +1,80 @@
+"""
+把均一課程樹投影成給 LLM 看的精簡格式：每個節點一行「縮排 + topic_id | title | 子節點數」，
+只保留模型需要的欄位，並依 token 預算做廣度優先截斷（先保留上層節點）。
+"""
+import os
+from collections import deque
+from typing import Dict, Tuple
+from src.tools.junyi_snapshot import node_id, node_children
+
+TREE_PROMPT_MAX_TOKENS = int(os.getenv("TREE_PROMPT_MAX_TOKENS", "2000"))
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗估 token 數：CJK 字元約 1 token，其餘約 4 字元 1 token。
+    """
+    cjk = sum(1 for ch in text if ord(ch) > 0x2E80)
+    return cjk + (len(text) - cjk + 3) // 4
+
+def _render_line(node: Dict, depth: int, include_child_count: bool) -> str:
+    line = f"{'  ' * depth}{node_id(node)} | {node.get('title', '')}"
+    if include_child_count:
+        count = len(node_children(node)[1])
+        if count:
+            line += f" | {count}"
+    return line
+
+def project_tree(tree, max_tokens: int = None, include_child_count: bool = True) -> Tuple[str, Dict]:
+    """
+    回傳 (投影後文字, meta)。meta 含投影前後的字元數與估計 token 數、節點數與是否截斷。
+    """
+    max_tokens = TREE_PROMPT_MAX_TOKENS if max_tokens is None else max_tokens
+    raw = str(tree)
+    # 廣度優先挑選節點，直到超出預算
+    kept = set()
+    total_nodes = 0
+    used = 0
+    budget_hit = False
+    queue = deque([(tree, 0)]) if isinstance(tree, dict) and node_id(tree) else deque()
+    while queue:
+        node, depth = queue.popleft()
+        total_nodes += 1
+        if not budget_hit:
+            cost = estimate_tokens(_render_line(node, depth, include_child_count)) + 1
+            if used + cost <= max_tokens:
+                kept.add(id(node))
+                used += cost
+            else:
+                budget_hit = True
+        for child in node_children(node)[1]:
+            if isinstance(child, dict) and node_id(child):
+                queue.append((child, depth + 1))
+    # 依原本樹狀順序輸出被保留的節點
+    lines = []
+    def walk(node, depth):
+        if id(node) not in kept:
+            return
+        lines.append(_render_line(node, depth, include_child_count))
+        for child in node_children(node)[1]:
+            if isinstance(child, dict):
+                walk(child, depth + 1)
+    if kept:
+        walk(tree, 0)
+        omitted = total_nodes - len(kept)
+        if omitted:
+            lines.append(f"…（另有 {omitted} 個較深的節點因長度限制省略）")
+        text = "\n".join(lines)
+    else:
+        # 不是課程樹格式（例如錯誤訊息），只截斷原始內容
+        text = raw[: max_tokens * 4]
+    meta = {
+        "raw_chars": len(raw),
+        "raw_tokens": estimate_tokens(raw),
+        "projected_chars": len(text),
+        "projected_tokens": estimate_tokens(text),
+        "nodes": total_nodes,
+        "kept_nodes": len(kept),
+        "truncated": len(kept) < total_nodes if kept else len(text) < len(raw),
+    }
+    print(f"[tree_projection] {meta['raw_tokens']} -> {meta['projected_tokens']} tokens, nodes {meta['kept_nodes']}/{meta['nodes']}")
+    return text, meta
@@ -1,16 +1,60 @@
-import requests
+from src.utils.single_flight import SingleFlight
+from src.utils.junyi_cache import get_junyi_cache
+from src.tools.junyi_snapshot import get_snapshot_index
+from src.tools.junyi_popularity import get_topic_popularity
 
 JUNYI_SUB_TREE_API = "https://www.junyiacademy.org/api/v2/open/sub-tree/{topic_id}?depth={depth}"
 
+# 相同 (topic_id, depth) 同時查詢時只打一次 Junyi API
+JUNYI_TREE_FLIGHT = SingleFlight("junyi_tree")
+
+def _tree_data(data):
+    return data.get("data", {})
+
+def _tree_cache_key(topic_id: str, depth: int) -> str:
+    return f"tree:{topic_id}:{depth}"
+
+def _fetch_junyi_tree(topic_id: str, depth: int):
+    url = JUNYI_SUB_TREE_API.format(topic_id=topic_id, depth=depth)
+    try:
+        return get_junyi_cache().fetch(_tree_cache_key(topic_id, depth), url, _tree_data)
+    except Exception as e:
+        return {"error": str(e)}
+
+async def _fetch_junyi_tree_async(topic_id: str, depth: int):
+    url = JUNYI_SUB_TREE_API.format(topic_id=topic_id, depth=depth)
+    try:
+        return await get_junyi_cache().fetch_async(_tree_cache_key(topic_id, depth), url, _tree_data)
+    except Exception as e:
+        return {"error": str(e)}
+
+def fetch_junyi_tree_live(topic_id: str = "root", depth: int = 1):
+    """
+    不看離線快照，直接經由快取 / live API 查詢課程樹（建立快照時使用）。
+    """
+    return JUNYI_TREE_FLIGHT.do((topic_id, depth), _fetch_junyi_tree, topic_id, depth)
+
 def get_junyi_tree(topic_id: str = "root", depth: int = 1):
     """
     查詢均一課程樹，回傳指定 topic_id 與 depth 的課程結構摘要。
+    有離線快照時優先從快照回答，快照不足才打 live API。
     """
-    url = JUNYI_SUB_TREE_API.format(topic_id=topic_id, depth=depth)
-    try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        return data.get("data", {})
-    except Exception as e:
-        return {"error": str(e)} 
\ No newline at end of file
+    get_topic_popularity().record(topic_id)
+    snapshot = get_snapshot_index()
+    if snapshot is not None:
+        subtree = snapshot.get_subtree(topic_id, depth)
+        if subtree is not None:
+            return subtree
+    return fetch_junyi_tree_live(topic_id, depth)
+
+async def get_junyi_tree_async(topic_id: str = "root", depth: int = 1):
+    """
+    get_junyi_tree 的 async 版本。
+    """
+    get_topic_popularity().record(topic_id)
+    snapshot = get_snapshot_index()
+    if snapshot is not None:
+        subtree = snapshot.get_subtree(topic_id, depth)
+        if subtree is not None:
+            return subtree
+    return await JUNYI_TREE_FLIGHT.do_async((topic_id, depth), _fetch_junyi_tree_async, topic_id, depth)
@@ -1,19 +1,23 @@
-import os
-import openai
+from src.utils.llm_pool import chat_completion, chat_completion_async
 
-def openai_query_llm(instructions: str, input: str):
+def _build_messages(instructions: str, input: str):
+    return [
+        {"role": "system", "content": instructions},
+        {"role": "user", "content": input}
+    ]
+
+def openai_query_llm(instructions: str, input: str, temperature: float = None):
     """
     呼叫 OpenAI LLM，回傳生成內容。
     :param instructions: 系統指令
     :param input: 用戶輸入
+    :param temperature: 取樣溫度，None 沿用模型預設；0 時可命中 LLM 回應快取
     :return: LLM 回傳內容
     """
-    client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    response = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=[
-            {"role": "system", "content": instructions},
-            {"role": "user", "content": input}
-        ]
-    )
-    return response.choices[0].message.content 
\ No newline at end of file
+    return chat_completion(model="gpt-4.1-mini", messages=_build_messages(instructions, input), temperature=temperature)
+
+async def openai_query_llm_async(instructions: str, input: str, temperature: float = None):
+    """
+    openai_query_llm 的 async 版本。
+    """
+    return await chat_completion_async(model="gpt-4.1-mini", messages=_build_messages(instructions, input), temperature=temperature)
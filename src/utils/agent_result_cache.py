@@ -0,0 +1,186 @@
+"""
+Agent 結果快取：agent class 以 cache_ttl / cache_key_params / cacheable_errors 宣告可快取，
+AgentRegistry 載入時自動把 respond（與 respond_async）包上這層共用快取，
+動態 /agent/{id}/respond 與 orchestrator 調度都會經過。
+命中時不會執行 respond，需要副作用（例如熱門度紀錄）的 agent 可定義 on_cache_hit(result, **params)。
+記憶體 LRU（每筆依 agent 的 cache_ttl 過期）＋可選 sqlite 持久層；預設不快取帶 error 的結果。
+"""
+import os
+import json
+import time
+import inspect
+import sqlite3
+import threading
+import functools
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.utils.tool_memo import canonical_params
+
+AGENT_CACHE_ENABLED = os.getenv("AGENT_CACHE_ENABLED", "1") == "1"
+AGENT_CACHE_MAX_ENTRIES = int(os.getenv("AGENT_CACHE_MAX_ENTRIES", "1000"))
+# 設定後啟用 sqlite 持久層，例如 AGENT_CACHE_DB_PATH=.cache/agent_cache.sqlite3
+AGENT_CACHE_DB_PATH = os.getenv("AGENT_CACHE_DB_PATH", "")
+
+def agent_cache_key(agent_id: str, func: Callable, params: Dict[str, Any], key_params: Optional[List[str]] = None) -> str:
+    """
+    以 respond 的 signature 補上預設值再正規化，省略參數與明確給預設值會得到同一個 key；
+    有宣告 cache_key_params 時只用這些參數。
+    """
+    try:
+        bound = inspect.signature(func).bind_partial(**params)
+        bound.apply_defaults()
+        args = dict(bound.arguments)
+    except (TypeError, ValueError):
+        args = dict(params)
+    if key_params:
+        args = {k: args.get(k) for k in key_params}
+    return f"{agent_id}:{canonical_params(args)}"
+
+def is_cacheable_result(result: Any, cacheable_errors=None) -> bool:
+    # agent 成功時 error 為 None；有錯誤時只有訊息符合 cacheable_errors（或設為 True）才快取
+    error = result.get("error") if isinstance(result, dict) else None
+    if not error:
+        return True
+    if cacheable_errors is True:
+        return True
+    message = error if isinstance(error, str) else json.dumps(error, ensure_ascii=False)
+    return any(pattern in message for pattern in cacheable_errors or [])
+
+class AgentResultCache:
+    def __init__(self, max_entries: int = AGENT_CACHE_MAX_ENTRIES, db_path: str = AGENT_CACHE_DB_PATH):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._memory = OrderedDict()  # key -> (value JSON, expires_at)
+        self._lock = threading.Lock()
+        self._db = None
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "uncacheable": 0, "evictions": 0}
+        self._by_agent: Dict[str, Dict[str, int]] = {}
+
+    def _get_db(self):
+        if not self.db_path:
+            return None
+        if self._db is None:
+            folder = os.path.dirname(self.db_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS agent_cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _count(self, agent_id: str, name: str):
+        self._stats[name] += 1
+        per_agent = self._by_agent.setdefault(agent_id, {"hits": 0, "misses": 0})
+        if name in per_agent:
+            per_agent[name] += 1
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        agent_id = key.split(":", 1)[0]
+        with self._lock:
+            item = self._memory.get(key)
+            if item is None and self._get_db() is not None:
+                row = self._db.execute("SELECT value, expires_at FROM agent_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    item = (row[0], row[1])
+                    self._remember(key, *item)
+            if item is not None and item[1] < time.time():
+                self._memory.pop(key, None)
+                item = None
+            if item is None:
+                self._count(agent_id, "misses")
+                return False, None
+            self._memory.move_to_end(key)
+            self._count(agent_id, "hits")
+        # 每次回傳新的物件，呼叫端修改結果不會影響快取
+        return True, json.loads(item[0])
+
+    def set(self, key: str, value: Any, ttl: float):
+        try:
+            encoded = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            with self._lock:
+                self._stats["uncacheable"] += 1
+            return
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, encoded, expires_at)
+            self._stats["sets"] += 1
+            db = self._get_db()
+            if db is not None:
+                db.execute("INSERT OR REPLACE INTO agent_cache (key, value, expires_at) VALUES (?, ?, ?)", (key, encoded, expires_at))
+                db.commit()
+
+    def skip(self):
+        with self._lock:
+            self._stats["uncacheable"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._by_agent.clear()
+            if self._get_db() is not None:
+                self._db.execute("DELETE FROM agent_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self._memory), "by_agent": {k: dict(v) for k, v in self._by_agent.items()}}
+
+_AGENT_RESULT_CACHE: Optional[AgentResultCache] = None
+
+def get_agent_result_cache() -> AgentResultCache:
+    global _AGENT_RESULT_CACHE
+    if _AGENT_RESULT_CACHE is None:
+        _AGENT_RESULT_CACHE = AgentResultCache()
+    return _AGENT_RESULT_CACHE
+
+def wrap_cached_agent(agent_id: str, func: Callable, async_func: Optional[Callable], ttl: float,
+                      key_params: Optional[List[str]] = None, cacheable_errors=None,
+                      on_hit: Optional[Callable] = None) -> Tuple[Callable, Optional[Callable]]:
+    """
+    回傳包上結果快取的 (function, async_function)；key 以原本 respond 的 signature 計算。
+    on_hit(result, **params)：命中快取時呼叫。
+    """
+    def lookup(params):
+        key = agent_cache_key(agent_id, func, params, key_params)
+        hit, value = get_agent_result_cache().get(key)
+        if hit and on_hit is not None:
+            try:
+                on_hit(value, **params)
+            except Exception as e:
+                print(f"[AgentResultCache] on_cache_hit 失敗 {agent_id}: {e}")
+        return key, (hit, value)
+
+    def store(key, result):
+        if is_cacheable_result(result, cacheable_errors):
+            get_agent_result_cache().set(key, result, ttl)
+        else:
+            get_agent_result_cache().skip()
+
+    @functools.wraps(func)
+    def cached(**params):
+        key, (hit, value) = lookup(params)
+        if hit:
+            return value
+        result = func(**params)
+        store(key, result)
+        return result
+
+    cached_async = None
+    if async_func is not None:
+        @functools.wraps(async_func)
+        async def cached_async(**params):
+            key, (hit, value) = lookup(params)
+            if hit:
+                return value
+            result = await async_func(**params)
+            store(key, result)
+            return result
+    return cached, cached_async
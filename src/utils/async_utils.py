@@ -0,0 +1,57 @@
+import os
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable
+
+# 尚未改成 async 的 agent / tool 統一丟到這個 thread pool 執行，不阻塞 event loop
+AGENT_THREADPOOL_SIZE = int(os.getenv("AGENT_THREADPOOL_SIZE", "16"))
+_AGENT_EXECUTOR = ThreadPoolExecutor(max_workers=AGENT_THREADPOOL_SIZE, thread_name_prefix="agent-sync")
+
+def run_sync(coro: Awaitable) -> Any:
+    """
+    在同步程式碼中執行 coroutine 並回傳結果。
+    若目前 thread 已有執行中的 event loop（例如在 FastAPI async handler 內呼叫同步函式），
+    改在獨立 thread 開新的 event loop 執行，避免 asyncio.run 報錯。
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    result = {}
+    def runner():
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+    t = threading.Thread(target=runner, daemon=True)
+    t.start()
+    t.join()
+    if "error" in result:
+        raise result["error"]
+    return result.get("value")
+
+def submit_to_threadpool(fn: Callable, *args, **kwargs) -> Future:
+    """
+    同步程式碼把工作丟到共用 thread pool，回傳 concurrent.futures.Future（不必每次自己建立 executor）。
+    """
+    return _AGENT_EXECUTOR.submit(fn, *args, **kwargs)
+
+async def run_in_threadpool(fn: Callable, *args, **kwargs) -> Any:
+    """
+    在共用 thread pool 執行同步函式，await 其結果。
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_AGENT_EXECUTOR, functools.partial(fn, *args, **kwargs))
+
+def make_async(fn: Callable) -> Callable[..., Awaitable]:
+    """
+    把同步函式包成 async 函式（thread pool adapter）；本身已是 coroutine function 則原樣回傳。
+    """
+    if asyncio.iscoroutinefunction(fn):
+        return fn
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run_in_threadpool(fn, *args, **kwargs)
+    return wrapper
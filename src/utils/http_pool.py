@@ -0,0 +1,103 @@
+"""
+Junyi API 共用 HTTP 連線池：sync 用 requests.Session，async 用 httpx.AsyncClient，
+皆保持 keep-alive，不再每次查詢都重新建立 TCP + TLS 連線。
+"""
+import os
+import asyncio
+import threading
+import weakref
+from typing import Optional, Tuple
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from src.utils.async_utils import run_sync
+
+JUNYI_CONNECT_TIMEOUT = float(os.getenv("JUNYI_CONNECT_TIMEOUT", "3"))
+JUNYI_READ_TIMEOUT = float(os.getenv("JUNYI_READ_TIMEOUT", "10"))
+# 每個 host 的連線上限（Junyi 工具只連 junyiacademy.org）
+JUNYI_MAX_CONNECTIONS_PER_HOST = int(os.getenv("JUNYI_MAX_CONNECTIONS_PER_HOST", "20"))
+JUNYI_KEEPALIVE_EXPIRY = float(os.getenv("JUNYI_KEEPALIVE_EXPIRY", "60"))
+# 有安裝 h2 套件時 async client 使用 HTTP/2
+JUNYI_HTTP2 = os.getenv("JUNYI_HTTP2", "1") == "1"
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_async_clients = weakref.WeakKeyDictionary()
+
+def junyi_timeout() -> Tuple[float, float]:
+    """
+    requests 用的 (connect, read) timeout。
+    """
+    return (JUNYI_CONNECT_TIMEOUT, JUNYI_READ_TIMEOUT)
+
+def http2_available() -> bool:
+    if not JUNYI_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def get_http_session() -> requests.Session:
+    """
+    取得 process 共用的 requests.Session（keep-alive 連線池）。
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=JUNYI_MAX_CONNECTIONS_PER_HOST)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    取得目前 event loop 共用的 httpx.AsyncClient。
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            http2=http2_available(),
+            limits=httpx.Limits(
+                max_connections=JUNYI_MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=JUNYI_MAX_CONNECTIONS_PER_HOST,
+                keepalive_expiry=JUNYI_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(JUNYI_READ_TIMEOUT, connect=JUNYI_CONNECT_TIMEOUT),
+        )
+        _async_clients[loop] = client
+    return client
+
+async def close_async_http_client():
+    """
+    關閉目前 event loop 的 AsyncClient（server shutdown 時呼叫）。
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+def run_sync_with_http(coro):
+    """
+    在同步程式碼中執行會用到 async client 的 coroutine。
+    run_sync 每次都開新的 event loop，結束前關閉該 loop 的 AsyncClient，避免每次呼叫外洩一組連線。
+    """
+    async def runner():
+        try:
+            return await coro
+        finally:
+            await close_async_http_client()
+    return run_sync(runner())
+
+def reset_http_clients():
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _async_clients.clear()
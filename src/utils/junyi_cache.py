@@ -0,0 +1,220 @@
+"""
+Junyi 內容快取：記憶體 LRU ＋ 可選 sqlite 持久層。
+- fresh（JUNYI_CACHE_FRESH_TTL 內）：直接回傳快取
+- stale（超過 fresh 但在 JUNYI_CACHE_STALE_TTL 內）：先回傳舊資料，背景以 ETag / Last-Modified 條件式 GET 更新
+- 其餘：同步條件式 GET，304 沿用舊資料、200 更新快取
+錯誤回應不會寫入快取。
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from src.utils.http_pool import get_http_session, get_async_http_client, junyi_timeout
+
+JUNYI_CACHE_ENABLED = os.getenv("JUNYI_CACHE_ENABLED", "1") == "1"
+JUNYI_CACHE_MAX_ENTRIES = int(os.getenv("JUNYI_CACHE_MAX_ENTRIES", "2000"))
+JUNYI_CACHE_FRESH_TTL = float(os.getenv("JUNYI_CACHE_FRESH_TTL", "600"))
+JUNYI_CACHE_STALE_TTL = float(os.getenv("JUNYI_CACHE_STALE_TTL", "86400"))
+# 設定後啟用 sqlite 持久層，例如 JUNYI_CACHE_DB_PATH=.cache/junyi_cache.sqlite3
+JUNYI_CACHE_DB_PATH = os.getenv("JUNYI_CACHE_DB_PATH", "")
+
+class CacheEntry:
+    def __init__(self, value: Any, etag: Optional[str] = None, last_modified: Optional[str] = None, fetched_at: float = None):
+        self.value = value
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+class JunyiContentCache:
+    def __init__(self, max_entries: int = JUNYI_CACHE_MAX_ENTRIES, fresh_ttl: float = JUNYI_CACHE_FRESH_TTL,
+                 stale_ttl: float = JUNYI_CACHE_STALE_TTL, db_path: str = JUNYI_CACHE_DB_PATH, enabled: bool = JUNYI_CACHE_ENABLED):
+        # enabled=False 時不查也不寫快取，每次都直接打 API
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.db_path = db_path
+        self._memory = OrderedDict()  # key -> CacheEntry
+        self._lock = threading.Lock()
+        self._db = None
+        self._refreshing = set()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="junyi-revalidate")
+        self._stats = {"fresh_hits": 0, "stale_hits": 0, "misses": 0, "not_modified": 0, "refreshed": 0, "background_refreshes": 0, "errors": 0}
+
+    def _get_db(self):
+        if not self.db_path:
+            return None
+        if self._db is None:
+            folder = os.path.dirname(self.db_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS junyi_cache (key TEXT PRIMARY KEY, value TEXT, etag TEXT, last_modified TEXT, fetched_at REAL)")
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key: str, entry: CacheEntry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+            db = self._get_db()
+            if db is None:
+                return None
+            row = db.execute("SELECT value, etag, last_modified, fetched_at FROM junyi_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            entry = CacheEntry(json.loads(row[0]), row[1], row[2], row[3])
+            self._remember(key, entry)
+            return entry
+
+    def set_entry(self, key: str, entry: CacheEntry):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._remember(key, entry)
+            db = self._get_db()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO junyi_cache (key, value, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, json.dumps(entry.value, ensure_ascii=False), entry.etag, entry.last_modified, entry.fetched_at)
+                )
+                db.commit()
+
+    def touch(self, key: str, entry: CacheEntry):
+        # 304 Not Modified：內容不變，只更新取得時間
+        entry.fetched_at = time.time()
+        self.set_entry(key, entry)
+
+    def freshness(self, entry: CacheEntry) -> str:
+        age = time.time() - entry.fetched_at
+        if age <= self.fresh_ttl:
+            return "fresh"
+        if age <= self.fresh_ttl + self.stale_ttl:
+            return "stale"
+        return "expired"
+
+    def count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _store_response(self, key: str, entry: Optional[CacheEntry], status_code: int, headers, payload_fn: Callable, transform: Callable):
+        if status_code == 304 and entry is not None:
+            self.touch(key, entry)
+            self.count("not_modified")
+            return entry.value
+        value = transform(payload_fn())
+        self.set_entry(key, CacheEntry(value, headers.get("ETag"), headers.get("Last-Modified")))
+        self.count("refreshed")
+        return value
+
+    def _revalidate(self, key: str, url: str, transform: Callable, entry: Optional[CacheEntry]):
+        headers = entry.conditional_headers() if entry else {}
+        resp = get_http_session().get(url, headers=headers, timeout=junyi_timeout())
+        if resp.status_code != 304:
+            resp.raise_for_status()
+        return self._store_response(key, entry, resp.status_code, resp.headers, resp.json, transform)
+
+    def _schedule_revalidate(self, key: str, url: str, transform: Callable, entry: CacheEntry):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            self._stats["background_refreshes"] += 1
+
+        def job():
+            try:
+                self._revalidate(key, url, transform, entry)
+            except Exception as e:
+                # 背景更新失敗時保留舊資料
+                self.count("errors")
+                print(f"[JunyiContentCache] 背景更新失敗 {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+        self._executor.submit(job)
+
+    def _lookup(self, key: str, url: str, transform: Callable):
+        """
+        回傳 (是否可直接回傳, 快取值或 None, entry)。
+        """
+        if not self.enabled:
+            return False, None, None
+        entry = self.get_entry(key)
+        if entry is None:
+            self.count("misses")
+            return False, None, None
+        state = self.freshness(entry)
+        if state == "fresh":
+            self.count("fresh_hits")
+            return True, entry.value, entry
+        if state == "stale":
+            self.count("stale_hits")
+            self._schedule_revalidate(key, url, transform, entry)
+            return True, entry.value, entry
+        self.count("misses")
+        return False, None, entry
+
+    def fetch(self, key: str, url: str, transform: Callable = lambda data: data):
+        """
+        透過快取取得 url 的 JSON（transform 後的結果）；上游錯誤直接 raise，不寫入快取。
+        """
+        hit, value, entry = self._lookup(key, url, transform)
+        if hit:
+            return value
+        return self._revalidate(key, url, transform, entry)
+
+    async def fetch_async(self, key: str, url: str, transform: Callable = lambda data: data):
+        """
+        fetch 的 async 版本；未命中時以共用 AsyncClient 條件式 GET。
+        """
+        hit, value, entry = self._lookup(key, url, transform)
+        if hit:
+            return value
+        headers = entry.conditional_headers() if entry else {}
+        resp = await get_async_http_client().get(url, headers=headers)
+        if resp.status_code != 304:
+            resp.raise_for_status()
+        return self._store_response(key, entry, resp.status_code, resp.headers, resp.json, transform)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            for k in self._stats:
+                self._stats[k] = 0
+            db = self._get_db()
+            if db is not None:
+                db.execute("DELETE FROM junyi_cache")
+                db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, "enabled": self.enabled, "memory_entries": len(self._memory), "fresh_ttl": self.fresh_ttl,
+                    "stale_ttl": self.stale_ttl, "disk_enabled": bool(self.db_path)}
+
+_JUNYI_CACHE = None
+
+def get_junyi_cache() -> JunyiContentCache:
+    global _JUNYI_CACHE
+    if _JUNYI_CACHE is None:
+        _JUNYI_CACHE = JunyiContentCache()
+    return _JUNYI_CACHE
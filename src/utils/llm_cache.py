@@ -0,0 +1,129 @@
+"""
+LLM 回應快取：只快取 deterministic（temperature=0）的呼叫。
+記憶體層為 LRU，可選 sqlite 磁碟層（重啟後仍有效），兩層共用同一個 TTL。
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+# 設定後啟用 sqlite 磁碟層，例如 LLM_CACHE_DB_PATH=.cache/llm_cache.sqlite3
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH", "")
+
+def is_deterministic(temperature: Optional[float]) -> bool:
+    """
+    只有明確指定 temperature=0 的呼叫才視為 deterministic，可以快取。
+    """
+    return temperature is not None and temperature == 0
+
+def make_cache_key(model: str, messages: List[Dict], temperature: Optional[float]) -> str:
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature},
+        ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMResponseCache:
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl: float = LLM_CACHE_TTL, db_path: str = LLM_CACHE_DB_PATH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self._memory = OrderedDict()  # key -> (value, created_at)
+        self._lock = threading.Lock()
+        self._db = None
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+
+    def _get_db(self):
+        if not self.db_path:
+            return None
+        if self._db is None:
+            folder = os.path.dirname(self.db_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT, created_at REAL)")
+            self._db.commit()
+        return self._db
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                if not self._expired(item[1]):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return item[0]
+                del self._memory[key]
+            db = self._get_db()
+            if db is not None:
+                row = db.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if not self._expired(row[1]):
+                        self._remember(key, row[0], row[1])
+                        self._stats["disk_hits"] += 1
+                        return row[0]
+                    db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    db.commit()
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: str):
+        if value is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self._stats["sets"] += 1
+            db = self._get_db()
+            if db is not None:
+                db.execute("INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)", (key, value, now))
+                db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            for k in self._stats:
+                self._stats[k] = 0
+            db = self._get_db()
+            if db is not None:
+                db.execute("DELETE FROM llm_cache")
+                db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            total = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "hits": hits,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "disk_enabled": bool(self.db_path),
+            }
+
+_LLM_CACHE = None
+
+def get_llm_cache() -> LLMResponseCache:
+    global _LLM_CACHE
+    if _LLM_CACHE is None:
+        _LLM_CACHE = LLMResponseCache()
+    return _LLM_CACHE
@@ -0,0 +1,205 @@
+"""
+共用 LLM client 層：process 內共用一組連線池化的 OpenAI client（sync / async），
+call_llm 與 openai_query_llm 都經過這裡，避免每次呼叫都重建 HTTP 連線池與 TLS handshake。
+"""
+import os
+import asyncio
+import threading
+import weakref
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+import httpx
+import openai
+from src.utils.llm_cache import LLM_CACHE_ENABLED, get_llm_cache, is_deterministic, make_cache_key
+from src.utils.single_flight import SingleFlight
+from src.utils.async_utils import run_sync
+
+# 連線池設定（可用環境變數調整）
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+_client_lock = threading.Lock()
+_sync_client: Optional[openai.OpenAI] = None
+# httpx 的 async 連線池綁定 event loop，因此每個 loop 各自一個 AsyncOpenAI
+_async_clients = weakref.WeakKeyDictionary()
+
+# 相同的 deterministic 呼叫同時進行時只打一次 LLM
+LLM_FLIGHT = SingleFlight("llm")
+
+# 供應商端 prompt prefix cache 的命中情形（來自 response.usage）
+_PROMPT_USAGE = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+_usage_lock = threading.Lock()
+
+def _record_usage(response):
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None)
+    if not isinstance(prompt_tokens, int):
+        return
+    with _usage_lock:
+        _PROMPT_USAGE["requests"] += 1
+        _PROMPT_USAGE["prompt_tokens"] += prompt_tokens
+        _PROMPT_USAGE["cached_tokens"] += cached_tokens if isinstance(cached_tokens, int) else 0
+
+def get_prompt_cache_stats() -> Dict:
+    with _usage_lock:
+        stats = dict(_PROMPT_USAGE)
+    stats["hit_rate"] = round(stats["cached_tokens"] / stats["prompt_tokens"], 4) if stats["prompt_tokens"] else 0.0
+    return stats
+
+def reset_prompt_cache_stats():
+    with _usage_lock:
+        for name in _PROMPT_USAGE:
+            _PROMPT_USAGE[name] = 0
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+def get_openai_client() -> openai.OpenAI:
+    """
+    取得 process 共用的 sync OpenAI client（lazy 建立，thread-safe）。
+    """
+    global _sync_client
+    if _sync_client is None:
+        with _client_lock:
+            if _sync_client is None:
+                _sync_client = openai.OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    max_retries=LLM_MAX_RETRIES,
+                    http_client=openai.DefaultHttpxClient(limits=_limits(), timeout=_timeout()),
+                )
+    return _sync_client
+
+def get_async_openai_client() -> openai.AsyncOpenAI:
+    """
+    取得目前 event loop 共用的 AsyncOpenAI client。
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = openai.AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=LLM_MAX_RETRIES,
+            http_client=openai.DefaultAsyncHttpxClient(limits=_limits(), timeout=_timeout()),
+        )
+        _async_clients[loop] = client
+    return client
+
+async def close_async_openai_client():
+    """
+    關閉目前 event loop 的 AsyncOpenAI client（server shutdown 時呼叫）。
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.close()
+
+def run_sync_with_llm(coro):
+    """
+    在同步程式碼中執行會呼叫 async LLM 的 coroutine。
+    run_sync 每次都開新的 event loop，結束前關閉該 loop 的 AsyncOpenAI client，避免每次呼叫外洩一組連線池。
+    """
+    async def runner():
+        try:
+            return await coro
+        finally:
+            await close_async_openai_client()
+    return run_sync(runner())
+
+def reset_openai_clients():
+    """
+    丟棄目前共用的 client（測試或設定變更後使用），下次呼叫會重新建立。
+    """
+    global _sync_client
+    with _client_lock:
+        _sync_client = None
+        _async_clients.clear()
+
+def _completion_kwargs(model: str, messages: List[Dict], temperature: Optional[float]) -> Dict:
+    kwargs = {"model": model, "messages": messages}
+    # temperature 為 None 時沿用模型預設值
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    return kwargs
+
+def _request_key(model: str, messages: List[Dict], temperature: Optional[float]) -> Optional[str]:
+    # 非 deterministic 呼叫（如 /chat 的 temperature=0.7）不快取也不合併，每次都是新的生成
+    if not is_deterministic(temperature):
+        return None
+    return make_cache_key(model, messages, temperature)
+
+def _create_completion(model: str, messages: List[Dict], temperature: Optional[float]) -> str:
+    response = get_openai_client().chat.completions.create(**_completion_kwargs(model, messages, temperature))
+    _record_usage(response)
+    return response.choices[0].message.content
+
+async def _create_completion_async(model: str, messages: List[Dict], temperature: Optional[float]) -> str:
+    client = get_async_openai_client()
+    response = await client.chat.completions.create(**_completion_kwargs(model, messages, temperature))
+    _record_usage(response)
+    return response.choices[0].message.content
+
+def chat_completion(model: str, messages: List[Dict], temperature: Optional[float] = None, use_cache: bool = True) -> str:
+    """
+    透過共用 client 呼叫 chat completion，回傳 content 字串。
+    temperature=0 的呼叫會先查 LLM 回應快取，同時進行的相同呼叫只送出一次。
+    """
+    key = _request_key(model, messages, temperature)
+    if key is None:
+        return _create_completion(model, messages, temperature)
+    cache_enabled = use_cache and LLM_CACHE_ENABLED
+    if cache_enabled:
+        cached = get_llm_cache().get(key)
+        if cached is not None:
+            return cached
+    content = LLM_FLIGHT.do(key, _create_completion, model, messages, temperature)
+    if cache_enabled:
+        get_llm_cache().set(key, content)
+    return content
+
+async def chat_completion_async(model: str, messages: List[Dict], temperature: Optional[float] = None, use_cache: bool = True) -> str:
+    """
+    chat_completion 的 async 版本，使用共用 AsyncOpenAI client。
+    """
+    key = _request_key(model, messages, temperature)
+    if key is None:
+        return await _create_completion_async(model, messages, temperature)
+    cache_enabled = use_cache and LLM_CACHE_ENABLED
+    if cache_enabled:
+        cached = get_llm_cache().get(key)
+        if cached is not None:
+            return cached
+    content = await LLM_FLIGHT.do_async(key, _create_completion_async, model, messages, temperature)
+    if cache_enabled:
+        get_llm_cache().set(key, content)
+    return content
+
+def chat_completion_stream(model: str, messages: List[Dict], temperature: Optional[float] = None) -> Iterator[str]:
+    """
+    串流版本：逐段 yield LLM 產生的文字（不經過快取）。
+    """
+    stream = get_openai_client().chat.completions.create(stream=True, **_completion_kwargs(model, messages, temperature))
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+async def chat_completion_stream_async(model: str, messages: List[Dict], temperature: Optional[float] = None) -> AsyncIterator[str]:
+    """
+    chat_completion_stream 的 async 版本。
+    """
+    client = get_async_openai_client()
+    stream = await client.chat.completions.create(stream=True, **_completion_kwargs(model, messages, temperature))
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
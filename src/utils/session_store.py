@@ -0,0 +1,235 @@
+"""
+多輪查詢的 server 端 session：以 session_id 保存每一步的 tool 歷程，前端每次只送新的 query / step。
+歷程在加入時就序列化（逐步累加 JSON 字串），組 prompt 時不必每次重新 json.dumps 整段歷程。
+記憶體層有 TTL 與總大小上限（LRU 淘汰），可選 sqlite 持久層（重啟或被淘汰後仍可讀回）。
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from src.utils.tool_memo import ToolMemo
+
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "1000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(50 * 1024 * 1024)))
+# 設定後啟用 sqlite 持久層，例如 SESSION_DB_PATH=.cache/sessions.sqlite3
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "")
+# 持久層清除過期 session 的最短間隔（秒）；store 建立時先清一次，之後在讀取持久層時最多每隔這麼久清一次
+SESSION_PURGE_INTERVAL = float(os.getenv("SESSION_PURGE_INTERVAL", "300"))
+
+class Session:
+    def __init__(self, session_id: str, steps: List[Dict] = None, updated_at: float = None):
+        self.id = session_id
+        self.steps: List[Dict] = []
+        self._body = ""  # 逗號分隔的各 step JSON，與 json.dumps(steps, ensure_ascii=False) 的內容相同
+        self.memo = ToolMemo()  # (tool_id, 參數) → 已查過的結果
+        for step in steps or []:
+            self.append(step)
+        # 重播歷程會更新 updated_at，最後才設定，從持久層讀回的 session 才會保留原本的最後使用時間
+        self.updated_at = updated_at or time.time()
+
+    def append(self, step: Dict) -> str:
+        encoded = json.dumps(step, ensure_ascii=False)
+        self._body = f"{self._body}, {encoded}" if self._body else encoded
+        self.steps.append(step)
+        self.memo.add_step(step)
+        self.updated_at = time.time()
+        return encoded
+
+    @property
+    def history_json(self) -> str:
+        return f"[{self._body}]"
+
+    @property
+    def size(self) -> int:
+        return len(self._body)
+
+class SQLiteSessionBackend:
+    """
+    持久層：每個 step 一列，append 時只寫入新的一列。
+    """
+    def __init__(self, path: str):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS session_steps (session_id TEXT, position INTEGER, step TEXT, created_at REAL, PRIMARY KEY (session_id, position))")
+        self._db.execute("CREATE INDEX IF NOT EXISTS session_steps_created ON session_steps (session_id, created_at)")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def append(self, session_id: str, position: int, encoded_step: str):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO session_steps VALUES (?, ?, ?, ?)", (session_id, position, encoded_step, time.time()))
+            self._db.commit()
+
+    def load(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            rows = self._db.execute("SELECT step, created_at FROM session_steps WHERE session_id = ? ORDER BY position", (session_id,)).fetchall()
+        if not rows:
+            return None
+        return Session(session_id, [json.loads(r[0]) for r in rows], updated_at=rows[-1][1])
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM session_steps WHERE session_id = ?", (session_id,))
+            self._db.commit()
+
+    def purge_expired(self, ttl: float) -> int:
+        """
+        刪除最後一步早於 ttl 秒前的 session，回傳刪除的 session 數。
+        """
+        if ttl <= 0:
+            return 0
+        cutoff = time.time() - ttl
+        with self._lock:
+            expired = [r[0] for r in self._db.execute(
+                "SELECT session_id FROM session_steps GROUP BY session_id HAVING MAX(created_at) < ?", (cutoff,)
+            ).fetchall()]
+            self._db.executemany("DELETE FROM session_steps WHERE session_id = ?", [(sid,) for sid in expired])
+            self._db.commit()
+        return len(expired)
+
+class SessionStore:
+    def __init__(self, ttl: float = SESSION_TTL, max_entries: int = SESSION_MAX_ENTRIES, max_bytes: int = SESSION_MAX_BYTES, backend=None,
+                 purge_interval: float = SESSION_PURGE_INTERVAL):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self.purge_interval = purge_interval
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "hits": 0, "misses": 0, "backend_loads": 0, "expired": 0, "evictions": 0, "purges": 0}
+        self._last_purge = 0.0
+        self._maybe_purge()
+
+    def _expired(self, session: Session) -> bool:
+        return self.ttl > 0 and time.time() - session.updated_at > self.ttl
+
+    def _maybe_purge(self):
+        # 清除要掃整張表，不在每次讀取時做；間隔內只清一次
+        if self.backend is None:
+            return
+        now = time.time()
+        with self._lock:
+            if now - self._last_purge < self.purge_interval:
+                return
+            self._last_purge = now
+            self._stats["purges"] += 1
+        self.backend.purge_expired(self.ttl)
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session.size
+
+    def _remember(self, session: Session):
+        self._drop(session.id)
+        self._sessions[session.id] = session
+        self._bytes += session.size
+        self._evict()
+
+    def _evict(self):
+        # 超過數量或總大小上限時淘汰最久沒用的 session（持久層仍保留）
+        # 單一 session 本身超過大小上限時仍保留（正在使用中）
+        while len(self._sessions) > self.max_entries or (self._bytes > self.max_bytes and len(self._sessions) > 1):
+            self._drop(next(iter(self._sessions)))
+            self._stats["evictions"] += 1
+
+    def create(self, session_id: str = None, steps: List[Dict] = None) -> Session:
+        session = Session(session_id or uuid.uuid4().hex)
+        if session_id and self.backend is not None:
+            # 沿用舊 id 重新建立時清掉持久層的舊歷程，避免新 step 依位置覆蓋後殘留舊資料
+            self.backend.delete(session_id)
+        with self._lock:
+            self._remember(session)
+            self._stats["created"] += 1
+        for step in steps or []:
+            self.append(session.id, step)
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        if not session_id:
+            return None
+        expired = False
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and self._expired(session):
+                self._drop(session_id)
+                self._stats["expired"] += 1
+                expired = True
+                session = None
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                self._stats["hits"] += 1
+                return session
+        if self.backend is not None:
+            if expired:
+                self.backend.delete(session_id)
+            else:
+                self._maybe_purge()
+                session = self.backend.load(session_id)
+                if session is not None and self._expired(session):
+                    # 還沒輪到定期清除的過期 session 也不能讀回
+                    self.backend.delete(session_id)
+                    with self._lock:
+                        self._stats["expired"] += 1
+                    session = None
+            if session is not None:
+                with self._lock:
+                    self._remember(session)
+                    self._stats["backend_loads"] += 1
+                return session
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def get_or_create(self, session_id: str = None) -> Session:
+        return self.get(session_id) or self.create(session_id)
+
+    def append(self, session_id: str, step: Dict) -> Session:
+        session = self.get_or_create(session_id)
+        with self._lock:
+            before = session.size
+            encoded = session.append(step)
+            if session.id in self._sessions:
+                self._bytes += session.size - before
+                self._sessions.move_to_end(session.id)
+                self._evict()
+        if self.backend is not None:
+            self.backend.append(session.id, len(session.steps) - 1, encoded)
+        return session
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._drop(session_id)
+        if self.backend is not None:
+            self.backend.delete(session_id)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "sessions": len(self._sessions), "bytes": self._bytes, "persistent": self.backend is not None}
+
+_SESSION_STORE: Optional[SessionStore] = None
+_SESSION_STORE_LOCK = threading.Lock()
+
+def get_session_store() -> SessionStore:
+    global _SESSION_STORE
+    if _SESSION_STORE is None:
+        with _SESSION_STORE_LOCK:
+            if _SESSION_STORE is None:
+                backend = SQLiteSessionBackend(SESSION_DB_PATH) if SESSION_DB_PATH else None
+                _SESSION_STORE = SessionStore(backend=backend)
+    return _SESSION_STORE
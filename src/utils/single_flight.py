@@ -0,0 +1,111 @@
+"""
+Single-flight：同一個 key 同時只有一個上游請求在進行，
+其他同時到達的相同呼叫等待同一個結果，不重複打 LLM / Junyi API。
+"""
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class _AsyncCall:
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}        # key -> _Call（sync）
+        self._async_calls = {}  # (event loop, key) -> _AsyncCall（async）
+        self._stats = {"calls": 0, "executed": 0, "collapsed": 0}
+        _SINGLE_FLIGHTS[name] = self
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        同步版本：第一個呼叫者執行 fn，同時間相同 key 的呼叫者等待並共用結果（或例外）。
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats["collapsed"] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["executed"] += 1
+                leader = True
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    async def do_async(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        async 版本：fn 為回傳 coroutine 的函式，同一個 event loop 內相同 key 的呼叫共用同一個 task。
+        task 屬於這個 flight 而不是第一個呼叫者：某個呼叫者被取消（逾時、斷線）只影響它自己，
+        其他等待者照樣拿到結果；所有等待者都離開時才取消 task。
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._async_calls.get(flight_key)
+            if call is not None:
+                self._stats["collapsed"] += 1
+            else:
+                call = _AsyncCall(loop.create_task(fn(*args, **kwargs)))
+                self._async_calls[flight_key] = call
+                self._stats["executed"] += 1
+                call.task.add_done_callback(lambda task: self._finish_async(flight_key, call))
+            call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            with self._lock:
+                call.waiters -= 1
+                abandon = call.waiters == 0 and not call.task.done()
+                if abandon and self._async_calls.get(flight_key) is call:
+                    # 之後相同 key 的呼叫重新執行，不會加入正在取消的 task
+                    self._async_calls.pop(flight_key)
+            if abandon:
+                call.task.cancel()
+
+    def _finish_async(self, flight_key, call: "_AsyncCall"):
+        with self._lock:
+            if self._async_calls.get(flight_key) is call:
+                self._async_calls.pop(flight_key)
+        # 沒有等待者時避免 "exception was never retrieved" 警告
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls) + len(self._async_calls)}
+
+    def reset_stats(self):
+        with self._lock:
+            for k in self._stats:
+                self._stats[k] = 0
+
+_SINGLE_FLIGHTS: Dict[str, SingleFlight] = {}
+
+def get_single_flight_stats() -> Dict[str, Dict]:
+    return {name: flight.stats() for name, flight in _SINGLE_FLIGHTS.items()}
@@ -0,0 +1,67 @@
+"""
+多輪推理的工具結果 memo：同一個 session 內，以 (tool_id, 正規化後的參數) 記住已查過的結果，
+planner 再次要求相同查詢時直接回傳先前結果、不再呼叫工具，並用來判斷整段歷程是否重複。
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+PARALLEL_TOOL_ID = "parallel"
+
+def canonical_params(params: Optional[Dict[str, Any]]) -> str:
+    # 參數順序、字串前後空白不同視為同一個查詢
+    normalized = {k: v.strip() if isinstance(v, str) else v for k, v in (params or {}).items()}
+    return json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+
+def memo_key(tool_id: str, params: Optional[Dict[str, Any]]) -> Tuple[str, str]:
+    return tool_id, canonical_params(params)
+
+def step_calls(step: Dict[str, Any]) -> List[Tuple[Optional[str], Dict[str, Any], Any]]:
+    """
+    把歷程中的一個 step 拆成 (tool_id, parameters, result)；並行 step 的 parameters / result 依序對應。
+    """
+    if step.get("tool_id") == PARALLEL_TOOL_ID and isinstance(step.get("parameters"), list):
+        results = step.get("result") if isinstance(step.get("result"), list) else []
+        return [
+            (call.get("tool_id"), call.get("parameters") or {}, results[i] if i < len(results) else None)
+            for i, call in enumerate(step["parameters"])
+        ]
+    return [(step.get("tool_id"), step.get("parameters") or {}, step.get("result"))]
+
+def _is_error(result: Any) -> bool:
+    return isinstance(result, dict) and "error" in result
+
+class ToolMemo:
+    def __init__(self, steps: List[Dict[str, Any]] = None):
+        self._results: Dict[Tuple[str, str], Any] = {}
+        # 舊格式歷程沒有 tool_id 的 step，只能用參數比對
+        self._anonymous = set()
+        for step in steps or []:
+            self.add_step(step)
+
+    def add_step(self, step: Dict[str, Any]):
+        for tool_id, params, result in step_calls(step):
+            if not tool_id:
+                self._anonymous.add(canonical_params(params))
+            elif not _is_error(result):
+                # 失敗的結果不記，之後可以重試
+                self._results[memo_key(tool_id, params)] = result
+
+    def lookup(self, tool_id: str, params: Dict[str, Any]) -> Tuple[bool, Any]:
+        key = memo_key(tool_id, params)
+        if key in self._results:
+            return True, self._results[key]
+        return False, None
+
+    def seen(self, tool_id: Optional[str], params: Dict[str, Any]) -> bool:
+        if canonical_params(params) in self._anonymous:
+            return True
+        if tool_id:
+            return memo_key(tool_id, params) in self._results
+        return any(key[1] == canonical_params(params) for key in self._results)
+
+    def is_repeat(self, step: Dict[str, Any]) -> bool:
+        # step 內的每個查詢在這個 session 都查過了
+        return all(self.seen(tool_id, params) for tool_id, params, _ in step_calls(step))
+
+    def __len__(self):
+        return len(self._results) + len(self._anonymous)
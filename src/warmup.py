@@ -0,0 +1,71 @@
+"""
+啟動預熱（warmup）：server 啟動後在背景執行，不延遲 readiness。
+1. 均一 root 課程樹與歷史上最常被查詢的 topic（來自 TopicPopularity 的持久化次數）
+2. 每個 agent 的 example_queries 走一次路由（參數抽取 + 選工具），預先填好 deterministic LLM 快取
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, List
+from src.agent_registry import get_agent_list
+from src.orchestrator import plan_single_turn_async
+from src.tools.junyi_tree_tool import get_junyi_tree_async
+from src.tools.junyi_topic_tool import get_junyi_topics_batch_async
+from src.tools.junyi_popularity import get_topic_popularity, untracked
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+WARMUP_TOP_TOPICS = int(os.getenv("WARMUP_TOP_TOPICS", "20"))
+WARMUP_ROUTING = os.getenv("WARMUP_ROUTING", "1") == "1"
+WARMUP_ROUTING_CONCURRENCY = int(os.getenv("WARMUP_ROUTING_CONCURRENCY", "3"))
+
+# 最近一次 warmup 的結果，供 /stats 觀察
+WARMUP_STATUS: Dict[str, Any] = {"state": "idle"}
+
+async def warm_junyi_cache_async(top_n: int = None) -> Dict:
+    top_n = WARMUP_TOP_TOPICS if top_n is None else top_n
+    with untracked():
+        root = await get_junyi_tree_async(topic_id="root", depth=1)
+        topic_ids = get_topic_popularity().top(top_n)
+        batch = await get_junyi_topics_batch_async(topic_ids) if topic_ids else {"topics": {}, "errors": {}}
+    return {
+        "root_tree": "error" not in root if isinstance(root, dict) else False,
+        "topics": len(batch["topics"]),
+        "topic_errors": len(batch["errors"]),
+    }
+
+async def warm_routing_async(agent_list: List[Dict] = None, concurrency: int = None) -> Dict:
+    agent_list = get_agent_list() if agent_list is None else agent_list
+    queries = list(dict.fromkeys(q for agent in agent_list for q in agent.get("example_queries", [])))
+    semaphore = asyncio.Semaphore(concurrency or WARMUP_ROUTING_CONCURRENCY)
+
+    async def warm_one(query):
+        async with semaphore:
+            try:
+                plan = await plan_single_turn_async(query)
+                return plan["type"] == "plan"
+            except Exception as e:
+                print(f"[warmup] 路由預熱失敗 {query}: {e}")
+                return False
+
+    results = await asyncio.gather(*[warm_one(q) for q in queries])
+    return {"queries": len(queries), "planned": sum(1 for r in results if r)}
+
+async def run_warmup() -> Dict:
+    """
+    依序預熱均一快取與路由；任何一步失敗只記錄，不影響 server 運作。
+    """
+    WARMUP_STATUS.clear()
+    WARMUP_STATUS.update({"state": "running", "started_at": time.time()})
+    try:
+        WARMUP_STATUS["junyi"] = await warm_junyi_cache_async()
+    except Exception as e:
+        WARMUP_STATUS["junyi"] = {"error": str(e)}
+    if WARMUP_ROUTING:
+        try:
+            WARMUP_STATUS["routing"] = await warm_routing_async()
+        except Exception as e:
+            WARMUP_STATUS["routing"] = {"error": str(e)}
+    WARMUP_STATUS["state"] = "done"
+    WARMUP_STATUS["elapsed"] = round(time.time() - WARMUP_STATUS["started_at"], 3)
+    print(f"[warmup] {WARMUP_STATUS}")
+    return dict(WARMUP_STATUS)
@@ -0,0 +1,27 @@
+import os
+# 測試時不在背景做 warmup 與熱門子主題預取，避免打到真實的 Junyi / OpenAI
+os.environ.setdefault("WARMUP_ENABLED", "0")
+os.environ.setdefault("JUNYI_PREFETCH_ENABLED", "0")
+import pytest
+from src.utils.llm_pool import reset_openai_clients
+from src.utils.llm_cache import get_llm_cache
+from src.utils.http_pool import reset_http_clients
+from src.utils.junyi_cache import get_junyi_cache
+from src.tools.junyi_popularity import get_topic_popularity
+from src.utils.session_store import get_session_store
+from src.utils.agent_result_cache import get_agent_result_cache
+
+@pytest.fixture(autouse=True)
+def reset_shared_clients():
+    # 每個測試使用全新的共用 client，避免 patch 與快取互相影響
+    reset_openai_clients()
+    reset_http_clients()
+    get_llm_cache().clear()
+    get_junyi_cache().clear()
+    get_topic_popularity().clear()
+    get_session_store().clear()
+    get_agent_result_cache().clear()
+    yield
+    reset_openai_clients()
+    get_llm_cache().clear()
+    get_junyi_cache().clear()
@@ -0,0 +1,61 @@
+import asyncio
+from unittest.mock import patch, AsyncMock
+from src.orchestrator import dispatch_agent_single_turn, dispatch_agent_single_turn_async
+from src.orchestrator_utils.dispatch_decision import decide_dispatch, decision_trace
+
+def topic_func(topic_id):
+    return {"topic": topic_id}
+
+def tree_func(topic_id):
+    return {"tree": topic_id}
+
+PARAM = [{"name": "topic_id", "type": "str", "pattern": "^[a-z_]+$"}]
+AGENTS = [
+    {"id": "topic", "name": "主題", "description": "查主題", "parameters": PARAM, "example_queries": ["查詢 topic_id 為 root 的主題內容"], "function": topic_func},
+    {"id": "tree", "name": "課程樹", "description": "查課程樹", "parameters": PARAM, "example_queries": ["列出均一課程樹的子節點"], "function": tree_func},
+]
+
+def entry(agent_id, params, available=True):
+    return {"agent_id": agent_id, "agent_name": agent_id, "extracted_params": params, "available": available}
+
+def test_single_available_agent_dispatches_directly():
+    decision = decide_dispatch("查 root", [entry("topic", {"topic_id": "root"}), entry("tree", None, False)], AGENTS)
+    assert decision["stage"] == "direct" and decision["tool"]["id"] == "topic"
+    assert decision_trace(decision)["skipped_llm_call"] is True
+
+def test_invalid_extracted_params_fall_back_to_llm():
+    decision = decide_dispatch("查 root", [entry("topic", {"topic_id": "ROOT!"}), entry("tree", None, False)], AGENTS)
+    assert decision["stage"] == "llm" and decision["candidates"] == ["topic"]
+
+def test_ranked_by_example_queries_when_clear():
+    filter_result = [entry("topic", {"topic_id": "root"}), entry("tree", {"topic_id": "root"})]
+    decision = decide_dispatch("列出均一課程樹的子節點 root", filter_result, AGENTS)
+    assert decision["stage"] == "ranked" and decision["tool"]["id"] == "tree"
+    decision = decide_dispatch("root", filter_result, AGENTS)
+    assert decision["stage"] == "llm" and decision["candidates"] == ["topic", "tree"]
+
+def test_parameterless_agent_always_goes_to_llm():
+    agents = AGENTS + [{"id": "free", "name": "free", "description": "", "parameters": [], "function": topic_func}]
+    filter_result = [entry("topic", {"topic_id": "root"}), entry("tree", None, False), entry("free", {})]
+    assert decide_dispatch("查 root", filter_result, agents)["stage"] == "llm"
+
+@patch("src.orchestrator.get_agent_list", return_value=AGENTS)
+@patch("src.orchestrator.filter_available_tools", return_value=[entry("topic", {"topic_id": "root"}), entry("tree", None, False)])
+@patch("src.orchestrator.call_llm")
+def test_dispatch_skips_second_llm_call(mock_llm, mock_filter, mock_tools):
+    result = dispatch_agent_single_turn("查 root")
+    mock_llm.assert_not_called()
+    assert result["results"] == [{"topic": "root"}]
+    assert result["trace"]["decision"]["stage"] == "direct"
+
+@patch("src.orchestrator.get_agent_list", return_value=AGENTS)
+@patch("src.orchestrator.filter_available_tools_async", new_callable=AsyncMock, return_value=[entry("topic", {"topic_id": "root"}), entry("tree", {"topic_id": "root"})])
+@patch("src.orchestrator.call_llm_async", new_callable=AsyncMock, return_value='{"tool_id": "tree", "parameters": {"topic_id": "root"}}')
+def test_llm_sees_only_available_agents(mock_llm, mock_filter, mock_tools):
+    AGENTS_WITH_EXTRA = AGENTS + [{"id": "other", "name": "其他", "description": "其他工具", "parameters": PARAM, "function": topic_func}]
+    mock_tools.return_value = AGENTS_WITH_EXTRA
+    result = asyncio.run(dispatch_agent_single_turn_async("root"))
+    # 完整工具清單留在 system prompt（固定前綴），只有可用的 agent 列在 user message 的可選工具
+    user_prompt = mock_llm.call_args.kwargs["messages"][1]["content"]
+    assert '可選工具：["topic", "tree"]' in user_prompt and '"other"' not in user_prompt
+    assert result["tool"] == "tree" and result["trace"]["decision"]["skipped_llm_call"] is False
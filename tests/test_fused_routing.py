@@ -0,0 +1,69 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import patch, AsyncMock
+from src.orchestrator import dispatch_fused_async
+from src.orchestrator_utils.validator import validate_tool_parameters, validate_fused_reply
+
+SCHEMA = [
+    {"name": "topic_id", "type": "str", "pattern": "^[a-zA-Z0-9_\\-]+$"},
+    {"name": "depth", "type": "int", "min": 1, "max": 3, "default": 1},
+    {"name": "mode", "type": "str", "enum": ["a", "b"], "required": False},
+]
+
+def test_validate_tool_parameters_coerces_and_drops_extra():
+    assert validate_tool_parameters({"topic_id": "root", "depth": "2", "x": 1}, SCHEMA) == {"topic_id": "root", "depth": 2}
+
+@pytest.mark.parametrize("params, message", [
+    ({}, "缺少必填參數"),
+    ({"topic_id": "bad id!"}, "格式不符"),
+    ({"topic_id": "root", "depth": 9}, "不可大於"),
+    ({"topic_id": "root", "depth": "x"}, "型別應為 int"),
+    ({"topic_id": "root", "mode": "c"}, "之一"),
+])
+def test_validate_tool_parameters_rejects(params, message):
+    with pytest.raises(Exception) as e:
+        validate_tool_parameters(params, SCHEMA)
+    assert message in str(e.value)
+
+def test_validate_fused_reply_unknown_tool():
+    with pytest.raises(Exception):
+        validate_fused_reply(json.dumps({"intent": "tool_call", "tool_id": "nope", "parameters": {}}), [{"id": "t", "parameters": []}])
+
+def test_fused_dispatch_calls_agent_in_one_llm_call():
+    reply = json.dumps({"intent": "tool_call", "tool_id": "get_junyi_topic", "parameters": {"topic_id": "math"}, "reason": "查主題"})
+    llm = AsyncMock(return_value=reply)
+    with patch("src.orchestrator.call_llm_async", llm), \
+         patch("src.agents.junyi_topic_agent.get_junyi_topic_async", AsyncMock(return_value={"title": "數學"})), \
+         patch("src.orchestrator.filter_available_tools_async") as mock_filter:
+        result = asyncio.run(dispatch_fused_async("User: 查 math 主題"))
+    assert llm.await_count == 1
+    mock_filter.assert_not_called()
+    assert result["route"] == "fused" and result["tool"] == "get_junyi_topic"
+    assert result["input"] == {"topic_id": "math"} and result["results"] == [{"title": "數學"}]
+
+def test_fused_dispatch_falls_back_to_staged_pipeline_on_invalid_reply():
+    reply = json.dumps({"intent": "tool_call", "tool_id": "get_junyi_topic", "parameters": {}})
+    staged = AsyncMock(return_value={"type": "result", "tool": "get_junyi_topic", "input": {"topic_id": "math"}, "results": [{}], "trace": {}})
+    with patch("src.orchestrator.call_llm_async", AsyncMock(return_value=reply)), \
+         patch("src.orchestrator.intent_analyzer_async", AsyncMock(return_value={"intent": "tool_call"})), \
+         patch("src.orchestrator.dispatch_agent_single_turn_async", staged):
+        result = asyncio.run(dispatch_fused_async("User: 查 math 主題"))
+    staged.assert_awaited_once_with("查 math 主題")
+    assert result["route"] == "staged" and "缺少必填參數" in result["fallback_reason"]
+
+def test_fused_dispatch_answers_greeting_locally():
+    llm = AsyncMock()
+    with patch("src.orchestrator.call_llm_async", llm):
+        result = asyncio.run(dispatch_fused_async("User: 謝謝"))
+    llm.assert_not_called()
+    assert result == {"type": "intent", "intent": "chat", "reason": "問候或道謝", "route": "rule"}
+
+def test_fused_dispatch_endpoint_suggests_api_for_non_tool_intent():
+    from fastapi.testclient import TestClient
+    from server import app
+    reply = json.dumps({"intent": "chat", "tool_id": None, "parameters": {}, "reason": "閒聊"})
+    with patch("src.orchestrator.call_llm_async", AsyncMock(return_value=reply)):
+        resp = TestClient(app).post("/agent/fused_dispatch", json={"prompt": "User: 你覺得天空為什麼是藍的"})
+    data = resp.json()
+    assert data["intent"] == "chat" and data["suggested_api"] == "/chat" and data["route"] == "fused"
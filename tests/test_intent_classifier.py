@@ -0,0 +1,57 @@
+import json
+from unittest.mock import patch
+from src.orchestrator_utils.intent_classifier import (
+    split_conversation, classify_locally, NgramIntentModel, log_intent_decision, read_decision_log, use_intent_model
+)
+from src.orchestrator_utils.intent_analyzer import intent_analyzer
+
+def test_split_conversation_takes_last_user_message():
+    assert split_conversation("User: hi") == ("hi", False)
+    assert split_conversation("User: 我是小明\nAssistant: 你好\nUser: 我叫什麼？") == ("我叫什麼？", True)
+
+def test_rules_answer_greetings_and_explicit_topic_id():
+    assert classify_locally("User: 謝謝！")["intent"] == "chat"
+    result = classify_locally("User: 請查 topic_id=math-fraction 的內容")
+    assert result["intent"] == "tool_call" and result["tier"] == "rule" and result["confidence"] >= 0.9
+    assert classify_locally("User: 我叫什麼名字？") is None
+
+def test_rules_leave_acknowledgements_with_history_to_model_or_llm():
+    assert classify_locally("User: 好的")["intent"] == "chat"
+    follow_up = "User: 分數是什麼？\nAssistant: 要幫你查均一的分數單元嗎？\nUser: {}"
+    for ack in ["好的", "ok", "收到！"]:
+        assert classify_locally(follow_up.format(ack)) is None
+    assert classify_locally(follow_up.format("謝謝！"))["intent"] == "chat"
+
+def test_ngram_model_trained_from_decision_log(tmp_path):
+    log_path = str(tmp_path / "decisions.jsonl")
+    for _ in range(10):
+        log_intent_decision("請幫我查分數的加減", False, "tool_call", path=log_path)
+        log_intent_decision("查詢均一課程樹", False, "tool_call", path=log_path)
+        log_intent_decision("今天天氣真好", False, "chat", path=log_path)
+        log_intent_decision("我剛剛說我叫什麼", True, "history_answer", path=log_path)
+    model = NgramIntentModel().fit(read_decision_log(log_path))
+    model_path = str(tmp_path / "model.json")
+    model.save(model_path)
+    loaded = NgramIntentModel.load(model_path)
+    intent, confidence = loaded.predict("幫我查分數", False)
+    assert intent == "tool_call" and confidence > 0.9
+    use_intent_model(loaded)
+    try:
+        result = classify_locally("User: 請幫我查分數的加減法")
+        assert result["tier"] == "model" and result["intent"] == "tool_call"
+    finally:
+        use_intent_model(None)
+
+@patch("src.orchestrator_utils.intent_analyzer.call_llm")
+def test_intent_analyzer_skips_llm_for_local_cases(mock_llm):
+    result = intent_analyzer("User: hello")
+    mock_llm.assert_not_called()
+    assert result["intent"] == "chat" and result["tier"] == "rule"
+
+@patch("src.orchestrator_utils.intent_analyzer.call_llm", return_value=json.dumps({"intent": "history_answer", "reason": "history 已有答案"}))
+def test_intent_analyzer_falls_back_to_llm_and_logs(mock_llm, tmp_path):
+    log_path = str(tmp_path / "decisions.jsonl")
+    with patch("src.orchestrator_utils.intent_classifier.INTENT_LOG_PATH", log_path):
+        result = intent_analyzer("User: 我是小明\nAssistant: 你好\nUser: 我叫什麼？")
+    assert result["tier"] == "llm" and result["confidence"] is None
+    assert list(read_decision_log(log_path)) == [("我叫什麼？", True, "history_answer")]
@@ -0,0 +1,68 @@
+import time
+from unittest.mock import patch, MagicMock
+from src.utils.junyi_cache import JunyiContentCache, CacheEntry
+
+class FakeResp:
+    def __init__(self, status_code=200, payload=None, headers=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = headers or {}
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"{self.status_code} error")
+    def json(self):
+        return self._payload
+
+URL = "https://example.com/topic/root"
+
+def test_fresh_hit_served_from_memory():
+    cache = JunyiContentCache(max_entries=10, fresh_ttl=60, stale_ttl=60, db_path="")
+    with patch("requests.Session.get", return_value=FakeResp(payload={"title": "數學"}, headers={"ETag": '"v1"'})) as mock_get:
+        assert cache.fetch("topic:root", URL) == {"title": "數學"}
+        assert cache.fetch("topic:root", URL) == {"title": "數學"}
+    assert mock_get.call_count == 1
+    assert cache.stats()["fresh_hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_expired_entry_revalidates_with_etag_304():
+    cache = JunyiContentCache(max_entries=10, fresh_ttl=60, stale_ttl=0, db_path="")
+    cache.set_entry("topic:root", CacheEntry({"title": "舊"}, etag='"v1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT", fetched_at=time.time() - 120))
+    with patch("requests.Session.get", return_value=FakeResp(status_code=304)) as mock_get:
+        assert cache.fetch("topic:root", URL) == {"title": "舊"}
+    headers = mock_get.call_args.kwargs["headers"]
+    assert headers == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    assert cache.stats()["not_modified"] == 1
+    assert cache.freshness(cache.get_entry("topic:root")) == "fresh"
+
+def test_stale_while_revalidate_refreshes_in_background():
+    cache = JunyiContentCache(max_entries=10, fresh_ttl=60, stale_ttl=3600, db_path="")
+    cache.set_entry("topic:root", CacheEntry({"title": "舊"}, etag='"v1"', fetched_at=time.time() - 120))
+    with patch("requests.Session.get", return_value=FakeResp(payload={"title": "新"}, headers={"ETag": '"v2"'})):
+        assert cache.fetch("topic:root", URL) == {"title": "舊"}  # 先回傳舊資料
+        cache._executor.shutdown(wait=True)
+    entry = cache.get_entry("topic:root")
+    assert entry.value == {"title": "新"} and entry.etag == '"v2"'
+    assert cache.stats()["stale_hits"] == 1 and cache.stats()["background_refreshes"] == 1
+
+def test_errors_not_cached():
+    cache = JunyiContentCache(max_entries=10, fresh_ttl=60, stale_ttl=60, db_path="")
+    with patch("requests.Session.get", return_value=FakeResp(status_code=500)):
+        try:
+            cache.fetch("topic:root", URL)
+        except Exception as e:
+            assert "500" in str(e)
+    assert cache.get_entry("topic:root") is None
+
+def test_disk_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "junyi.sqlite3")
+    JunyiContentCache(max_entries=10, fresh_ttl=60, stale_ttl=60, db_path=db_path).set_entry("tree:root:1", CacheEntry({"id": "root"}, etag='"v1"'))
+    restarted = JunyiContentCache(max_entries=10, fresh_ttl=60, stale_ttl=60, db_path=db_path)
+    with patch("requests.Session.get") as mock_get:
+        assert restarted.fetch("tree:root:1", URL) == {"id": "root"}
+    mock_get.assert_not_called()
+
+def test_disabled_cache_always_fetches():
+    cache = JunyiContentCache(max_entries=10, fresh_ttl=60, stale_ttl=60, db_path="", enabled=False)
+    with patch("requests.Session.get", return_value=FakeResp(payload={"a": 1})) as mock_get:
+        cache.fetch("topic:root", URL)
+        cache.fetch("topic:root", URL)
+    assert mock_get.call_count == 2
@@ -0,0 +1,54 @@
+from unittest.mock import patch
+import src.tools.junyi_tree_tool
+from src.tools.junyi_snapshot import build_junyi_snapshot, JunyiSnapshotIndex, use_snapshot
+
+FAKE_TREE = {
+    "root": {"topic_id": "root", "title": "全部", "children": [
+        {"topic_id": "math", "title": "數學"},
+        {"topic_id": "sci", "title": "自然"},
+    ]},
+    "math": {"topic_id": "math", "title": "數學", "intro": "數學課程", "children": [
+        {"topic_id": "fraction", "title": "分數"},
+    ]},
+    "sci": {"topic_id": "sci", "title": "自然", "children": []},
+    "fraction": {"topic_id": "fraction", "title": "分數", "children": [
+        {"topic_id": "fraction_add", "title": "分數的加減"},
+    ]},
+}
+
+def fake_fetch(topic_id, depth):
+    return FAKE_TREE.get(topic_id, {"error": "not found"})
+
+def build(tmp_path, max_depth=2):
+    path = str(tmp_path / "snapshot.sqlite3")
+    stats = build_junyi_snapshot(path, fake_fetch, max_depth=max_depth, max_workers=2)
+    return path, stats
+
+def test_build_snapshot_and_query_subtree(tmp_path):
+    path, stats = build(tmp_path)
+    assert stats["nodes"] == 4  # root, math, sci, fraction（fraction 未展開）
+    index = JunyiSnapshotIndex(path)
+    tree = index.get_subtree("root", depth=2)
+    assert [c["topic_id"] for c in tree["children"]] == ["math", "sci"]
+    assert tree["children"][0]["intro"] == "數學課程"
+    assert tree["children"][0]["children"] == [{"topic_id": "fraction", "title": "分數"}]
+    assert index.children("math") == [{"topic_id": "fraction", "title": "分數"}]
+
+def test_snapshot_depth_insufficient_returns_none(tmp_path):
+    path, _ = build(tmp_path)
+    index = JunyiSnapshotIndex(path)
+    assert index.get_subtree("fraction", depth=1) is None  # 快照沒展開 fraction
+    assert index.get_subtree("unknown", depth=1) is None
+    assert index.stats()["misses"] == 2
+
+def test_get_junyi_tree_uses_snapshot_then_live_fallback(tmp_path):
+    path, _ = build(tmp_path)
+    use_snapshot(path)
+    try:
+        with patch("src.tools.junyi_tree_tool._fetch_junyi_tree", return_value={"topic_id": "fraction", "live": True}) as mock_live:
+            assert src.tools.junyi_tree_tool.get_junyi_tree("math", depth=1)["title"] == "數學"
+            mock_live.assert_not_called()
+            assert src.tools.junyi_tree_tool.get_junyi_tree("fraction", depth=1) == {"topic_id": "fraction", "live": True}
+            mock_live.assert_called_once()
+    finally:
+        use_snapshot(None)
@@ -0,0 +1,83 @@
+from unittest.mock import patch
+from src.tools.junyi_title_index import TitleIndex, normalize_title, get_title_index
+from src.tools.junyi_topic_by_title_tool import get_junyi_topic_by_title
+
+TREE = {"topic_id": "root", "title": "全部", "children": [
+    {"topic_id": "math", "title": "數學", "children": [
+        {"topic_id": "fraction", "title": "分數"},
+        {"topic_id": "fraction_add", "title": "分數的加減"},
+        {"topic_id": "decimal", "title": "小數"},
+    ]},
+    {"topic_id": "english", "title": "English Grammar"},
+]}
+
+def test_normalize_title():
+    assert normalize_title("  ＥＮＧＬＩＳＨ　grammar！ ") == "englishgrammar"
+    assert normalize_title("分ㄈㄣ數ㄕㄨˋ") == "分數"
+
+def test_exact_and_normalized_match():
+    index = TitleIndex.from_tree(TREE)
+    assert len(index) == 6  # 含 root
+    assert index.resolve("分數") == ("fraction", index.search("分數"), False)
+    topic_id, candidates, ambiguous = index.resolve("english  GRAMMAR")
+    assert topic_id == "english" and not ambiguous
+    assert candidates[0]["match"] == "normalized"
+
+def test_ngram_match_ranks_candidates():
+    index = TitleIndex.from_tree(TREE)
+    candidates = index.search("分數加減")
+    assert candidates[0]["topic_id"] == "fraction_add"
+    assert candidates[0]["match"] == "ngram"
+
+def test_unknown_title_is_ambiguous():
+    index = TitleIndex.from_tree(TREE)
+    topic_id, candidates, ambiguous = index.resolve("幾何")
+    assert topic_id is None and ambiguous and candidates == []
+
+def test_tree_index_reused_for_same_tree():
+    assert get_title_index(TREE) is get_title_index(TREE)
+
+@patch("src.tools.junyi_topic_by_title_tool.get_junyi_tree", return_value=TREE)
+@patch("src.tools.junyi_topic_by_title_tool.openai_query_llm")
+@patch("src.tools.junyi_topic_by_title_tool.get_junyi_topic", return_value={"topic": "分數"})
+def test_topic_by_title_resolves_without_llm(mock_topic, mock_llm, mock_tree):
+    result = get_junyi_topic_by_title("分數")
+    mock_llm.assert_not_called()
+    mock_topic.assert_called_once_with(topic_id="fraction")
+    assert result["meta"]["match"]["resolved_by"] == "title_index"
+
+@patch("src.tools.junyi_topic_by_title_tool.get_junyi_tree", return_value=TREE)
+@patch("src.tools.junyi_topic_by_title_tool.openai_query_llm", return_value="fraction_add")
+@patch("src.tools.junyi_topic_by_title_tool.get_junyi_topic", return_value={"topic": "分數的加減"})
+def test_ambiguous_title_sends_only_candidates_to_llm(mock_topic, mock_llm, mock_tree):
+    result = get_junyi_topic_by_title("分數的")
+    prompt = mock_llm.call_args.kwargs["input"]
+    assert "fraction_add" in prompt and "english" not in prompt
+    assert result["meta"]["topic_id"] == "fraction_add"
+    assert result["meta"]["match"]["resolved_by"] == "llm"
+
+FAKE_PINYIN = {"分": ("fen", "ㄈㄣ"), "數": ("shu", "ㄕㄨˋ"), "小": ("xiao", "ㄒㄧㄠˇ")}
+
+def fake_lazy_pinyin(text, style=None):
+    # 模擬 pypinyin.lazy_pinyin：漢字轉拼音或注音，其他字元原樣保留
+    return [FAKE_PINYIN[ch][1 if style == "bopomofo" else 0] if ch in FAKE_PINYIN else ch for ch in text]
+
+def stubbed_pinyin():
+    from types import SimpleNamespace
+    return patch.multiple("src.tools.junyi_title_index", lazy_pinyin=fake_lazy_pinyin, Style=SimpleNamespace(BOPOMOFO="bopomofo"))
+
+def test_title_index_matches_pinyin_query():
+    with stubbed_pinyin():
+        index = TitleIndex([("fraction", "分數"), ("decimal", "小數")])
+        results = index.search("fen shu")
+    assert results[0]["topic_id"] == "fraction"
+    assert results[0]["match"] == "phonetic"
+
+def test_title_index_matches_zhuyin_query():
+    from src.tools.junyi_title_index import phonetic_keys
+    with stubbed_pinyin():
+        assert phonetic_keys("分數") == {"fenshu", "ㄈㄣㄕㄨ"}
+        index = TitleIndex([("fraction", "分數"), ("decimal", "小數")])
+        results = index.search("ㄈㄣ ㄕㄨˋ")
+    assert results[0]["topic_id"] == "fraction"
+    assert results[0]["match"] == "phonetic"
@@ -0,0 +1,68 @@
+import asyncio
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from src.tools.junyi_tree_expander import iter_junyi_tree_async, expand_junyi_tree
+
+FAKE_TREE = {
+    "root": {"topic_id": "root", "title": "全部", "children": [{"topic_id": "math", "title": "數學"}, {"topic_id": "sci", "title": "自然"}]},
+    "math": {"topic_id": "math", "title": "數學", "children": [{"topic_id": "fraction", "title": "分數"}, {"topic_id": "missing", "title": "壞掉"}]},
+    "sci": {"topic_id": "sci", "title": "自然", "children": []},
+    "fraction": {"topic_id": "fraction", "title": "分數", "children": [{"topic_id": "fraction_add", "title": "分數的加減"}]},
+}
+
+class FakeFetch:
+    def __init__(self):
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, topic_id, depth=1):
+        self.calls.append(topic_id)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return FAKE_TREE.get(topic_id, {"error": "not found"})
+
+def test_expand_tree_assembles_levels_and_reports_errors():
+    fetch = FakeFetch()
+    with patch("src.tools.junyi_tree_expander.get_junyi_tree_async", fetch):
+        result = expand_junyi_tree("root", max_depth=2, concurrency=4)
+    tree = result["tree"]
+    math = tree["children"][0]
+    assert math["children"][0]["children"] == [{"topic_id": "fraction_add", "title": "分數的加減"}]
+    assert "fraction_add" not in fetch.calls  # depth 2 的節點不再往下展開
+    assert result["meta"]["fetched"] == 4
+    assert result["meta"]["errors"] == [{"topic_id": "missing", "error": "not found"}]
+    assert not result["meta"]["truncated"]
+
+def test_expand_tree_runs_siblings_concurrently_with_limit():
+    fetch = FakeFetch()
+    with patch("src.tools.junyi_tree_expander.get_junyi_tree_async", fetch):
+        expand_junyi_tree("root", max_depth=3, concurrency=2)
+    assert fetch.max_in_flight == 2
+
+def test_expand_tree_stops_at_node_budget():
+    fetch = FakeFetch()
+    with patch("src.tools.junyi_tree_expander.get_junyi_tree_async", fetch):
+        result = expand_junyi_tree("root", max_depth=3, max_nodes=2)
+    assert result["meta"]["fetched"] == 2 and result["meta"]["truncated"]
+    assert len(fetch.calls) == 2
+
+def test_iter_tree_streams_breadth_first():
+    fetch = FakeFetch()
+    async def collect():
+        return [(item["topic_id"], item["depth"]) async for item in iter_junyi_tree_async("root", max_depth=3, concurrency=1)]
+    with patch("src.tools.junyi_tree_expander.get_junyi_tree_async", fetch):
+        order = asyncio.run(collect())
+    assert order == [("root", 0), ("math", 1), ("sci", 1), ("fraction", 2)]  # missing、fraction_add 查無資料不送出
+
+def test_expand_stream_endpoint():
+    from server import app
+    fetch = FakeFetch()
+    with patch("src.tools.junyi_tree_expander.get_junyi_tree_async", fetch):
+        with TestClient(app) as client:
+            resp = client.post("/junyi/tree/expand/stream", json={"topic_id": "root", "max_depth": 1})
+    events = [line for line in resp.text.split("\n\n") if line]
+    assert events[0].startswith("data: ") and '"type": "node"' in events[0]
+    assert '"type": "done"' in events[-1]
@@ -0,0 +1,32 @@
+from src.tools.junyi_tree_projection import project_tree, estimate_tokens
+
+TREE = {"topic_id": "root", "title": "全部", "description": "很長的描述" * 50, "icon_url": "https://example.com/x.png", "children": [
+    {"topic_id": "math", "title": "數學", "description": "數學說明" * 20, "children": [
+        {"topic_id": "fraction", "title": "分數", "children": []},
+    ]},
+    {"topic_id": "sci", "title": "自然", "children": []},
+]}
+
+def test_projection_keeps_only_id_title_and_child_count():
+    text, meta = project_tree(TREE)
+    assert text.splitlines() == [
+        "root | 全部 | 2",
+        "  math | 數學 | 1",
+        "    fraction | 分數",
+        "  sci | 自然",
+    ]
+    assert "描述" not in text and "icon_url" not in text
+    assert meta["projected_tokens"] < meta["raw_tokens"]
+    assert meta["nodes"] == 4 and not meta["truncated"]
+
+def test_projection_truncates_breadth_first():
+    budget = estimate_tokens("root | 全部 | 2") + estimate_tokens("  math | 數學 | 1") + estimate_tokens("  sci | 自然") + 3
+    text, meta = project_tree(TREE, max_tokens=budget)
+    lines = text.splitlines()
+    assert lines[:3] == ["root | 全部 | 2", "  math | 數學 | 1", "  sci | 自然"]
+    assert "fraction" not in text and "省略" in lines[-1]
+    assert meta["truncated"] and meta["kept_nodes"] == 3
+
+def test_projection_of_non_tree_payload():
+    text, meta = project_tree({"error": "x" * 100}, max_tokens=5)
+    assert len(text) == 20 and meta["truncated"]
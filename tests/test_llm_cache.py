@@ -0,0 +1,65 @@
+import pytest
+from unittest.mock import patch
+from src.utils.llm_cache import LLMResponseCache, make_cache_key, is_deterministic
+from src.orchestrator_utils.llm_client import call_llm
+
+class FakeResponse:
+    def __init__(self, content):
+        self.choices = [type("choice", (), {"message": type("msg", (), {"content": content})})]
+
+MESSAGES = [{"role": "user", "content": "查詢分數的主題內容"}]
+
+def test_cache_key_depends_on_model_messages_temperature():
+    key = make_cache_key("gpt-4.1-mini", MESSAGES, 0)
+    assert key == make_cache_key("gpt-4.1-mini", [dict(m) for m in MESSAGES], 0)
+    assert key != make_cache_key("gpt-4.1", MESSAGES, 0)
+    assert key != make_cache_key("gpt-4.1-mini", MESSAGES + [{"role": "user", "content": "x"}], 0)
+    assert key != make_cache_key("gpt-4.1-mini", MESSAGES, 0.7)
+
+def test_is_deterministic():
+    assert is_deterministic(0) is True
+    assert is_deterministic(0.7) is False
+    assert is_deterministic(None) is False
+
+def test_lru_eviction_and_stats():
+    cache = LLMResponseCache(max_entries=2, ttl=0, db_path="")
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # a 變成最近使用
+    cache.set("c", "3")           # 淘汰 b
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+    stats = cache.stats()
+    assert stats["memory_hits"] == 2 and stats["misses"] == 1 and stats["evictions"] == 1
+
+def test_ttl_expiry():
+    cache = LLMResponseCache(max_entries=10, ttl=10, db_path="")
+    with patch("src.utils.llm_cache.time.time", return_value=1000):
+        cache.set("a", "1")
+    with patch("src.utils.llm_cache.time.time", return_value=1005):
+        assert cache.get("a") == "1"
+    with patch("src.utils.llm_cache.time.time", return_value=1011):
+        assert cache.get("a") is None
+
+def test_disk_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "llm_cache.sqlite3")
+    LLMResponseCache(max_entries=10, ttl=0, db_path=db_path).set("a", "persisted")
+    restarted = LLMResponseCache(max_entries=10, ttl=0, db_path=db_path)
+    assert restarted.get("a") == "persisted"
+    assert restarted.stats()["disk_hits"] == 1
+    assert restarted.get("a") == "persisted"
+    assert restarted.stats()["memory_hits"] == 1
+
+def test_call_llm_deterministic_cached():
+    with patch("src.utils.llm_pool.get_openai_client") as mock_client:
+        mock_client.return_value.chat.completions.create.return_value = FakeResponse("cached reply")
+        assert call_llm("gpt-4.1-mini", MESSAGES, temperature=0) == "cached reply"
+        assert call_llm("gpt-4.1-mini", MESSAGES, temperature=0) == "cached reply"
+        assert mock_client.return_value.chat.completions.create.call_count == 1
+
+def test_call_llm_non_deterministic_bypasses_cache():
+    with patch("src.utils.llm_pool.get_openai_client") as mock_client:
+        mock_client.return_value.chat.completions.create.return_value = FakeResponse("chat reply")
+        call_llm("gpt-4.1-mini", MESSAGES, temperature=0.7)
+        call_llm("gpt-4.1-mini", MESSAGES, temperature=0.7)
+        assert mock_client.return_value.chat.completions.create.call_count == 2
@@ -53,6 +53,29 @@ def test_dispatch_agent_single_turn_llm_missing_tool_id(mock_llm, mock_tools):
     assert result["type"] == "error"
     assert "缺少必填欄位" in result["message"]
 
+def test_single_turn_only_runs_tools_shown_to_llm():
+    import asyncio
+    from unittest.mock import AsyncMock, MagicMock
+    from src.orchestrator import plan_single_turn_async
+    hidden = MagicMock(return_value={"result": "hidden"})
+    tools = fake_tool_list() + [{"id": "hidden_tool", "name": "Hidden", "description": "desc", "parameters": [{"name": "x", "type": "int"}], "function": hidden}]
+    filter_result = [
+        {"agent_id": "test_tool", "agent_name": "Test Tool", "extracted_params": {}, "available": True},
+        {"agent_id": "hidden_tool", "agent_name": "Hidden", "extracted_params": {}, "available": False},
+    ]
+    reply = '{"tool_id": "hidden_tool", "parameters": {"x": 1}}'
+    with patch("src.orchestrator.get_agent_list", return_value=tools), \
+         patch("src.orchestrator.filter_available_tools", return_value=filter_result), \
+         patch("src.orchestrator.filter_available_tools_async", new_callable=AsyncMock, return_value=filter_result), \
+         patch("src.orchestrator.call_llm", return_value=reply), \
+         patch("src.orchestrator.call_llm_async", new_callable=AsyncMock, return_value=reply):
+        result = dispatch_agent_single_turn("測試指令")
+        plan = asyncio.run(plan_single_turn_async("測試指令"))
+    # LLM 回了不在候選內（不可用）的工具：同步與 async 都視為找不到，不會執行
+    for r in (result, plan):
+        assert r["type"] == "error" and "找不到工具 hidden_tool" in r["message"]
+    hidden.assert_not_called()
+
 @patch("src.orchestrator.get_agent_list", return_value=[])
 @patch("src.orchestrator.call_llm", return_value='{"tool_id": "not_exist", "parameters": {}}')
 def test_dispatch_agent_single_turn_tool_not_found(mock_llm, mock_tools):
@@ -130,7 +153,8 @@ def test_is_redundant_empty_history():
 
 def test_log_call_decorator_print():
     with patch("builtins.print") as mock_print:
-        with patch("src.orchestrator.get_agents_metadata", return_value=[]), \
+        with patch("src.orchestrator.get_tool_catalogue", return_value="[]"), \
+             patch("src.orchestrator.filter_available_tools", return_value=[{"id": "test_tool", "available": True, "parameters": {}}]), \
              patch("src.orchestrator.build_single_turn_prompt", return_value=("", "")), \
              patch("src.orchestrator.call_llm", return_value="{}"), \
              patch("src.orchestrator.parse_llm_json_reply", side_effect=Exception("parse error")):
@@ -144,4 +168,113 @@ def test_dispatch_agent_multi_turn_step_finish(mock_parse, mock_llm, mock_tools)
     from src.orchestrator import dispatch_agent_multi_turn_step
     result = dispatch_agent_multi_turn_step([], "多輪測試", max_turns=2)
     assert result["action"] == "no_available_agent"
-    # no_available_agent 不檢查 reason/step 
\ No newline at end of file
+    # no_available_agent 不檢查 reason/step 
+import json
+import asyncio
+from unittest.mock import AsyncMock
+from src.orchestrator import dispatch_agent_single_turn_async, dispatch_agent_multi_turn_step_async, call_agent_async
+
+@patch("src.orchestrator.get_agent_list", side_effect=fake_tool_list)
+@patch("src.orchestrator.call_llm_async", new_callable=AsyncMock, return_value='{"tool_id": "test_tool", "parameters": {"x": 1}}')
+def test_dispatch_agent_single_turn_async(mock_llm, mock_tools):
+    result = asyncio.run(dispatch_agent_single_turn_async("測試指令"))
+    assert result["type"] == "result"
+    assert result["tool"] == "test_tool"
+    assert result["input"] == {"x": 1}
+    assert result["results"][0]["result"] == "ok"
+
+@patch("src.orchestrator.get_agent_list", side_effect=fake_tool_list)
+@patch("src.orchestrator.call_llm_async", new_callable=AsyncMock, side_effect=Exception("llm error"))
+def test_dispatch_agent_single_turn_async_call_llm_exception(mock_llm, mock_tools):
+    result = asyncio.run(dispatch_agent_single_turn_async("測試指令"))
+    assert result["type"] == "error" and "llm error" in result["message"]
+
+@patch("src.orchestrator.get_agent_list", side_effect=fake_tool_list)
+@patch("src.orchestrator.call_llm_async", new_callable=AsyncMock, return_value='{"tool_id": "test_tool", "parameters": {"x": 3}, "action": "call_tool", "reason": "step"}')
+def test_dispatch_agent_multi_turn_step_async(mock_llm, mock_tools):
+    history = [{"tool_id": "test_tool", "parameters": {"x": 1}, "result": {"result": "ok"}, "reason": ""}]
+    result = asyncio.run(dispatch_agent_multi_turn_step_async(history, "分步測試"))
+    assert result["action"] == "call_tool"
+    assert result["step"]["parameters"] == {"x": 3}
+
+def test_call_agent_async_prefers_async_function():
+    async def native(**kwargs):
+        return "native"
+    tool = {"id": "t", "function": lambda **kwargs: "sync", "async_function": native}
+    assert asyncio.run(call_agent_async(tool, {})) == "native"
+    # 沒有 async_function 時以 thread pool adapter 執行同步 function
+    assert asyncio.run(call_agent_async({"id": "t", "function": lambda **kwargs: "sync"}, {})) == "sync"
+
+PARALLEL_PLAN = '{"tool_calls": [{"tool_id": "test_tool", "parameters": {"x": 1}}, {"tool_id": "test_tool", "parameters": {"x": 2}}, {"tool_id": "missing", "parameters": {}}], "action": "call_tool", "reason": "兩個子主題"}'
+
+@patch("src.orchestrator.get_agent_list", side_effect=fake_tool_list)
+@patch("src.orchestrator.call_llm", return_value=PARALLEL_PLAN)
+def test_dispatch_agent_multi_turn_step_parallel_calls(mock_llm, mock_tools):
+    result = dispatch_agent_multi_turn_step([], "多輪測試")
+    step = result["step"]
+    assert result["action"] == "call_tool"
+    assert result["trace"]["parallel_calls"] == 3
+    assert step["tool_id"] == "parallel"
+    assert [p["parameters"] for p in step["parameters"]] == [{"x": 1}, {"x": 2}, {}]
+    assert step["result"][0]["input"] == {"x": 1}
+    assert step["result"][1]["input"] == {"x": 2}
+    assert "找不到工具" in step["result"][2]["error"]
+
+def test_parallel_calls_use_shared_pool_and_trace_dropped_calls():
+    import threading
+    threads = []
+    def tool_func(**kwargs):
+        threads.append(threading.current_thread().name)
+        return {"input": kwargs}
+    tools = [{"id": "test_tool", "name": "Test Tool", "description": "desc", "parameters": [], "function": tool_func}]
+    plan = json.dumps({"action": "call_tool", "tool_calls": [{"tool_id": "test_tool", "parameters": {"x": i}} for i in range(6)]})
+    with patch("src.orchestrator.get_agent_list", return_value=tools), \
+         patch("src.orchestrator.call_llm", return_value=plan), \
+         patch("src.orchestrator.call_llm_async", new_callable=AsyncMock, return_value=plan), \
+         patch("src.orchestrator.MULTI_TURN_MAX_PARALLEL_CALLS", 4):
+        result = dispatch_agent_multi_turn_step([], "多輪測試")
+        async_result = asyncio.run(dispatch_agent_multi_turn_step_async([], "多輪測試"))
+    assert all(name.startswith("agent-sync") for name in threads)  # 共用 thread pool，不再每步建立 executor
+    for r in (result, async_result):
+        assert r["trace"]["parallel_calls"] == 4
+        assert r["trace"]["dropped_calls"] == [{"tool_id": "test_tool", "parameters": {"x": 4}}, {"tool_id": "test_tool", "parameters": {"x": 5}}]
+
+def test_dispatch_agent_multi_turn_step_single_call_times_out():
+    import time
+    import threading
+    release = threading.Event()
+    def slow_tool(**kwargs):
+        release.wait(5)
+        return {"input": kwargs}
+    tools = [{"id": "slow", "name": "Slow", "description": "desc", "parameters": [], "function": slow_tool}]
+    with patch("src.orchestrator.get_agent_list", return_value=tools), \
+         patch("src.orchestrator.call_llm", return_value='{"tool_id": "slow", "parameters": {}, "action": "call_tool"}'), \
+         patch("src.orchestrator.MULTI_TURN_TOOL_TIMEOUT", 0.2):
+        start = time.monotonic()
+        result = dispatch_agent_multi_turn_step([], "多輪測試")
+        elapsed = time.monotonic() - start
+    release.set()
+    assert elapsed < 1.0
+    assert result["action"] == "error" and "逾時" in result["message"]
+
+def test_dispatch_agent_multi_turn_step_async_parallel_calls_run_concurrently():
+    async def slow_tool(**kwargs):
+        await asyncio.sleep(0.2)
+        return {"input": kwargs}
+    async def hanging_tool(**kwargs):
+        await asyncio.sleep(5)
+    tools = [
+        {"id": "test_tool", "name": "Test Tool", "description": "desc", "parameters": [], "function": fake_tool_func, "async_function": slow_tool},
+        {"id": "hang", "name": "Hang", "description": "desc", "parameters": [], "function": fake_tool_func, "async_function": hanging_tool},
+    ]
+    plan = '{"tool_calls": [{"tool_id": "test_tool", "parameters": {"x": 1}}, {"tool_id": "test_tool", "parameters": {"x": 2}}, {"tool_id": "hang", "parameters": {}}], "action": "call_tool"}'
+    import time
+    with patch("src.orchestrator.get_agent_list", return_value=tools), \
+         patch("src.orchestrator.call_llm_async", new_callable=AsyncMock, return_value=plan), \
+         patch("src.orchestrator.MULTI_TURN_TOOL_TIMEOUT", 0.5):
+        start = time.monotonic()
+        result = asyncio.run(dispatch_agent_multi_turn_step_async([], "多輪測試"))
+        elapsed = time.monotonic() - start
+    assert elapsed < 1.0  # 兩個 0.2 秒的查詢並行，掛住的查詢在 0.5 秒逾時
+    assert [r.get("input") for r in result["step"]["result"][:2]] == [{"x": 1}, {"x": 2}]
+    assert "逾時" in result["step"]["result"][2]["error"]
@@ -4,7 +4,8 @@ from src.orchestrator_utils.llm_client import call_llm
 from src.orchestrator_utils.validator import parse_llm_json_reply
 
 def test_call_llm_exception():
-    with patch("openai.chat.completions.create", side_effect=Exception("fail")):
+    with patch("src.utils.llm_pool.get_openai_client") as mock_client:
+        mock_client.return_value.chat.completions.create.side_effect = Exception("fail")
         with pytest.raises(Exception) as e:
             call_llm("gpt-4.1-mini", messages=[{"role": "system", "content": "hi"}])
         assert "OpenAI API 錯誤" in str(e.value)
@@ -30,6 +31,100 @@ def test_call_llm_success():
     class FakeResponse:
         def __init__(self, content):
             self.choices = [FakeChoice(content)]
-    with patch("openai.chat.completions.create", return_value=FakeResponse("hi!")):
+    with patch("src.utils.llm_pool.get_openai_client") as mock_client:
+        mock_client.return_value.chat.completions.create.return_value = FakeResponse("hi!")
         result = call_llm("gpt-4.1-mini", messages=[{"role": "system", "content": "hi"}])
-        assert result == "hi!" 
\ No newline at end of file
+        assert result == "hi!" 
+
+def test_shared_openai_client_reused():
+    from src.utils.llm_pool import get_openai_client
+    with patch("openai.OpenAI") as mock_openai:
+        first = get_openai_client()
+        second = get_openai_client()
+    assert first is second
+    assert mock_openai.call_count == 1
+    assert "http_client" in mock_openai.call_args.kwargs
+
+def test_call_llm_async_success():
+    import asyncio
+    from unittest.mock import AsyncMock
+    from src.orchestrator_utils.llm_client import call_llm_async
+    fake_response = type("resp", (), {"choices": [type("choice", (), {"message": type("msg", (), {"content": "async hi"})})]})
+    with patch("src.utils.llm_pool.get_async_openai_client") as mock_client:
+        mock_client.return_value.chat.completions.create = AsyncMock(return_value=fake_response)
+        result = asyncio.run(call_llm_async("gpt-4.1-mini", messages=[{"role": "user", "content": "hi"}]))
+    assert result == "async hi"
+
+def test_multi_turn_prompt_keeps_static_prefix():
+    from src.orchestrator_utils.prompt_builder import build_multi_turn_step_prompt
+    brief = [{"id": "t", "name": "T", "description": "d", "parameters": []}]
+    system_a, user_a = build_multi_turn_step_prompt(brief, [], "查分數")
+    system_b, user_b = build_multi_turn_step_prompt(brief, [{"tool_id": "t", "parameters": {}}], "查小數")
+    assert system_a == system_b
+    assert "查分數" in user_a and "查小數" in user_b and '"tool_id": "t"' in user_b
+
+def test_single_turn_prompt_prefix_independent_of_candidates():
+    import asyncio
+    import json
+    from unittest.mock import AsyncMock
+    from src.agent_registry import get_agent_list
+    from src.orchestrator import dispatch_agent_single_turn, plan_single_turn_async
+    agents = get_agent_list()[:3]
+    seen = []
+    def fake_llm(model, messages, temperature=0):
+        seen.append(messages)
+        return "{}"
+    def filter_result(available_ids):
+        return [{"agent_id": a["id"], "agent_name": a["name"], "extracted_params": {}, "available": a["id"] in available_ids} for a in agents]
+    with patch("src.orchestrator.shortlist_agents", return_value=agents), \
+         patch("src.orchestrator.call_llm", side_effect=fake_llm), \
+         patch("src.orchestrator.call_llm_async", new_callable=AsyncMock, side_effect=fake_llm), \
+         patch("src.orchestrator.filter_available_tools", return_value=filter_result({agents[0]["id"], agents[1]["id"]})), \
+         patch("src.orchestrator.filter_available_tools_async", new_callable=AsyncMock, return_value=filter_result({agents[1]["id"], agents[2]["id"]})), \
+         patch("src.orchestrator.decide_dispatch", side_effect=lambda q, fr, al: {"stage": "llm", "tool": None, "parameters": None, "candidates": [e["agent_id"] for e in fr if e["available"]], "reason": ""}):
+        dispatch_agent_single_turn("查分數")
+        asyncio.run(plan_single_turn_async("查小數"))
+    (system_a, user_a), (system_b, user_b) = [(m[0]["content"], m[1]["content"]) for m in seen]
+    assert system_a == system_b  # 候選工具不同，前綴仍相同
+    assert json.dumps([agents[0]["id"], agents[1]["id"]]) in user_a
+    assert json.dumps([agents[1]["id"], agents[2]["id"]]) in user_b
+
+def test_tool_catalogue_serialised_once_per_registry_version():
+    from src.agent_registry import get_agent_list, get_agent_registry
+    from src.orchestrator_utils.agent_metadata import get_tool_catalogue, _CATALOGUE_CACHE
+    _CATALOGUE_CACHE.clear()
+    agents = get_agent_list()[:2]
+    with patch("src.orchestrator_utils.agent_metadata.serialize_tool_brief", wraps=lambda brief: str(brief)) as mock_serialize:
+        first = get_tool_catalogue(agents)
+        second = get_tool_catalogue(list(agents))
+        assert first is second
+        registry = get_agent_registry()
+        version = registry.version
+        try:
+            registry.version = "changed"
+            get_tool_catalogue(agents)
+        finally:
+            registry.version = version
+    assert mock_serialize.call_count == 2  # 第一次 + 版本變更後重建
+
+def test_prompt_cache_usage_recorded():
+    from src.utils.llm_pool import get_prompt_cache_stats, reset_prompt_cache_stats
+    reset_prompt_cache_stats()
+    with patch("src.utils.llm_pool.get_openai_client") as mock_client:
+        response = mock_client.return_value.chat.completions.create.return_value
+        response.choices[0].message.content = "ok"
+        response.usage.prompt_tokens = 2000
+        response.usage.prompt_tokens_details.cached_tokens = 1536
+        call_llm("gpt-4.1-mini", messages=[{"role": "user", "content": "usage"}])
+    stats = get_prompt_cache_stats()
+    assert stats["prompt_tokens"] == 2000 and stats["cached_tokens"] == 1536 and stats["hit_rate"] == 0.768
+
+def test_run_sync_with_llm_closes_per_loop_client(monkeypatch):
+    from src.utils import llm_pool
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    async def use_client():
+        return llm_pool.get_async_openai_client()
+    clients = [llm_pool.run_sync_with_llm(use_client()) for _ in range(3)]
+    assert len({id(c) for c in clients}) == 3  # 每次 run_sync 都是新的 event loop
+    assert all(c.is_closed() for c in clients)
+    assert len(llm_pool._async_clients) == 0
@@ -27,4 +27,87 @@ def test_get_required_params():
         {"name": "d", "type": "str", "required": False},
     ]
     required = get_required_params(params)
-    assert set(required) == {"a", "c"}  # a: required, c: 沒 default 也沒 required, b/d 都不是必填 
\ No newline at end of file
+    assert set(required) == {"a", "c"}  # a: required, c: 沒 default 也沒 required, b/d 都不是必填 
+
+from unittest.mock import patch
+from src.parameter_extraction import extract_parameters_batch, chunk_agents_by_schema_size, filter_available_tools
+
+BATCH_AGENTS = [
+    {"id": "topic_agent", "name": "主題查詢", "parameters": [{"name": "topic_id", "type": "str", "required": True}]},
+    {"id": "add_agent", "name": "加法", "parameters": [{"name": "a", "type": "int"}, {"name": "b", "type": "int"}]},
+    {"id": "dummy", "name": "無參數工具", "parameters": []},
+]
+
+@patch("src.parameter_extraction.openai_query_llm", return_value='{"topic_agent": {"topic_id": "root"}, "add_agent": null}')
+def test_filter_available_tools_batch_single_call(mock_llm):
+    result = filter_available_tools("查詢 topic_id 為 root 的主題", BATCH_AGENTS, mode="batch")
+    assert mock_llm.call_count == 1
+    assert [r["agent_id"] for r in result] == ["topic_agent", "add_agent", "dummy"]
+    assert result[0] == {"agent_id": "topic_agent", "agent_name": "主題查詢", "extracted_params": {"topic_id": "root"}, "available": True}
+    assert result[1]["available"] is False and result[1]["extracted_params"] is None
+    assert result[2]["available"] is True and result[2]["extracted_params"] == {}
+
+@patch("src.parameter_extraction.openai_query_llm", return_value='{"topic_agent": {"topic_id": ""}, "add_agent": {"a": 3}}')
+def test_extract_parameters_batch_missing_required(mock_llm):
+    result = extract_parameters_batch("加 3", BATCH_AGENTS[:2])
+    assert result == {"topic_agent": None, "add_agent": None}
+
+@patch("src.parameter_extraction.openai_query_llm", return_value="not a json")
+def test_extract_parameters_batch_invalid_json(mock_llm):
+    result = extract_parameters_batch("查詢", BATCH_AGENTS[:2])
+    assert result == {"topic_agent": None, "add_agent": None}
+
+def test_chunk_agents_by_schema_size():
+    agents = BATCH_AGENTS[:2]
+    assert len(chunk_agents_by_schema_size(agents, max_chars=10000)) == 1
+    chunks = chunk_agents_by_schema_size(agents, max_chars=1)
+    assert [[a["id"] for a in c] for c in chunks] == [["topic_agent"], ["add_agent"]]
+
+@patch("src.parameter_extraction.openai_query_llm")
+def test_extract_parameters_batch_chunked(mock_llm):
+    mock_llm.side_effect = ['{"topic_agent": {"topic_id": "root"}}', '{"add_agent": {"a": 3, "b": 5}}']
+    result = extract_parameters_batch("加 3 跟 5，查 root", BATCH_AGENTS[:2], max_schema_chars=1)
+    assert mock_llm.call_count == 2
+    assert result == {"topic_agent": {"topic_id": "root"}, "add_agent": {"a": 3, "b": 5}}
+
+import asyncio
+from src.parameter_extraction import filter_available_tools_async
+
+async def fake_slow_llm(instructions, input, **kwargs):
+    if "slow" in instructions:
+        await asyncio.sleep(0.5)
+        return '{"slow": "v"}'
+    return '{"fast": "v"}'
+
+@patch("src.parameter_extraction.openai_query_llm_async", side_effect=fake_slow_llm)
+def test_filter_available_tools_concurrent_order_and_timeout(mock_llm):
+    agents = [
+        {"id": "slow_agent", "name": "慢", "parameters": [{"name": "slow", "type": "str"}]},
+        {"id": "dummy", "name": "無參數工具", "parameters": []},
+        {"id": "fast_agent", "name": "快", "parameters": [{"name": "fast", "type": "str"}]},
+    ]
+    result = asyncio.run(filter_available_tools_async("q", agents, max_concurrency=2, timeout=0.1))
+    assert [r["agent_id"] for r in result] == ["slow_agent", "dummy", "fast_agent"]
+    assert result[0]["available"] is False and "逾時" in result[0]["error"]
+    assert result[1]["available"] is True
+    assert result[2]["available"] is True and result[2]["extracted_params"] == {"fast": "v"}
+
+@patch("src.parameter_extraction.openai_query_llm_async", side_effect=fake_slow_llm)
+def test_filter_available_tools_concurrent_mode_sync(mock_llm):
+    agents = [{"id": "fast_agent", "name": "快", "parameters": [{"name": "fast", "type": "str"}]}]
+    result = filter_available_tools("q", agents, mode="concurrent")
+    assert result[0]["available"] is True
+
+def test_filter_available_tools_concurrent_sync_closes_llm_client(monkeypatch):
+    from src.utils import llm_pool
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    clients = []
+    async def fake_llm(instructions, input, **kwargs):
+        clients.append(llm_pool.get_async_openai_client())
+        return '{"fast": "v"}'
+    agents = [{"id": "fast_agent", "name": "快", "parameters": [{"name": "fast", "type": "str"}]}]
+    with patch("src.parameter_extraction.openai_query_llm_async", side_effect=fake_llm):
+        filter_available_tools("q", agents, mode="concurrent")
+        filter_available_tools("q", agents, mode="concurrent")
+    assert len(clients) == 2 and all(c.is_closed() for c in clients)
+    assert len(llm_pool._async_clients) == 0
@@ -0,0 +1,110 @@
+import json
+import time
+import asyncio
+from unittest.mock import patch, AsyncMock
+from src.utils.session_store import SessionStore, SQLiteSessionBackend, get_session_store
+from src.orchestrator import dispatch_session_step_async
+
+STEP_A = {"tool_id": "get_junyi_topic", "parameters": {"topic_id": "math"}, "result": {"title": "數學"}}
+STEP_B = {"tool_id": "get_junyi_tree", "parameters": {"topic_id": "math"}, "result": {"children": ["代數"]}}
+
+def test_history_json_is_built_incrementally():
+    store = SessionStore()
+    session = store.create()
+    store.append(session.id, STEP_A)
+    store.append(session.id, STEP_B)
+    assert session.history_json == json.dumps([STEP_A, STEP_B], ensure_ascii=False)
+    assert store.get(session.id).steps == [STEP_A, STEP_B]
+
+def test_ttl_expiry_and_lru_cap():
+    store = SessionStore(ttl=0.05)
+    session = store.create(steps=[STEP_A])
+    time.sleep(0.1)
+    assert store.get(session.id) is None
+    assert store.stats()["expired"] == 1
+
+    store = SessionStore(max_entries=2)
+    first, second = store.create("s1"), store.create("s2")
+    store.get("s1")  # s1 變成最近使用
+    store.create("s3")
+    assert store.get("s2") is None
+    assert store.get("s1") is not None and store.stats()["evictions"] == 1
+
+def test_byte_cap_evicts_oldest_sessions():
+    size = len(json.dumps(STEP_A, ensure_ascii=False))
+    store = SessionStore(max_bytes=size * 2)
+    for sid in ["s1", "s2", "s3"]:
+        store.create(sid, steps=[STEP_A])
+    assert store.get("s1") is None
+    assert store.stats()["bytes"] <= size * 2
+
+def test_sqlite_backend_restores_evicted_session(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.sqlite3"))
+    store = SessionStore(max_entries=1, backend=backend)
+    store.create("s1", steps=[STEP_A, STEP_B])
+    store.create("s2")
+    restored = store.get("s1")
+    assert restored.steps == [STEP_A, STEP_B]
+    assert restored.history_json == json.dumps([STEP_A, STEP_B], ensure_ascii=False)
+    assert store.stats()["backend_loads"] == 1
+    store.delete("s1")
+    assert SessionStore(backend=backend).get("s1") is None
+
+def test_session_step_sends_only_delta_and_appends_new_step():
+    new_step = {**STEP_B, "parameters": {"topic_id": "algebra"}}
+    mock_dispatch = AsyncMock(return_value={"action": "call_tool", "step": new_step, "trace": {}})
+    with patch("src.orchestrator.dispatch_agent_multi_turn_step_async", mock_dispatch):
+        first = asyncio.run(dispatch_session_step_async(None, "數學有什麼", new_step=STEP_A))
+        second = asyncio.run(dispatch_session_step_async(first["session_id"], "還有呢"))
+    session = get_session_store().get(first["session_id"])
+    assert session.steps == [STEP_A, new_step, new_step]
+    assert second["history_length"] == 3
+    # 第二輪的歷程來自 server 端 session，且帶入已序列化好的 history_json
+    args, kwargs = mock_dispatch.call_args
+    assert args[1] == "還有呢"
+    assert kwargs["history_json"] == json.dumps([STEP_A, new_step], ensure_ascii=False)
+
+def test_session_step_without_history_asks_for_first_query():
+    result = asyncio.run(dispatch_session_step_async(None, "數學"))
+    assert result["message"] == "請先查詢一次，再進行多輪推理。"
+    assert get_session_store().get(result["session_id"]).steps == []
+
+def test_sqlite_backend_session_expires_after_ttl(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    store = SessionStore(ttl=0.2, backend=SQLiteSessionBackend(path))
+    store.create("s1", steps=[STEP_A, STEP_B])
+    store.create("s2", steps=[STEP_A])
+    # 重新啟動：新的 store 從持久層讀回，仍保留原本的最後使用時間
+    restarted = SessionStore(ttl=0.2, backend=SQLiteSessionBackend(path))
+    assert restarted.get("s1").steps == [STEP_A, STEP_B]
+    time.sleep(0.3)
+    restarted = SessionStore(ttl=0.2, backend=SQLiteSessionBackend(path))
+    assert restarted.get("s1") is None
+    # 過期的 session 已從持久層刪除（包括沒被讀取的 s2）
+    assert SQLiteSessionBackend(path).load("s2") is None
+    session = restarted.get_or_create("s1")
+    restarted.append(session.id, {"tool_id": "new", "parameters": {}})
+    assert SQLiteSessionBackend(path).load("s1").steps == [{"tool_id": "new", "parameters": {}}]
+
+def test_memory_expiry_deletes_backend_rows(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.sqlite3"))
+    store = SessionStore(ttl=0.1, backend=backend)
+    store.create("s1", steps=[STEP_A])
+    time.sleep(0.2)
+    assert store.get("s1") is None
+    assert backend.load("s1") is None
+
+def test_backend_purge_is_rate_limited(tmp_path):
+    from unittest.mock import patch
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.sqlite3"))
+    with patch.object(backend, "purge_expired", wraps=backend.purge_expired) as mock_purge:
+        store = SessionStore(ttl=0.1, backend=backend, purge_interval=60)
+        assert mock_purge.call_count == 1  # 建立時清一次
+        store.create("s1", steps=[STEP_A])
+        store.clear()
+        time.sleep(0.2)
+        for _ in range(5):
+            assert store.get("s1") is None  # 尚未清除，讀回時仍依 TTL 判定過期
+            assert store.get("missing") is None
+    assert mock_purge.call_count == 1
+    assert backend.load("s1") is None
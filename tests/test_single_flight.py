@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+from src.utils.single_flight import SingleFlight
+import src.tools.junyi_topic_tool
+
+def test_single_flight_collapses_concurrent_sync_calls():
+    flight = SingleFlight("test_sync")
+    calls = []
+    def slow_fetch(x):
+        calls.append(x)
+        time.sleep(0.2)
+        return {"value": x}
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow_fetch, 1))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == [1]
+    assert results == [{"value": 1}] * 5
+    stats = flight.stats()
+    assert stats["executed"] == 1 and stats["collapsed"] == 4 and stats["in_flight"] == 0
+
+def test_single_flight_shares_exception():
+    flight = SingleFlight("test_error")
+    def boom():
+        time.sleep(0.1)
+        raise ValueError("boom")
+    errors = []
+    def worker():
+        try:
+            flight.do("k", boom)
+        except ValueError as e:
+            errors.append(str(e))
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == ["boom"] * 3
+
+def test_single_flight_sequential_calls_not_collapsed():
+    flight = SingleFlight("test_seq")
+    flight.do("k", lambda: 1)
+    flight.do("k", lambda: 2)
+    assert flight.stats()["executed"] == 2
+
+def test_single_flight_async_collapses():
+    flight = SingleFlight("test_async")
+    calls = []
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+    async def main():
+        return await asyncio.gather(*[flight.do_async("k", fetch) for _ in range(10)])
+    assert asyncio.run(main()) == ["ok"] * 10
+    assert len(calls) == 1
+    assert flight.stats()["collapsed"] == 9
+
+def test_single_flight_async_leader_timeout_does_not_cancel_followers():
+    flight = SingleFlight("test_async_cancel")
+    calls = []
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.3)
+        return "ok"
+    async def main():
+        leader = asyncio.ensure_future(asyncio.wait_for(flight.do_async("k", fetch), timeout=0.1))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(asyncio.wait_for(flight.do_async("k", fetch), timeout=5))
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+    leader_result, follower_result = asyncio.run(main())
+    assert isinstance(leader_result, asyncio.TimeoutError)
+    assert follower_result == "ok"
+    assert len(calls) == 1
+
+def test_single_flight_async_cancels_task_when_all_waiters_leave():
+    flight = SingleFlight("test_async_abandon")
+    cancelled = []
+    async def fetch():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+    async def main():
+        results = await asyncio.gather(*[asyncio.wait_for(flight.do_async("k", fetch), timeout=0.05) for _ in range(2)], return_exceptions=True)
+        await asyncio.sleep(0)
+        return results
+    results = asyncio.run(main())
+    assert all(isinstance(r, asyncio.TimeoutError) for r in results)
+    assert cancelled == [1]
+    assert flight.stats()["in_flight"] == 0
+
+def test_get_junyi_topic_concurrent_requests_collapsed():
+    class FakeResp:
+        status_code = 200
+        headers = {}
+        def raise_for_status(self): pass
+        def json(self): return {"topic": "root"}
+    def slow_get(url, headers=None, timeout=None):
+        time.sleep(0.2)
+        return FakeResp()
+    with patch("requests.Session.get", side_effect=slow_get) as mock_get:
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(src.tools.junyi_topic_tool.get_junyi_topic("root"))) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    assert mock_get.call_count == 1
+    assert results == [{"topic": "root"}] * 5
@@ -0,0 +1,126 @@
+import json
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from src.orchestrator_utils.stream_json import JsonStringFieldStreamer
+from server import app
+
+client = TestClient(app)
+
+def feed_all(streamer, chunks):
+    return [streamer.feed(c) for c in chunks]
+
+def test_json_field_streamer_answer_before_reason():
+    streamer = JsonStringFieldStreamer("answer")
+    chunks = ['{"ans', 'wer": "你', '叫 Ja', 'mes", "rea', 'son": "history 有"}']
+    deltas = feed_all(streamer, chunks)
+    assert "".join(deltas) == "你叫 James"
+    assert deltas[1] == "你"  # reason 還沒出現就已經吐出 answer
+    assert streamer.done
+    assert streamer.result() == {"answer": "你叫 James", "reason": "history 有"}
+
+def test_json_field_streamer_split_escapes():
+    streamer = JsonStringFieldStreamer("answer")
+    deltas = feed_all(streamer, ['{"answer": "a\\', 'nb \\"q\\" \\u4f', '60\\ud83d\\ude00"}'])
+    assert "".join(deltas) == 'a\nb "q" 你😀'
+
+def test_json_field_streamer_not_json():
+    streamer = JsonStringFieldStreamer("answer")
+    assert streamer.feed("plain text") == ""
+    assert streamer.result() is None
+
+def parse_sse(text):
+    return [json.loads(line[len("data: "):]) for line in text.split("\n") if line.startswith("data: ")]
+
+def fake_stream(chunks):
+    async def gen(*args, **kwargs):
+        for c in chunks:
+            yield c
+    return gen
+
+def test_chat_stream_endpoint():
+    with patch("server.call_llm_stream_async", side_effect=fake_stream(["Hi", " James"])):
+        resp = client.post("/chat/stream", json={"history": [{"role": "user", "content": "i am James"}]})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(resp.text)
+    assert [e["content"] for e in events if e["type"] == "token"] == ["Hi", " James"]
+    assert events[-1] == {"type": "done", "reply": "Hi James"}
+
+def test_history_answer_stream_endpoint():
+    chunks = ['{"answer": "Ja', 'mes", "reason": "第一句"}']
+    with patch("server.call_llm_stream_async", side_effect=fake_stream(chunks)):
+        resp = client.post("/history_answer/stream", json={"history": [{"role": "user", "content": "what is my name"}]})
+    events = parse_sse(resp.text)
+    assert "".join(e["content"] for e in events if e["type"] == "answer") == "James"
+    assert events[-1] == {"type": "done", "answer": "James", "reason": "第一句"}
+
+STEP_MATH = {"tool_id": "get_junyi_topic", "parameters": {"topic_id": "math"}, "result": {"title": "數學"}}
+STEP_ALG = {"tool_id": "get_junyi_tree", "parameters": {"topic_id": "algebra"}, "result": {"title": "代數"}}
+
+def test_multi_turn_stream_runs_loop_on_server():
+    replies = [
+        {"action": "call_tool", "step": STEP_ALG, "trace": {}},
+        {"action": "finish", "reason": "查詢內容重複，已自動結束。", "step": STEP_ALG, "trace": {}},
+    ]
+    with patch("src.orchestrator.dispatch_agent_multi_turn_step_async", side_effect=replies) as mock_step:
+        res = client.post("/agent/multi_turn/stream", json={"query": "數學有哪些單元", "step": STEP_MATH})
+    events = parse_sse(res.text)
+    assert [e["type"] for e in events] == ["step", "finish"]
+    assert events[0]["step"] == STEP_ALG
+    assert events[1]["reason"] == "查詢內容重複，已自動結束。"
+    assert mock_step.call_count == 2
+    # 第二輪的提問由 server 依上一步結果組成
+    assert mock_step.call_args_list[1].args[1].startswith("剛剛查到：")
+
+def test_multi_turn_stream_stops_at_max_turns():
+    reply = {"action": "call_tool", "step": STEP_ALG, "trace": {}}
+    with patch("src.orchestrator.dispatch_agent_multi_turn_step_async", return_value=reply) as mock_step:
+        res = client.post("/agent/multi_turn/stream", json={"query": "數學", "step": STEP_MATH, "max_turns": 2})
+    events = parse_sse(res.text)
+    assert [e["type"] for e in events] == ["step", "step", "finish"]
+    assert mock_step.call_count == 2
+
+def test_multi_turn_loop_cancellation_stops_further_steps():
+    import asyncio
+    from src.orchestrator import iter_multi_turn_async
+    reply = {"action": "call_tool", "step": STEP_ALG, "trace": {}}
+    async def consume_first():
+        loop = iter_multi_turn_async("數學", initial_step=STEP_MATH)
+        first = await loop.__anext__()
+        await loop.aclose()  # 前端斷線時 server 停止迭代
+        return first
+    with patch("src.orchestrator.dispatch_agent_multi_turn_step_async", return_value=reply) as mock_step:
+        first = asyncio.run(consume_first())
+    assert first["type"] == "step"
+    assert mock_step.call_count == 1
+
+def test_multi_turn_stream_rejects_max_turns_over_limit():
+    from src.orchestrator import MULTI_TURN_MAX_TURNS
+    res = client.post("/agent/multi_turn/stream", json={"query": "數學", "step": STEP_MATH, "max_turns": MULTI_TURN_MAX_TURNS + 1})
+    assert res.status_code == 422
+
+def test_multi_turn_loop_checks_stop_before_each_step_and_drops_session():
+    import asyncio
+    from src.orchestrator import iter_multi_turn_async
+    from src.utils.session_store import get_session_store
+    reply = {"action": "call_tool", "step": STEP_ALG, "trace": {}}
+    checks = []
+    async def should_stop():
+        checks.append(True)
+        return len(checks) > 1  # 第一步完成後前端斷線
+    async def consume():
+        return [e async for e in iter_multi_turn_async("數學", initial_step=STEP_MATH, should_stop=should_stop)]
+    with patch("src.orchestrator.dispatch_agent_multi_turn_step_async", return_value=reply) as mock_step:
+        events = asyncio.run(consume())
+    assert [e["type"] for e in events] == ["step"]
+    assert mock_step.call_count == 1  # 第二步開始前就停止，不再呼叫 LLM
+    assert get_session_store().get(events[0]["session_id"]) is None
+
+def test_multi_turn_stream_keeps_only_client_sessions():
+    from src.utils.session_store import get_session_store
+    reply = {"action": "finish", "reason": "完成", "step": None, "trace": {}}
+    with patch("src.orchestrator.dispatch_agent_multi_turn_step_async", return_value=reply):
+        created = parse_sse(client.post("/agent/multi_turn/stream", json={"query": "數學", "step": STEP_MATH}).text)
+        owned = parse_sse(client.post("/agent/multi_turn/stream", json={"query": "數學", "step": STEP_MATH, "session_id": "mine"}).text)
+    assert get_session_store().get(created[-1]["session_id"]) is None
+    assert get_session_store().get(owned[-1]["session_id"]).steps == [STEP_MATH]
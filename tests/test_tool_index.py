@@ -0,0 +1,45 @@
+from unittest.mock import patch
+from src.agent_registry import get_agent_list
+from src.orchestrator import dispatch_agent_single_turn
+from src.orchestrator_utils.tool_index import ToolIndex, tokenize, evaluate_recall, get_tool_index, shortlist_agents
+
+# 人工標註的查詢集（不同於 example_queries 的說法）
+LABELLED_QUERIES = [
+    {"query": "我想看均一數學的分數教材", "agent_id": "get_junyi_topic"},
+    {"query": "列出均一的課程樹狀結構", "agent_id": "get_junyi_tree"},
+    {"query": "用標題找均一主題：分數", "agent_id": "get_junyi_topic_by_title"},
+    {"query": "一次查好幾個均一主題", "agent_id": "get_junyi_topics_batch"},
+    {"query": "有沒有影片剪輯相關的摘要", "agent_id": "agent_a_tool"},
+    {"query": "B 網站的資安新聞", "agent_id": "agent_b_tool"},
+]
+
+def test_tokenize_mixes_words_and_cjk_bigrams():
+    assert tokenize("查 Topic_ID 分數") == ["topic_id", "查", "分", "數", "分數"]
+
+def test_registry_recall_at_3():
+    index = ToolIndex(get_agent_list())
+    metrics = evaluate_recall(index, LABELLED_QUERIES, k=3)
+    assert metrics["recall"] == 1.0, metrics["misses"]
+
+def test_shortlist_keeps_registry_order_and_falls_back_to_all():
+    agents = [
+        {"id": "video", "description": "影片剪輯摘要"},
+        {"id": "security", "description": "資安新聞"},
+        {"id": "math", "description": "數學分數教材"},
+    ]
+    assert [a["id"] for a in ToolIndex(agents).shortlist("分數和影片", k=2)] == ["video", "math"]
+    assert len(ToolIndex(agents).shortlist("完全無關的字", k=1)) == 3
+    assert len(ToolIndex(agents).shortlist("分數", k=0)) == 3
+
+def test_index_built_once_per_agent_set():
+    agents = get_agent_list()
+    assert get_tool_index(agents) is get_tool_index(get_agent_list())
+
+def test_dispatch_extracts_only_for_shortlisted_agents():
+    agents = [{"id": f"tool_{i}", "name": f"tool_{i}", "description": d, "parameters": [{"name": "q", "type": "str"}], "function": lambda q: q}
+              for i, d in enumerate(["影片剪輯摘要", "資安新聞", "數學分數教材", "天氣預報"])]
+    with patch("src.orchestrator.get_agent_list", return_value=agents), \
+         patch("src.orchestrator.filter_available_tools", return_value=[]) as mock_filter, \
+         patch("src.orchestrator_utils.tool_index.TOOL_SHORTLIST_K", 2):
+        dispatch_agent_single_turn("查數學分數")
+    assert [a["id"] for a in mock_filter.call_args.args[1]] == ["tool_0", "tool_2"]
@@ -0,0 +1,58 @@
+import asyncio
+from unittest.mock import patch, AsyncMock, MagicMock
+from src.utils.tool_memo import ToolMemo, canonical_params
+from src.orchestrator import dispatch_agent_multi_turn_step_async, dispatch_session_step_async, is_redundant
+
+TOPIC_STEP = {"tool_id": "get_junyi_topic", "parameters": {"topic_id": "math"}, "result": {"title": "數學"}}
+TREE_STEP = {"tool_id": "get_junyi_tree", "parameters": {"topic_id": "root"}, "result": {"children": []}}
+
+def test_canonical_params_ignores_order_and_whitespace():
+    assert canonical_params({"a": 1, "b": " x "}) == canonical_params({"b": "x", "a": 1})
+
+def test_memo_covers_whole_session_and_parallel_steps():
+    parallel = {
+        "tool_id": "parallel",
+        "parameters": [{"tool_id": "get_junyi_topic", "parameters": {"topic_id": "a"}}, {"tool_id": "get_junyi_topic", "parameters": {"topic_id": "b"}}],
+        "result": [{"title": "A"}, {"error": "timeout"}]
+    }
+    memo = ToolMemo([TOPIC_STEP, TREE_STEP, parallel])
+    assert memo.lookup("get_junyi_topic", {"topic_id": "math"}) == (True, {"title": "數學"})
+    assert memo.lookup("get_junyi_topic", {"topic_id": "a"}) == (True, {"title": "A"})
+    # 失敗的結果不記，可以重試
+    assert memo.lookup("get_junyi_topic", {"topic_id": "b"}) == (False, None)
+    # 同一個參數換了工具不算查過
+    assert not memo.seen("get_junyi_tree", {"topic_id": "math"})
+
+def test_is_redundant_checks_every_earlier_step():
+    history = [TOPIC_STEP, TREE_STEP]
+    assert is_redundant(history, {"tool_id": "get_junyi_topic", "parameters": {"topic_id": "math"}})
+    assert not is_redundant(history, {"tool_id": "get_junyi_topic", "parameters": {"topic_id": "sci"}})
+    # 舊格式沒有 tool_id 的歷程只比對參數
+    assert is_redundant([{"parameters": {"x": 1}}], {"tool_id": "test_tool", "parameters": {"x": 1}})
+
+def test_repeat_call_served_from_memo_without_calling_tool():
+    tool_fn = AsyncMock(return_value={"title": "新查詢"})
+    tools = [{"id": "get_junyi_topic", "name": "均一主題", "description": "", "parameters": [], "function": MagicMock(), "async_function": tool_fn}]
+    plan = '{"tool_id": "get_junyi_topic", "parameters": {"topic_id": "math"}, "action": "call_tool"}'
+    with patch("src.orchestrator.get_agent_list", return_value=tools), \
+         patch("src.orchestrator.call_llm_async", new_callable=AsyncMock, return_value=plan):
+        result = asyncio.run(dispatch_agent_multi_turn_step_async([TOPIC_STEP, TREE_STEP], "再查數學"))
+    tool_fn.assert_not_called()
+    assert result["action"] == "finish" and "重複" in result["reason"]
+    assert result["step"]["result"] == {"title": "數學"}
+    assert result["trace"]["memo_hits"] == [{"tool_id": "get_junyi_topic", "parameters": {"topic_id": "math"}}]
+
+def test_parallel_step_only_calls_uncached_topics_in_session():
+    async def fake_topic(topic_id):
+        return {"title": topic_id}
+    tool_fn = AsyncMock(side_effect=fake_topic)
+    tools = [{"id": "get_junyi_topic", "name": "均一主題", "description": "", "parameters": [], "function": MagicMock(), "async_function": tool_fn}]
+    plan = '{"tool_calls": [{"tool_id": "get_junyi_topic", "parameters": {"topic_id": "math"}}, {"tool_id": "get_junyi_topic", "parameters": {"topic_id": "sci"}}], "action": "call_tool"}'
+    with patch("src.orchestrator.get_agent_list", return_value=tools), \
+         patch("src.orchestrator.filter_available_tools_async", new_callable=AsyncMock, return_value=[{"id": "get_junyi_topic", "available": True}]), \
+         patch("src.orchestrator.call_llm_async", new_callable=AsyncMock, return_value=plan):
+        result = asyncio.run(dispatch_session_step_async(None, "數學和自然", new_step=TOPIC_STEP))
+    assert result["action"] == "call_tool"
+    assert tool_fn.call_count == 1 and tool_fn.call_args.kwargs == {"topic_id": "sci"}
+    assert result["step"]["result"] == [{"title": "數學"}, {"title": "sci"}]
+    assert len(result["trace"]["memo_hits"]) == 1
@@ -108,4 +108,87 @@ def main():
         print("------")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main() 
+def test_agent_async_function():
+    import asyncio
+    tools = get_agent_list()
+    for tool in tools:
+        assert asyncio.iscoroutinefunction(tool["async_function"])
+    agent_a = next(t for t in tools if t["id"] == "agent_a_tool")
+    result = asyncio.run(agent_a["async_function"](input_text="請幫我查一下影片剪輯教學"))
+    assert result["agent_id"] == "agent_a_tool"
+
+TITLE_RESULT = {"type": "topic_by_title", "content": {"title": "分數"}, "meta": {"title": "分數", "topic_id": "fraction"}, "error": None}
+
+def test_agent_result_cache_wraps_declared_agents():
+    from src.agent_registry import get_agent_registry
+    from src.utils.agent_result_cache import get_agent_result_cache
+    agent = get_agent_registry().get_agent("get_junyi_topic_by_title")
+    assert agent["cache_ttl"] > 0
+    with patch("src.agents.junyi_topic_by_title_agent.get_junyi_topic_by_title", return_value=dict(TITLE_RESULT)) as mock_title:
+        assert agent["function"](title="分數") == TITLE_RESULT
+        result = agent["function"](title="分數")
+        agent["function"](title="小數")
+    assert mock_title.call_count == 2
+    result["meta"] = "改掉"
+    assert agent["function"](title="分數") == TITLE_RESULT
+    assert get_agent_result_cache().stats()["by_agent"]["get_junyi_topic_by_title"]["hits"] == 2
+
+def test_agent_result_cache_async_skips_errors():
+    import asyncio
+    from src.agent_registry import get_agent_registry
+    agent = get_agent_registry().get_agent("get_junyi_topic_by_title")
+    error_result = {**TITLE_RESULT, "error": {"message": "查詢 Junyi API 發生錯誤: timeout"}}
+    with patch("src.agents.junyi_topic_by_title_agent.get_junyi_topic_by_title_async", return_value=error_result) as mock_title:
+        asyncio.run(agent["async_function"](title="分數"))
+        asyncio.run(agent["async_function"](title="分數"))
+    assert mock_title.call_count == 2  # 沒有宣告 cacheable_errors 的錯誤不快取
+
+def test_cacheable_errors_declared_on_wrapper():
+    from src.utils.agent_result_cache import wrap_cached_agent
+    calls = []
+    def respond(topic_id: str = "root"):
+        calls.append(topic_id)
+        return {"error": "404 Client Error: Not Found"}
+    cached, _ = wrap_cached_agent("fake_agent", respond, None, 60, key_params=["topic_id"], cacheable_errors=["404"])
+    cached(topic_id="missing")
+    cached(topic_id="missing")
+    # 省略參數與明確給預設值共用同一個 key
+    cached()
+    cached(topic_id="root")
+    assert calls == ["missing", "root"]
+
+def test_repeated_agent_calls_still_count_popularity():
+    from src.agent_registry import get_agent_registry
+    from src.tools.junyi_popularity import get_topic_popularity
+    topic_agent = get_agent_registry().get_agent("get_junyi_topic")
+    assert not topic_agent["cache_ttl"]  # 由 junyi_cache（fresh + SWR）負責，不另外包結果快取
+    with patch("src.tools.junyi_topic_tool.JUNYI_TOPIC_FLIGHT.do", return_value={"id": "math"}):
+        for _ in range(5):
+            topic_agent["function"](topic_id="math")
+    title_agent = get_agent_registry().get_agent("get_junyi_topic_by_title")
+    with patch("src.agents.junyi_topic_by_title_agent.get_junyi_topic_by_title", return_value=dict(TITLE_RESULT)) as mock_title:
+        for _ in range(3):
+            title_agent["function"](title="分數")
+    assert mock_title.call_count == 1
+    counts = {item["topic_id"]: item["count"] for item in get_topic_popularity().stats()["top"]}
+    assert counts["math"] == 5
+    assert counts["fraction"] == 2  # 兩次快取命中也計入（第一次由被 mock 掉的工具負責記錄）
+
+def test_agent_without_cache_ttl_is_not_wrapped():
+    from src.agent_registry import get_agent_registry
+    agent = get_agent_registry().get_agent("agent_a_tool")
+    assert not agent["cache_ttl"]
+    assert agent["function"].__self__.__class__.__name__ == "AAgent"
+
+def test_agent_result_cache_ttl_and_persistence(tmp_path):
+    import time
+    from src.utils.agent_result_cache import AgentResultCache
+    path = str(tmp_path / "agent_cache.sqlite3")
+    cache = AgentResultCache(db_path=path)
+    cache.set("a:{}", {"v": 1}, ttl=60)
+    cache.set("b:{}", {"v": 2}, ttl=0.01)
+    time.sleep(0.05)
+    reloaded = AgentResultCache(db_path=path)
+    assert reloaded.get("a:{}") == (True, {"v": 1})
+    assert reloaded.get("b:{}") == (False, None)
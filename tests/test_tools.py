@@ -59,12 +59,12 @@ def test_agent_b_tool():
     result = agent.respond("input")
     assert "type" in result and "content" in result
 
-@patch("requests.get", side_effect=requests.exceptions.Timeout("timeout"))
+@patch("requests.Session.get", side_effect=requests.exceptions.Timeout("timeout"))
 def test_get_junyi_topic_timeout(mock_get):
     result = src.tools.junyi_topic_tool.get_junyi_topic("tid")
     assert "error" in result and "timeout" in result["error"]
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_get_junyi_topic_404(mock_get):
     mock_resp = requests.Response()
     mock_resp.status_code = 404
@@ -75,26 +75,28 @@ def test_get_junyi_topic_404(mock_get):
     result = src.tools.junyi_topic_tool.get_junyi_topic("tid")
     assert "error" in result and "404" in result["error"]
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_get_junyi_topic_non_json(mock_get):
     class FakeResp:
+        status_code = 200
+        headers = {}
         def raise_for_status(self): pass
         def json(self): raise ValueError("not json")
     mock_get.return_value = FakeResp()
     result = src.tools.junyi_topic_tool.get_junyi_topic("tid")
     assert "error" in result and "not json" in result["error"]
 
-@patch("requests.get", side_effect=Exception("boom"))
+@patch("requests.Session.get", side_effect=Exception("boom"))
 def test_get_junyi_topic_exception(mock_get):
     result = src.tools.junyi_topic_tool.get_junyi_topic("tid")
     assert "error" in result and "boom" in result["error"]
 
-@patch("requests.get", side_effect=requests.exceptions.Timeout("timeout"))
+@patch("requests.Session.get", side_effect=requests.exceptions.Timeout("timeout"))
 def test_get_junyi_tree_timeout(mock_get):
     result = src.tools.junyi_tree_tool.get_junyi_tree("tid", depth=2)
     assert "error" in result and "timeout" in result["error"]
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_get_junyi_tree_404(mock_get):
     mock_resp = requests.Response()
     mock_resp.status_code = 404
@@ -105,23 +107,27 @@ def test_get_junyi_tree_404(mock_get):
     result = src.tools.junyi_tree_tool.get_junyi_tree("tid", depth=2)
     assert "error" in result and "404" in result["error"]
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_get_junyi_tree_non_json(mock_get):
     class FakeResp:
+        status_code = 200
+        headers = {}
         def raise_for_status(self): pass
         def json(self): raise ValueError("not json")
     mock_get.return_value = FakeResp()
     result = src.tools.junyi_tree_tool.get_junyi_tree("tid", depth=2)
     assert "error" in result and "not json" in result["error"]
 
-@patch("requests.get", side_effect=Exception("boom"))
+@patch("requests.Session.get", side_effect=Exception("boom"))
 def test_get_junyi_tree_exception(mock_get):
     result = src.tools.junyi_tree_tool.get_junyi_tree("tid", depth=2)
     assert "error" in result and "boom" in result["error"]
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_get_junyi_tree_no_data(mock_get):
     class FakeResp:
+        status_code = 200
+        headers = {}
         def raise_for_status(self): pass
         def json(self): return {"foo": 123}
     mock_get.return_value = FakeResp()
@@ -172,11 +178,91 @@ def test_openai_query_llm_no_content(mock_openai):
     result = openai_query_llm("sys", "input")
     assert result is None or result == ""
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_get_junyi_topic_success(mock_get):
     class FakeResp:
+        status_code = 200
+        headers = {}
         def raise_for_status(self): pass
         def json(self): return {"foo": 123}
     mock_get.return_value = FakeResp()
     result = src.tools.junyi_topic_tool.get_junyi_topic("tid")
-    assert result == {"foo": 123}
\ No newline at end of file
+    assert result == {"foo": 123}
+import asyncio
+from unittest.mock import AsyncMock
+
+def test_get_junyi_topic_async_success():
+    class FakeResp:
+        status_code = 200
+        headers = {}
+        def raise_for_status(self): pass
+        def json(self): return {"foo": 123}
+    with patch("httpx.AsyncClient.get", new_callable=AsyncMock, return_value=FakeResp()):
+        result = asyncio.run(src.tools.junyi_topic_tool.get_junyi_topic_async("tid"))
+    assert result == {"foo": 123}
+
+def test_get_junyi_tree_async_exception():
+    with patch("httpx.AsyncClient.get", new_callable=AsyncMock, side_effect=Exception("boom")):
+        result = asyncio.run(src.tools.junyi_tree_tool.get_junyi_tree_async("tid", depth=2))
+    assert "error" in result and "boom" in result["error"]
+
+def _fake_topic_get(calls):
+    async def fake_get(client, url, headers=None):
+        topic_id = url.rsplit("/", 1)[-1]
+        calls.append(topic_id)
+        class FakeResp:
+            status_code = 200
+            def __init__(self):
+                self.headers = {}
+            def raise_for_status(self):
+                if topic_id == "bad":
+                    raise Exception("404 Not Found")
+            def json(self):
+                return {"id": topic_id}
+        return FakeResp()
+    return fake_get
+
+def test_get_junyi_topics_batch_dedupes_and_reports_partial_errors():
+    calls = []
+    with patch("httpx.AsyncClient.get", new=_fake_topic_get(calls)):
+        result = src.tools.junyi_topic_tool.get_junyi_topics_batch(["a", "bad", "a", "b"])
+    assert list(result["topics"]) == ["a", "b"]
+    assert result["errors"] == {"bad": "404 Not Found"}
+    assert sorted(calls) == ["a", "b", "bad"]
+    assert result["meta"] == {"requested": 4, "unique": 3, "cached": 0, "fetched": 3, "failed": 1}
+
+def test_get_junyi_topics_batch_serves_cached_entries():
+    calls = []
+    with patch("httpx.AsyncClient.get", new=_fake_topic_get(calls)):
+        src.tools.junyi_topic_tool.get_junyi_topics_batch(["a"])
+        result = src.tools.junyi_topic_tool.get_junyi_topics_batch(["a", "b"])
+    assert calls == ["a", "b"]
+    assert result["meta"]["cached"] == 1 and result["topics"]["a"] == {"id": "a"}
+
+def test_sync_batch_and_expand_close_per_loop_client():
+    import httpx
+    from src.utils import http_pool
+    from src.tools.junyi_tree_expander import expand_junyi_tree
+    closed = []
+    real_aclose = httpx.AsyncClient.aclose
+    async def tracking_aclose(client):
+        closed.append(client)
+        await real_aclose(client)
+    with patch("httpx.AsyncClient.get", new=_fake_topic_get([])), \
+         patch("httpx.AsyncClient.aclose", new=tracking_aclose), \
+         patch("src.tools.junyi_tree_expander.get_junyi_tree_async", return_value={"topic_id": "root", "children": []}):
+        src.tools.junyi_topic_tool.get_junyi_topics_batch(["a", "b"])
+        src.tools.junyi_topic_tool.get_junyi_topics_batch(["c"])
+        expand_junyi_tree("root", max_depth=1)
+    # 每次同步呼叫用完就關閉該 event loop 的 AsyncClient
+    assert len(closed) == 2
+    assert len(http_pool._async_clients) == 0
+
+def test_topics_batch_agent_endpoint():
+    from fastapi.testclient import TestClient
+    from server import app
+    calls = []
+    with patch("httpx.AsyncClient.get", new=_fake_topic_get(calls)):
+        with TestClient(app) as client:
+            resp = client.post("/agent/get_junyi_topics_batch/respond", json={"topic_ids": ["a", "b"]})
+    assert resp.json()["result"]["topics"] == {"a": {"id": "a"}, "b": {"id": "b"}}
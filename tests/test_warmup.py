@@ -0,0 +1,82 @@
+import asyncio
+import threading
+from unittest.mock import patch, AsyncMock
+from src.tools.junyi_popularity import TopicPopularity, untracked, prefetch_children, get_topic_popularity
+from src.warmup import run_warmup, warm_routing_async
+
+def test_popularity_counts_and_persists(tmp_path):
+    path = str(tmp_path / "popularity.sqlite3")
+    popularity = TopicPopularity(db_path=path, prefetch_enabled=False)
+    for topic_id in ["math", "math", "sci", "math", "sci", "lang"]:
+        popularity.record(topic_id)
+    with untracked():
+        popularity.record("math")
+    assert popularity.top(2) == ["math", "sci"]
+    popularity.flush()
+    reloaded = TopicPopularity(db_path=path, prefetch_enabled=False)
+    assert reloaded.top(3) == ["math", "sci", "lang"]
+    assert reloaded.stats()["top"][0] == {"topic_id": "math", "count": 3}
+
+def test_popularity_prefetches_children_every_threshold():
+    done = threading.Event()
+    prefetched = []
+    def fake_prefetch(topic_id):
+        prefetched.append(topic_id)
+        done.set()
+    popularity = TopicPopularity(threshold=3, prefetch_enabled=True, prefetch_fn=fake_prefetch)
+    popularity.record("math")
+    popularity.record("math")
+    assert prefetched == []
+    popularity.record("math")
+    assert done.wait(2)
+    assert prefetched == ["math"]
+
+def test_prefetch_children_fetches_topics_without_tracking():
+    tree = {"topic_id": "math", "children": [{"topic_id": "a"}, {"topic_id": "b"}]}
+    with patch("src.tools.junyi_tree_tool.fetch_junyi_tree_live", return_value=tree) as mock_tree, \
+         patch("src.tools.junyi_topic_tool.JUNYI_TOPIC_FLIGHT.do", return_value={"id": "x"}) as mock_topic:
+        assert prefetch_children("math") == ["a", "b"]
+    assert [c.args[0] for c in mock_topic.call_args_list] == ["a", "b"]
+    assert mock_tree.call_count == 3  # math 本身 + 兩個子主題的下一層
+    assert get_topic_popularity().top() == []  # 預取不列入熱門度
+
+def test_title_lookup_and_tree_expansion_only_count_requested_topics():
+    from src.tools.junyi_topic_by_title_tool import get_junyi_topic_by_title, get_junyi_topic_by_title_async
+    from src.tools.junyi_tree_expander import expand_junyi_tree_async
+    trees = {
+        "root": {"topic_id": "root", "children": [{"topic_id": "fraction", "title": "分數"}]},
+        "fraction": {"topic_id": "fraction", "children": [{"topic_id": "a"}]},
+        "a": {"topic_id": "a", "children": []},
+    }
+    async def fake_tree_async(topic_id, depth):
+        return trees[topic_id]
+    with patch("src.tools.junyi_tree_tool.fetch_junyi_tree_live", side_effect=lambda tid, depth: trees[tid]), \
+         patch("src.tools.junyi_tree_tool.JUNYI_TREE_FLIGHT.do_async", side_effect=lambda key, fn, tid, depth: fake_tree_async(tid, depth)), \
+         patch("src.tools.junyi_topic_tool.JUNYI_TOPIC_FLIGHT.do", return_value={"id": "fraction"}), \
+         patch("src.tools.junyi_topic_tool.JUNYI_TOPIC_FLIGHT.do_async", new_callable=AsyncMock, return_value={"id": "fraction"}), \
+         patch("src.tools.junyi_topic_by_title_tool.openai_query_llm", return_value="fraction"), \
+         patch("src.tools.junyi_topic_by_title_tool.openai_query_llm_async", new_callable=AsyncMock, return_value="fraction"):
+        get_junyi_topic_by_title("分數")
+        asyncio.run(get_junyi_topic_by_title_async("分數"))
+        asyncio.run(expand_junyi_tree_async("fraction", max_depth=2))
+    counts = {item["topic_id"]: item["count"] for item in get_topic_popularity().stats()["top"]}
+    assert counts == {"fraction": 3}  # 不含標題比對用的 root，也不含展開時順帶抓的子節點
+
+def test_warm_routing_runs_example_queries_through_planner():
+    agents = [{"id": "a", "example_queries": ["q1", "q2"]}, {"id": "b", "example_queries": ["q2"]}]
+    plan = AsyncMock(side_effect=[{"type": "plan"}, {"type": "no_available_agent"}])
+    with patch("src.warmup.plan_single_turn_async", plan):
+        result = asyncio.run(warm_routing_async(agents))
+    assert result == {"queries": 2, "planned": 1}
+    assert sorted(c.args[0] for c in plan.call_args_list) == ["q1", "q2"]
+
+def test_run_warmup_records_status_and_survives_errors():
+    with patch("src.warmup.get_junyi_tree_async", AsyncMock(return_value={"topic_id": "root"})), \
+         patch("src.warmup.get_junyi_topics_batch_async", AsyncMock(return_value={"topics": {"math": {}}, "errors": {}})), \
+         patch("src.warmup.get_topic_popularity") as mock_popularity, \
+         patch("src.warmup.warm_routing_async", AsyncMock(side_effect=Exception("no key"))):
+        mock_popularity.return_value.top.return_value = ["math"]
+        status = asyncio.run(run_warmup())
+    assert status["state"] == "done"
+    assert status["junyi"] == {"root_tree": True, "topics": 1, "topic_errors": 0}
+    assert status["routing"] == {"error": "no key"}